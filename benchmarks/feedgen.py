@@ -0,0 +1,166 @@
+"""Детерминированный генератор синтетических фидов для бенчмарков.
+
+YML (`offer`) и RSS (`item`), от тысяч до миллиона офферов: фид пишется в файл потоково
+и целиком в памяти не собирается. При одинаковых параметрах и seed файл получается
+байт в байт тем же.
+- error_rate — доля офферов с одной ошибкой (чужой домен, цена не число, пустое имя, ...);
+- namespaced — поля с префиксом `g:` (срабатывает поиск по local-name);
+- write_index — корневой `feed.xml` со ссылками на подфиды.
+
+Запуск из корня репозитория:
+    python -m benchmarks.feedgen --out /tmp/feeds --offers 100000 --subfeeds 4
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from pathlib import Path
+from typing import IO, Iterable, List
+
+DEFAULT_BASE_URL = 'https://shop.example.com'
+G_NS = 'http://base.google.com/ns/1.0'
+
+# Виды ошибок, которые подмешиваются с вероятностью error_rate
+ERROR_KINDS = ('foreign_url', 'price_text', 'empty_name', 'oldprice_low', 'no_picture')
+
+
+def _offer_fields(i: int, rnd: random.Random, base_url: str, error_rate: float) -> List[tuple]:
+    price = rnd.randint(100, 99999)
+    fields = [
+        ('url', f'{base_url}/p/{i}'),
+        ('name', f'Товар {i} &amp; аксессуары'),
+        ('picture', f'{base_url}/img/{i}.jpg'),
+        ('price', str(price)),
+    ]
+    if rnd.random() < 0.2:
+        fields.append(('oldprice', str(price + rnd.randint(1, 5000))))
+    if rnd.random() < error_rate:
+        kind = ERROR_KINDS[rnd.randrange(len(ERROR_KINDS))]
+        if kind == 'foreign_url':
+            fields[0] = ('url', f'https://other.example.net/p/{i}')
+        elif kind == 'price_text':
+            fields[3] = ('price', 'по запросу')
+        elif kind == 'empty_name':
+            fields[1] = ('name', '')
+        elif kind == 'oldprice_low':
+            fields = [f for f in fields if f[0] != 'oldprice'] + [('oldprice', str(max(1, price - 1)))]
+        else:
+            fields = [f for f in fields if f[0] != 'picture']
+    return fields
+
+
+def _write_offers(
+    out: IO[str],
+    tag: str,
+    count: int,
+    seed: int,
+    base_url: str,
+    error_rate: float,
+    namespaced: bool,
+) -> None:
+    rnd = random.Random(seed)
+    prefix = 'g:' if namespaced else ''
+    buf: List[str] = []
+    for i in range(count):
+        body = ''.join(f'<{prefix}{name}>{value}</{prefix}{name}>' for name, value in _offer_fields(i, rnd, base_url, error_rate))
+        extra = '<currencyId>RUR</currencyId><categoryId>1</categoryId><description>Описание товара</description>'
+        if tag == 'offer':
+            buf.append(f'<offer id="{i}" available="true">{body}{extra}</offer>\n')
+        else:
+            buf.append(f'<item><id>{i}</id>{body}{extra}</item>\n')
+        if len(buf) >= 1000:
+            out.write(''.join(buf))
+            buf.clear()
+    out.write(''.join(buf))
+
+
+def write_yml(
+    path: Path,
+    count: int,
+    seed: int = 42,
+    base_url: str = DEFAULT_BASE_URL,
+    error_rate: float = 0.05,
+    namespaced: bool = False,
+) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w', encoding='utf-8', newline='\n') as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.write(f'<yml_catalog date="2024-01-01 00:00" xmlns:g="{G_NS}"><shop><name>Bench</name><offers>\n')
+        _write_offers(out, 'offer', count, seed, base_url, error_rate, namespaced)
+        out.write('</offers></shop></yml_catalog>\n')
+    return path
+
+
+def write_rss(
+    path: Path,
+    count: int,
+    seed: int = 42,
+    base_url: str = DEFAULT_BASE_URL,
+    error_rate: float = 0.05,
+    namespaced: bool = False,
+) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w', encoding='utf-8', newline='\n') as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.write(f'<rss version="2.0" xmlns:g="{G_NS}"><channel><title>Bench</title><link>{base_url}/</link>\n')
+        _write_offers(out, 'item', count, seed, base_url, error_rate, namespaced)
+        out.write('</channel></rss>\n')
+    return path
+
+
+def write_index(path: Path, subfeed_urls: Iterable[str]) -> Path:
+    # Корневой feed.xml: подфиды извлекаются из <url> (см. fetch.extract_subfeed_links)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w', encoding='utf-8', newline='\n') as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n<feeds>\n')
+        for url in subfeed_urls:
+            out.write(f'<feed><url>{url}</url></feed>\n')
+        out.write('</feeds>\n')
+    return path
+
+
+def write_feed_set(
+    directory: Path,
+    offers: int,
+    subfeeds: int,
+    base_url: str,
+    fmt: str = 'yml',
+    seed: int = 42,
+    error_rate: float = 0.05,
+    namespaced: bool = False,
+) -> Path:
+    # feed.xml + subfeeds подфидов по offers // subfeeds офферов; возвращает путь к feed.xml
+    directory = Path(directory)
+    writer = write_yml if fmt == 'yml' else write_rss
+    per_feed = max(1, offers // max(1, subfeeds))
+    names = [f'sub_{n}.xml' for n in range(subfeeds)]
+    for n, name in enumerate(names):
+        writer(directory / name, per_feed, seed=seed + n, base_url=base_url, error_rate=error_rate, namespaced=namespaced)
+    return write_index(directory / 'feed.xml', (f'{base_url}/{name}' for name in names))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--out', required=True)
+    ap.add_argument('--offers', type=int, default=10000)
+    ap.add_argument('--format', choices=('yml', 'rss'), default='yml')
+    ap.add_argument('--subfeeds', type=int, default=0, help='0 — один файл feed_<offers>.xml без индекса')
+    ap.add_argument('--base-url', default=DEFAULT_BASE_URL)
+    ap.add_argument('--error-rate', type=float, default=0.05)
+    ap.add_argument('--namespaced', action='store_true')
+    ap.add_argument('--seed', type=int, default=42)
+    args = ap.parse_args()
+    out = Path(args.out)
+    if args.subfeeds:
+        path = write_feed_set(out, args.offers, args.subfeeds, args.base_url, args.format, args.seed, args.error_rate, args.namespaced)
+    else:
+        writer = write_yml if args.format == 'yml' else write_rss
+        path = writer(out / f'{args.format}_{args.offers}.xml', args.offers, args.seed, args.base_url, args.error_rate, args.namespaced)
+    print(path)
+
+
+if __name__ == '__main__':
+    main()
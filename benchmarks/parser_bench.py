@@ -0,0 +1,106 @@
+"""Скорость извлечения полей офферов и совпадение с прежним извлечением (findall + xpath).
+
+Синтетический YML-фид: часть офферов без oldprice, часть с namespaced-тегами и вложенными
+элементами. Перед замером результаты нового и прежнего извлечения сравниваются —
+при расхождении скрипт падает.
+
+Запуск из корня репозитория:
+    python -m benchmarks.parser_bench --offers 100000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Dict, Iterator, List
+
+from lxml import etree
+
+from src import parser
+from src.parser import OFFER_FIELDS, Offer, iter_offers
+
+
+def make_feed(count: int, seed: int = 42) -> bytes:
+    rnd = random.Random(seed)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<yml_catalog xmlns:g="http://base.google.com/ns/1.0"><shop><offers>\n'
+    ]
+    for i in range(count):
+        roll = rnd.random()
+        body = [
+            f'<url>https://shop.example.com/p/{i}</url>',
+            f'<name>Товар {i}</name>',
+            f'<picture>https://shop.example.com/img/{i}.jpg</picture>',
+            f'<price>{rnd.randint(100, 99999)}</price>',
+            '<currencyId>RUR</currencyId><categoryId>1</categoryId>',
+            '<description>Описание товара</description>',
+            '<param name="Цвет">красный</param>',
+        ]
+        if roll < 0.2:
+            body.append(f'<oldprice>{rnd.randint(100, 99999)}</oldprice>')
+        elif roll < 0.25:
+            # namespaced-поля и вложенный url: срабатывает поиск по local-name
+            body[0] = f'<g:link><url>https://shop.example.com/p/{i}</url></g:link>'
+            body[3] = f'<g:price>{rnd.randint(100, 99999)} RUB</g:price>'
+        elif roll < 0.28:
+            body[2] = '<picture/>'
+        parts.append(f'<offer id="{i}" available="true">{"".join(body)}</offer>\n')
+    parts.append('</offers></shop></yml_catalog>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def _legacy_extract(node: etree._Element) -> Offer:
+    # Прежняя реализация: findall на каждое поле и xpath по local-name, если ничего не нашлось
+    offer_id = node.get('id') or node.findtext('id') or ''
+    fields: Dict[str, List[str]] = {}
+    for tag in OFFER_FIELDS:
+        values = [(child.text or '').strip() for child in node.findall(tag)]
+        if not values:
+            values = [(el.text or '').strip() for el in node.xpath(f'.//*[local-name()="{tag}"]')]
+        if values:
+            fields[tag] = values
+    return Offer(id=str(offer_id), fields=fields)
+
+
+def legacy_iter_offers(content: bytes) -> Iterator[Offer]:
+    # Тот же потоковый разбор, только с прежним извлечением полей
+    original = parser._extract_offer
+    parser._extract_offer = lambda node, *_: _legacy_extract(node)
+    try:
+        yield from iter_offers(content)
+    finally:
+        parser._extract_offer = original
+
+
+def check_parity(content: bytes) -> None:
+    expected = list(legacy_iter_offers(content))
+    actual = list(iter_offers(content))
+    if len(expected) != len(actual):
+        raise AssertionError(f'Разное число офферов: {len(expected)} и {len(actual)}')
+    for old, new in zip(expected, actual):
+        if old != new:
+            raise AssertionError(f'Расхождение на оффере {old.id}:\n{old!r}\n{new!r}')
+    print(f'parity: ok ({len(actual)} offers)')
+
+
+def bench(title: str, fn, content: bytes) -> None:
+    started = time.perf_counter()
+    count = sum(1 for _ in fn(content))
+    elapsed = time.perf_counter() - started
+    print(f'{title:32s} {count / elapsed:12.0f} offers/s ({elapsed:.3f}s)')
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--offers', type=int, default=100000)
+    args = ap.parse_args()
+    content = make_feed(args.offers)
+    print(f'feed: {args.offers} offers, {len(content) / 1024 / 1024:.1f} MB')
+    check_parity(make_feed(20000, seed=7))
+    bench('findall + xpath (legacy)', legacy_iter_offers, content)
+    bench('single pass (iter_offers)', iter_offers, content)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Локальный HTTP-сервер для бенчмарков: отдаёт сгенерированные фиды из каталога.
+
+Работает в фоновом потоке, поддерживает keep-alive и If-Modified-Since (304) — как
+http.server.SimpleHTTPRequestHandler. Порт 0 — выбрать свободный. statuses — пути, на которые
+сервер отвечает заданной ошибкой (например, {'/': 503} — «сайт недоступен» для проверки сайта).
+
+Отдельный запуск из корня репозитория:
+    python -m benchmarks.server /tmp/feeds --port 8765
+"""
+from __future__ import annotations
+
+import argparse
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def _forced_status(self) -> bool:
+        code = getattr(self.server, 'statuses', {}).get(self.path.split('?', 1)[0])
+        if code is None:
+            return False
+        self.send_error(code)
+        return True
+
+    def do_GET(self) -> None:
+        if not self._forced_status():
+            super().do_GET()
+
+    def do_HEAD(self) -> None:
+        if not self._forced_status():
+            super().do_HEAD()
+
+
+class FeedServer:
+    """Фоновый HTTP-сервер каталога с фидами; используется как контекстный менеджер."""
+
+    def __init__(self, directory: Path, host: str = '127.0.0.1', port: int = 0, statuses: Optional[Dict[str, int]] = None) -> None:
+        handler = functools.partial(_QuietHandler, directory=str(directory))
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._httpd.statuses = dict(statuses or {})  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FeedServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='bench-http', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        # Блокирующий режим для запуска из командной строки
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> 'FeedServer':
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('directory')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8765)
+    args = ap.parse_args()
+    server = FeedServer(Path(args.directory), args.host, args.port)
+    print(f'Serving {args.directory} at {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
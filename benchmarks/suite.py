@@ -0,0 +1,262 @@
+"""Набор воспроизводимых бенчмарков с результатами в JSON.
+
+Кейсы (каждый — в отдельном свежем процессе, чтобы пик памяти не смешивался):
+- parse:    iter_offers по файлу фида, офферов/с;
+- validate: FeedValidator.validate_many по уже разобранным офферам;
+- check:    разбор + проверка (pipeline.check_offers) потоком из файла;
+- split:    то же в N процессах (pipeline.check_offers_split), с проверкой совпадения с check;
+- subfeeds: extract_subfeed_links по feed.xml с N подфидами;
+- e2e:      main.process_feed по feed.xml через локальный HTTP-сервер (serial / stream / concurrent).
+
+Фиды генерируются детерминированно (benchmarks.feedgen) во временный каталог.
+Результаты пишутся в JSON; --compare сравнивает с прошлым файлом.
+
+Запуск из корня репозитория:
+    python -m benchmarks.suite --sizes 1000,100000 --output benchmarks/results/run.json
+    python -m benchmarks.suite --sizes 100000 --compare benchmarks/results/run.json
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.feedgen import DEFAULT_BASE_URL, write_feed_set, write_index, write_rss, write_yml
+from benchmarks.server import FeedServer
+from src.config import Settings
+from src.fetch import extract_subfeed_links
+from src.main import RunContext, process_feed
+from src.parser import iter_offers
+from src.pipeline import check_offers, check_offers_split
+from src.timing import peak_rss_mb
+from src.validator import FeedValidator
+
+FEED_URL = f'{DEFAULT_BASE_URL}/feed.xml'
+
+
+def _result(offers: int, seconds: float, size: int = 0, **extra: object) -> Dict[str, object]:
+    data: Dict[str, object] = {
+        'offers': offers,
+        'seconds': round(seconds, 4),
+        'offers_per_s': round(offers / seconds, 1) if seconds else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+    if size:
+        data['mb_per_s'] = round(size / 1024 / 1024 / seconds, 2) if seconds else None
+    data.update(extra)
+    return data
+
+
+def case_parse(path: str) -> Dict[str, object]:
+    started = time.perf_counter()
+    count = sum(1 for _ in iter_offers(path))
+    return _result(count, time.perf_counter() - started, Path(path).stat().st_size)
+
+
+def case_validate(path: str, batch_size: int) -> Dict[str, object]:
+    offers = list(iter_offers(path))
+    started = time.perf_counter()
+    issues = sum(len(found) for _, found in FeedValidator(FEED_URL, batch_size=batch_size).validate_many(offers))
+    return _result(len(offers), time.perf_counter() - started, issues=issues)
+
+
+def case_check(path: str, batch_size: int) -> Dict[str, object]:
+    started = time.perf_counter()
+    result = check_offers(path, FEED_URL, allow_subdomains=False, batch_size=batch_size)
+    return _result(result.offers_checked, time.perf_counter() - started, Path(path).stat().st_size, issues=result.total_issues)
+
+
+def case_split(path: str, processes: int, batch_size: int) -> Dict[str, object]:
+    content = Path(path).read_bytes()
+    expected = check_offers(content, FEED_URL, allow_subdomains=False, batch_size=batch_size).to_dict()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        # Процессы пула запускаются заранее, чтобы их старт не попал в замер
+        list(pool.map(int, range(processes)))
+        started = time.perf_counter()
+        result = check_offers_split(content, FEED_URL, False, pool, processes, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+    if result is None:
+        return {'skipped': 'тело не режется', 'seconds': round(elapsed, 4)}
+    return _result(result.offers_checked, elapsed, len(content), issues=result.total_issues, identical=result.to_dict() == expected)
+
+
+def case_subfeeds(path: str, repeat: int) -> Dict[str, object]:
+    content = Path(path).read_bytes()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        links = extract_subfeed_links(content, FEED_URL)
+    elapsed = time.perf_counter() - started
+    return {'links': len(links), 'repeat': repeat, 'seconds': round(elapsed, 4), 'per_call_ms': round(elapsed * 1000 / repeat, 3)}
+
+
+def _bench_settings(log_dir: str, **overrides: object) -> Settings:
+    settings = Settings(
+        owners={},
+        request_timeout_seconds=60,
+        user_agent='fids-bench/1.0',
+        timezone='Europe/Berlin',
+        log_dir=log_dir,
+        log_public_base_url=None,
+        telegram_bot_token=None,
+        telegram_chat_id=None,
+        telegram_enabled=False,
+        telegram_enabled_success=False,
+        fids_stat_path=None,
+        probe_origin_enabled=False,
+        allow_subdomains=False,
+        http_cache_enabled=False,
+    )
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    return settings
+
+
+def case_e2e(feed_url: str, log_dir: str, mode: str) -> Dict[str, object]:
+    overrides: Dict[str, object] = {}
+    if mode in ('stream', 'concurrent'):
+        overrides['stream_fetch'] = True
+    if mode == 'concurrent':
+        overrides['concurrent_run'] = True
+    settings = _bench_settings(log_dir, **overrides)
+    ctx = RunContext.from_settings(settings)
+    started = time.perf_counter()
+    try:
+        _, offers, _, issues = process_feed(settings, 'bench', feed_url, Path(log_dir) / 'bench.log', ctx, log=lambda message: None)
+    finally:
+        ctx.close()
+    return _result(offers, time.perf_counter() - started, issues=issues)
+
+
+def _run_isolated(fn: Callable[..., Dict[str, object]], *args: object) -> Dict[str, object]:
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:  # noqa: BLE001
+        return None
+
+
+def run_suite(
+    workdir: Path,
+    sizes: List[int],
+    formats: List[str],
+    subfeeds: int,
+    error_rate: float,
+    batch_size: int,
+    e2e_modes: List[str],
+    split_processes: List[int],
+) -> List[Dict[str, object]]:
+    results: List[Dict[str, object]] = []
+
+    def record(name: str, data: Dict[str, object]) -> None:
+        data = {'name': name, **data}
+        results.append(data)
+        rate = data.get('offers_per_s')
+        extra = f'{rate:>12} offers/s' if rate is not None else f'{data.get("per_call_ms")} ms/call'
+        if 'skipped' in data:
+            extra = f'пропущен: {data["skipped"]}'
+        if data.get('identical') is False:
+            extra += '  MISMATCH'
+        print(f'{name:32s} {extra}  peak={data.get("peak_rss_mb", "-")} MB')
+
+    for size in sizes:
+        for fmt in formats:
+            writer = write_yml if fmt == 'yml' else write_rss
+            for namespaced in (False, True):
+                suffix = '_ns' if namespaced else ''
+                path = workdir / f'{fmt}_{size}{suffix}.xml'
+                if not path.exists():
+                    writer(path, size, error_rate=error_rate, namespaced=namespaced)
+                record(f'parse/{fmt}{suffix}/{size}', _run_isolated(case_parse, str(path)))
+        yml = str(workdir / f'yml_{size}.xml')
+        record(f'validate/{size}', _run_isolated(case_validate, yml, batch_size))
+        record(f'check/{size}', _run_isolated(case_check, yml, batch_size))
+        for processes in split_processes:
+            record(f'split/{processes}/{size}', _run_isolated(case_split, yml, processes, batch_size))
+
+    index = write_index(workdir / f'index_{subfeeds}.xml', (f'{DEFAULT_BASE_URL}/sub_{n}.xml' for n in range(subfeeds)))
+    record(f'subfeeds/{subfeeds}', _run_isolated(case_subfeeds, str(index), 200))
+
+    if e2e_modes:
+        site = workdir / 'site'
+        site.mkdir(exist_ok=True)
+        with FeedServer(site) as server:
+            for size in sizes:
+                feed_dir = site / str(size)
+                write_feed_set(feed_dir, size, subfeeds, f'{server.base_url}/{size}', error_rate=error_rate)
+                for mode in e2e_modes:
+                    record(f'e2e/{mode}/{size}', _run_isolated(case_e2e, f'{server.base_url}/{size}/feed.xml', str(workdir), mode))
+    return results
+
+
+def compare(current: List[Dict[str, object]], previous_path: Path) -> None:
+    previous = {r['name']: r for r in json.loads(previous_path.read_text(encoding='utf-8')).get('results', [])}
+    print(f'\nСравнение с {previous_path}:')
+    for r in current:
+        old = previous.get(r['name'])
+        if not old:
+            continue
+        key = 'offers_per_s' if r.get('offers_per_s') else 'per_call_ms'
+        new_v, old_v = r.get(key), old.get(key)
+        if not new_v or not old_v:
+            continue
+        delta = (float(new_v) - float(old_v)) * 100 / float(old_v)
+        print(f'{r["name"]:32s} {key}: {old_v} -> {new_v} ({delta:+.1f}%)')
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', default='1000,10000,100000', help='число офферов через запятую (до 1000000)')
+    ap.add_argument('--formats', default='yml,rss')
+    ap.add_argument('--subfeeds', type=int, default=4)
+    ap.add_argument('--error-rate', type=float, default=0.05)
+    ap.add_argument('--batch-size', type=int, default=2000)
+    ap.add_argument('--split', default='2,4,8', help='число процессов для кейса split через запятую; пусто — без split')
+    ap.add_argument('--e2e', default='serial,stream,concurrent', help='режимы process_feed; пусто — без e2e')
+    ap.add_argument('--workdir', help='каталог для сгенерированных фидов (по умолчанию временный)')
+    ap.add_argument('--output', help='куда записать JSON (по умолчанию benchmarks/results/<время>.json)')
+    ap.add_argument('--compare', help='JSON прошлого запуска для сравнения')
+    args = ap.parse_args()
+
+    sizes = [int(v) for v in args.sizes.split(',') if v]
+    formats = [v for v in args.formats.split(',') if v]
+    modes = [v for v in args.e2e.split(',') if v]
+    split_processes = [int(v) for v in args.split.split(',') if v]
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='fids-bench-') as tmp:
+        workdir = Path(args.workdir or tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        results = run_suite(workdir, sizes, formats, args.subfeeds, args.error_rate, args.batch_size, modes, split_processes)
+
+    report = {
+        'meta': {
+            'timestamp': dt.datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'args': vars(args),
+            'total_seconds': round(time.perf_counter() - started, 1),
+        },
+        'results': results,
+    }
+    output = Path(args.output) if args.output else Path('benchmarks/results') / f'{dt.datetime.now():%Y%m%d-%H%M%S}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f'\nРезультаты: {output}')
+    if args.compare:
+        compare(results, Path(args.compare))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Сравнение скорости проверки офферов и проверка совпадения результатов.
+
+validate_offer на каждый оффер, FeedValidator построчно и пакетная (numpy) проверка.
+Перед замером пакетный путь сверяется с построчным на наборе «неудобных» значений —
+при расхождении скрипт падает.
+
+Запуск из корня репозитория:
+    python -m benchmarks.validator_bench --offers 20000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from src.parser import Offer
+from src.fetch import domain_match_cache_stats
+from src.validator import FeedValidator, np, validate_offer
+
+FEED_URL = 'https://shop.example.com/allfeed.xml'
+
+# Значения, на которых легко разойтись с построчной нормализацией цен
+TRICKY_PRICES = [
+    '1990', '1 990,50 руб.', '', '  ', 'abc', '-', '.5', '-.5', '1.2.3', '\t12\n', '٣', '1e5',
+    '5-', '--1', '1.', '.', '0', '12,5,0', '1\xa0000', '-0', 'x' * 100 + '5', '9' * 70, '12.5р.', '1,5.0',
+]
+TRICKY_URLS = [
+    'https://shop.example.com/a', 'https://www.shop.example.com/b', 'https://cdn.shop.example.com/c',
+    'http://evil.example.net/x', '', ' ', 'ftp://shop.example.com', 'shop.example.com/x',
+]
+
+
+def make_offers(count: int, seed: int = 42) -> List[Offer]:
+    rnd = random.Random(seed)
+    offers: List[Offer] = []
+    for i in range(count):
+        fields: Dict[str, List[str]] = {
+            'url': [f'https://shop.example.com/p/{i}'],
+            'name': [f'Товар {i}'],
+            'picture': [f'https://www.shop.example.com/img/{i}.jpg'],
+            'price': [f'{rnd.randint(100, 99999)}'],
+        }
+        roll = rnd.random()
+        if roll < 0.05:
+            fields['url'] = [f'https://other.example.net/p/{i}']
+        elif roll < 0.10:
+            fields['price'] = ['по запросу']
+        elif roll < 0.20:
+            fields['oldprice'] = [f'{rnd.randint(1, 99999)},50']
+        offers.append(Offer(id=str(i), fields=fields))
+    return offers
+
+
+def make_tricky_offers(count: int, seed: int = 7) -> List[Offer]:
+    rnd = random.Random(seed)
+    offers: List[Offer] = []
+    for i in range(count):
+        fields: Dict[str, List[str]] = {}
+        for tag in ('url', 'picture'):
+            if rnd.random() < 0.9:
+                fields[tag] = [rnd.choice(TRICKY_URLS) for _ in range(rnd.randint(0, 2))]
+        if rnd.random() < 0.9:
+            fields['name'] = [rnd.choice(['Товар', '', ' '])]
+        if rnd.random() < 0.9:
+            fields['price'] = [rnd.choice(TRICKY_PRICES) for _ in range(rnd.randint(0, 3))]
+        if rnd.random() < 0.6:
+            fields['oldprice'] = [rnd.choice(TRICKY_PRICES) for _ in range(rnd.randint(0, 3))]
+        offers.append(Offer(id=str(i), fields=fields))
+    return offers
+
+
+def check_parity(offers: List[Offer], batch_size: int) -> None:
+    for allow_subdomains in (False, True):
+        scalar = FeedValidator(FEED_URL, allow_subdomains=allow_subdomains)
+        batch = FeedValidator(FEED_URL, allow_subdomains=allow_subdomains, batch_size=batch_size)
+        expected = [issues for _, issues in scalar.validate_many(offers)]
+        actual = [issues for _, issues in batch.validate_many(offers)]
+        for offer, exp, act in zip(offers, expected, actual):
+            if exp != act:
+                raise AssertionError(f'Расхождение на оффере {offer.id}: {offer.fields!r}\n{exp!r}\n{act!r}')
+    print(f'parity: ok ({len(offers)} offers, allow_subdomains=False/True)')
+
+
+def bench_legacy(offers: List[Offer]) -> float:
+    started = time.perf_counter()
+    for offer in offers:
+        validate_offer(offer.fields, FEED_URL)
+    return time.perf_counter() - started
+
+
+def bench_validator(offers: List[Offer], batch_size: int = 0) -> float:
+    started = time.perf_counter()
+    validator = FeedValidator(FEED_URL, batch_size=batch_size)
+    for _ in validator.validate_many(offers):
+        pass
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--offers', type=int, default=20000)
+    ap.add_argument('--batch-size', type=int, default=2000)
+    args = ap.parse_args()
+    if np is None:
+        print('numpy не установлен — пакетная проверка совпадает с построчной')
+    check_parity(make_tricky_offers(20000), args.batch_size)
+    offers = make_offers(args.offers)
+    runs = (
+        ('validate_offer (per-offer settings)', lambda: bench_legacy(offers)),
+        ('FeedValidator.validate_many', lambda: bench_validator(offers)),
+        (f'FeedValidator batch={args.batch_size}', lambda: bench_validator(offers, args.batch_size)),
+    )
+    for title, fn in runs:
+        elapsed = fn()
+        print(f'{title:40s} {len(offers) / elapsed:12.0f} offers/s ({elapsed:.3f}s)')
+    hits, misses = domain_match_cache_stats()
+    print(f'domain cache: hits={hits} misses={misses} ({hits * 100 / max(1, hits + misses):.2f}%)')
+
+
+if __name__ == '__main__':
+    main()
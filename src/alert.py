@@ -1,12 +1,27 @@
 from __future__ import annotations
 
+import atexit
 import datetime as dt
+import queue
+import threading
+import time
 from dataclasses import dataclass
-from typing import Iterable, List, Optional, Dict
+from typing import Callable, Iterable, List, Optional, Dict, Tuple
 
 import pytz
 import requests
 
+TELEGRAM_API_BASE = 'https://api.telegram.org'
+# Лимит длины одного сообщения Telegram
+TELEGRAM_MAX_LENGTH = 4096
+# Дольше этого по retry_after из 429 не ждём
+TELEGRAM_MAX_RETRY_AFTER = 60
+TELEGRAM_MAX_ATTEMPTS = 5
+# Сколько по умолчанию close() (и выход из процесса) ждёт отправки очереди
+TELEGRAM_FLUSH_SECONDS = 30.0
+# Видов ошибок в сводном алерте; остальные — одной строкой с числом
+SUMMARY_MAX_GROUPS = 15
+
 
 @dataclass
 class NegativeAlert:
@@ -46,7 +61,16 @@ def format_negative(alert: NegativeAlert, timezone: str) -> str:
     return '\n'.join(parts)
 
 
-def format_summary(total_feeds: int, bad_feeds: int, total_offers: int, bad_offers: int, total_issues: int, log_url: Optional[str], timezone: str) -> str:
+def format_summary(
+    total_feeds: int,
+    bad_feeds: int,
+    total_offers: int,
+    bad_offers: int,
+    total_issues: int,
+    log_url: Optional[str],
+    timezone: str,
+    estimated_feeds: int = 0,
+) -> str:
     # Формат суточного отчёта со всеми основными метриками
     parts = [
         '✅ Общий отчет по проверке фидов',
@@ -58,6 +82,8 @@ def format_summary(total_feeds: int, bad_feeds: int, total_offers: int, bad_offe
         f'⚠️ Офферов с ошибками: {bad_offers}',
         f'🧩 Всего ошибок: {total_issues}',
     ]
+    if estimated_feeds:
+        parts.append(f'🎯 Фидов с оценкой по выборке (ошибки пересчитаны на весь фид): {estimated_feeds}')
     if log_url:
         parts.append(f'📄 Лог: {log_url}')
     return '\n'.join(parts)
@@ -70,7 +96,20 @@ def summary_from_json(stats: dict, log_url: Optional[str], timezone: str) -> str
     total_offers = int(stats.get('total_offers', 0))
     bad_offers = int(stats.get('offers_with_errors', 0))
     total_issues = int(stats.get('total_issues', 0))
-    return format_summary(total_feeds, bad_feeds, total_offers, bad_offers, total_issues, log_url, timezone)
+    estimated_feeds = int(stats.get('estimated_feeds', 0))
+    return format_summary(total_feeds, bad_feeds, total_offers, bad_offers, total_issues, log_url, timezone, estimated_feeds)
+
+
+def format_owner_summary(owners: Dict[str, Dict[str, int]]) -> str:
+    # Строки суточного отчёта по владельцам (суммы из базы статистики)
+    lines = ['👤 По владельцам:']
+    for owner, stats in owners.items():
+        title = _OWNER_TITLES.get((owner or '').lower(), owner) or '—'
+        lines.append(
+            f'- {title}: фидов {stats["total_feeds"]} (с ошибками {stats["feeds_with_errors"]}), '
+            f'офферов {stats["total_offers"]} (с ошибками {stats["offers_with_errors"]}), ошибок {stats["total_issues"]}'
+        )
+    return '\n'.join(lines)
 
 
 def format_grouped_negative(owner: str, feed_url: str, issues_by_offer: Dict[str, List[object]], timezone: str) -> str:
@@ -78,21 +117,22 @@ def format_grouped_negative(owner: str, feed_url: str, issues_by_offer: Dict[str
     return _format_grouped(owner, feed_url, issues_by_offer, timezone)
 
 
-def _format_grouped(owner: str, feed_url: str, issues_by_offer: Dict[str, List[object]], timezone: str) -> str:
-    owner_title = {
-        'anton': 'Антон',
-        'ilya': 'Илья',
-        'yura': 'Юра',
-        'default': '—',
-    }.get((owner or '').lower(), owner)
+_OWNER_TITLES = {
+    'anton': 'Антон',
+    'ilya': 'Илья',
+    'yura': 'Юра',
+    'default': '—',
+}
+
+
+def _feed_header(owner: str, feed_url: str, timezone: str) -> List[str]:
+    owner_title = _OWNER_TITLES.get((owner or '').lower(), owner)
     header = f'🔔 Ошибка автотеста фидов (владелец: {owner_title})' if owner_title else '🔔 Ошибка автотеста фидов'
-    parts: List[str] = [
-        header,
-        '',
-        f'⏰ Время: {now_str(timezone)}',
-        f'🌍 Фид: {feed_url}',
-        '❌ Найдены проблемы в офферах:',
-    ]
+    return [header, '', f'⏰ Время: {now_str(timezone)}', f'🌍 Фид: {feed_url}']
+
+
+def _format_grouped(owner: str, feed_url: str, issues_by_offer: Dict[str, List[object]], timezone: str) -> str:
+    parts: List[str] = _feed_header(owner, feed_url, timezone) + ['❌ Найдены проблемы в офферах:']
     for offer_id, issues in issues_by_offer.items():
         parts.append(f'- Offer ID: {offer_id or "-"}')
         for issue in issues:
@@ -105,20 +145,299 @@ def _format_grouped(owner: str, feed_url: str, issues_by_offer: Dict[str, List[o
     return '\n'.join(parts)
 
 
-def send_telegram(token: Optional[str], chat_id: Optional[str], text: str) -> None:
-    if not token or not chat_id:
-        return
+def format_issue_summary(
+    owner: str,
+    feed_url: str,
+    groups: Iterable[object],
+    offers_with_errors: int,
+    total_issues: int,
+    timezone: str,
+    detail_url: Optional[str] = None,
+) -> str:
+    # Алерт для фида с множеством ошибок: по виду ошибки — число и примеры офферов, полный список — по ссылке.
+    # Размер не зависит от числа офферов
+    parts: List[str] = _feed_header(owner, feed_url, timezone)
+    parts.append(f'❌ Офферов с ошибками: {offers_with_errors}, ошибок: {total_issues}')
+    ordered = sorted(groups, key=lambda g: getattr(g, 'count', 0), reverse=True)
+    for group in ordered[:SUMMARY_MAX_GROUPS]:
+        examples = ', '.join(getattr(group, 'examples', []))
+        parts.append(f'- {getattr(group, "message", group)}: {getattr(group, "count", 0)} (например, Offer ID: {examples})')
+    if len(ordered) > SUMMARY_MAX_GROUPS:
+        rest = sum(getattr(g, 'count', 0) for g in ordered[SUMMARY_MAX_GROUPS:])
+        parts.append(f'- другие виды ошибок: {len(ordered) - SUMMARY_MAX_GROUPS}, ошибок: {rest}')
+    if detail_url:
+        parts.append(f'📄 Все ошибки по офферам: {detail_url}')
+    return '\n'.join(parts)
+
+
+def split_message(text: str, limit: int = TELEGRAM_MAX_LENGTH) -> List[str]:
+    # Режет текст по строкам на части не длиннее limit; слишком длинная строка режется посимвольно
+    chunks: List[str] = []
+    lines: List[str] = []
+    size = 0
+    for line in text.split('\n'):
+        while len(line) > limit:
+            if lines:
+                chunks.append('\n'.join(lines))
+                lines, size = [], 0
+            chunks.append(line[:limit])
+            line = line[limit:]
+        extra = len(line) + (1 if lines else 0)
+        if lines and size + extra > limit:
+            chunks.append('\n'.join(lines))
+            lines, size, extra = [], 0, len(line)
+        lines.append(line)
+        size += extra
+    if lines:
+        chunks.append('\n'.join(lines))
+    return [c for c in chunks if c.strip()]
+
+
+def pack_messages(texts: Iterable[str], limit: int = TELEGRAM_MAX_LENGTH, separator: str = '\n\n') -> List[str]:
+    # Склеивает сообщения в пачки до limit символов, не разрывая сообщения, которые помещаются целиком
+    packed: List[str] = []
+    current = ''
+    for text in texts:
+        for part in split_message(text, limit):
+            if current and len(current) + len(separator) + len(part) <= limit:
+                current += separator + part
+                continue
+            if current:
+                packed.append(current)
+            current = part
+    if current:
+        packed.append(current)
+    return packed
+
+
+def _retry_after(resp: requests.Response) -> float:
     try:
-        resp = requests.post(
-            f'https://api.telegram.org/bot{token}/sendMessage',
-            json={'chat_id': chat_id, 'text': text},
-            timeout=10,
-        )
+        value = (resp.json().get('parameters') or {}).get('retry_after')
+    except Exception:  # noqa: BLE001
+        value = None
+    if value is None:
+        value = resp.headers.get('Retry-After')
+    try:
+        return min(max(float(value), 0.0), TELEGRAM_MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def _post_message(
+    post: Callable[..., requests.Response],
+    api_base: str,
+    token: str,
+    chat_id: str,
+    text: str,
+    timeout: float,
+    on_rate_limit: Optional[Callable[[], None]] = None,
+    deadline: Optional[float] = None,
+) -> bool:
+    # Одна отправка с повторами: 429 — ждём retry_after, сетевые ошибки — короткий backoff.
+    # deadline (time.monotonic) ограничивает всё вместе: и таймауты запросов, и ожидание между ними
+    def _left(limit: float) -> float:
+        return limit if deadline is None else min(limit, deadline - time.monotonic())
+
+    for attempt in range(TELEGRAM_MAX_ATTEMPTS):
+        if _left(timeout) <= 0:
+            return False
+        try:
+            resp = post(
+                f'{api_base.rstrip("/")}/bot{token}/sendMessage',
+                json={'chat_id': chat_id, 'text': text},
+                timeout=_left(timeout),
+            )
+        except requests.RequestException:
+            time.sleep(max(0.0, _left(min(2 ** attempt, TELEGRAM_MAX_RETRY_AFTER))))
+            continue
+        status = getattr(resp, 'status_code', 200)
+        if status == 429:
+            if on_rate_limit is not None:
+                on_rate_limit()
+            time.sleep(max(0.0, _left(_retry_after(resp))))
+            continue
         # Best-effort: print non-200 for easier debugging
-        if getattr(resp, 'status_code', 200) >= 400:
-            print(f'[telegram] sendMessage failed: {resp.status_code} {getattr(resp, "text", "")}')
-    except Exception:
+        if status >= 400:
+            print(f'[telegram] sendMessage failed: {status} {getattr(resp, "text", "")}')
+            return False
+        return True
+    print(f'[telegram] sendMessage failed: сообщение не отправлено за {TELEGRAM_MAX_ATTEMPTS} попыток')
+    return False
+
+
+def format_issue_delta(owner: str, feed_url: str, delta: object, timezone: str) -> str:
+    # Алерт по сравнению с прошлым прогоном: новые ошибки подробно, продолжающиеся и исправленные — числом
+    new_grouped: Dict[str, List[object]] = getattr(delta, 'new_grouped', {}) or {}
+    if new_grouped:
+        text = _format_grouped(owner, feed_url, new_grouped, timezone).replace(
+            '❌ Найдены проблемы в офферах:', '🆕 Новые проблемы в офферах:', 1
+        )
+    else:
+        owner_title = _OWNER_TITLES.get((owner or '').lower(), owner)
+        header = f'🔔 Изменения по фиду (владелец: {owner_title})' if owner_title else '🔔 Изменения по фиду'
+        text = '\n'.join([header, '', f'⏰ Время: {now_str(timezone)}', f'🌍 Фид: {feed_url}'])
+    return text + (
+        f'\n\n🆕 Новых ошибок: {getattr(delta, "new", 0)}'
+        f'\n♻ Продолжаются: {getattr(delta, "ongoing", 0)}'
+        f'\n✅ Исправлено: {getattr(delta, "resolved", 0)}'
+    )
+
+
+def format_sample(sample: object) -> str:
+    # Оценка доли офферов с ошибками по выборке: точечная, 95% интервал Уилсона и пересчёт на весь фид
+    sampled = getattr(sample, 'sampled', 0)
+    population = getattr(sample, 'population', 0)
+    rate = getattr(sample, 'rate', 0.0)
+    low, high = getattr(sample, 'bounds', (0.0, 1.0))
+    return (
+        f'Выборка: проверено {sampled} из {population} офферов, с ошибками {getattr(sample, "with_errors", 0)} — '
+        f'{rate:.2%} (95% ДИ {low:.2%}–{high:.2%}), во всём фиде ≈ {round(rate * population)}'
+    )
+
+
+def send_telegram(token: Optional[str], chat_id: Optional[str], text: str, api_base: str = TELEGRAM_API_BASE) -> None:
+    # Синхронная отправка (суточный отчёт); алерты прогона идут через TelegramDispatcher
+    if not token or not chat_id:
+        return
+    for part in split_message(text):
         # Network errors are swallowed; logs on disk retain message
-        pass
+        _post_message(requests.post, api_base, token, chat_id, part, timeout=10)
+
+
+class TelegramDispatcher:
+    """Фоновая отправка сообщений в Telegram.
+
+    submit() только кладёт текст в очередь — проверка фидов не ждёт мессенджер.
+    Фоновый поток собирает сообщения, накопившиеся за coalesce_seconds, склеивает их
+    по (чат, владелец) в пачки до 4096 символов и отправляет с учётом retry_after из 429.
+    close() (и выход из процесса) дожидается отправки очереди, но не дольше flush_seconds
+    (0 — без ограничения): если Telegram недоступен, остаток очереди отбрасывается с одной записью в лог.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str],
+        chat_id: Optional[str],
+        api_base: str = TELEGRAM_API_BASE,
+        timeout: float = 10.0,
+        coalesce_seconds: float = 1.0,
+        flush_seconds: float = TELEGRAM_FLUSH_SECONDS,
+    ) -> None:
+        self.token = token
+        self.chat_id = chat_id
+        self.api_base = api_base
+        self.timeout = timeout
+        self.coalesce_seconds = max(0.0, coalesce_seconds)
+        self.flush_seconds = max(0.0, flush_seconds)
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.dropped = 0
+        self.send_seconds = 0.0
+        self._queue: 'queue.Queue[Optional[Tuple[str, str, str]]]' = queue.Queue()
+        self._session = requests.Session()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._deadline: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str, owner: str = '', chat_id: Optional[str] = None) -> None:
+        chat = chat_id or self.chat_id
+        if not self.token or not chat or not text:
+            return
+        with self._lock:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='telegram', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+                self._queue.put((chat, owner, text))
+        if closed:
+            # После close() отправляем сразу, чтобы сообщение не потерялось
+            self._deliver([(chat, owner, text)], flushing=False)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        # timeout — сколько ждать отправки очереди; None — flush_seconds
+        timeout = self.flush_seconds if timeout is None else timeout
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if timeout > 0:
+                self._deadline = time.monotonic() + timeout
+        if thread is not None:
+            self._queue.put(None)
+            # Запас на возврат из последнего запроса: его таймаут уже урезан до дедлайна
+            thread.join(timeout + 1 if timeout > 0 else None)
+        self._session.close()
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch: List[Tuple[str, str, str]] = []
+            if item is None:
+                stop = True
+            else:
+                batch.append(item)
+            deadline = time.monotonic() + self.coalesce_seconds
+            while not stop:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=wait)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            if stop:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        batch.append(item)
+            try:
+                self._deliver(batch)
+            except Exception as e:  # noqa: BLE001
+                print(f'[telegram] ошибка фоновой отправки: {e}')
 
+    def _deliver(self, batch: List[Tuple[str, str, str]], flushing: bool = True) -> None:
+        # Группы отправляются в порядке первого сообщения, внутри группы порядок сохраняется
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        for chat, owner, text in batch:
+            groups.setdefault((chat, owner), []).append(text)
+        packed = [(chat, text) for (chat, _owner), texts in groups.items() for text in pack_messages(texts)]
+        for n, (chat, text) in enumerate(packed):
+            deadline = self._deadline if flushing else None
+            if deadline is not None and time.monotonic() >= deadline:
+                self.dropped += len(packed) - n
+                print(f'[telegram] истекло время отправки очереди при выходе, не отправлено сообщений: {len(packed) - n}')
+                return
+            started = time.perf_counter()
+            ok = _post_message(
+                self._session.post,
+                self.api_base,
+                self.token or '',
+                chat,
+                text,
+                self.timeout,
+                on_rate_limit=self._count_rate_limit,
+                deadline=deadline,
+            )
+            self.send_seconds += time.perf_counter() - started
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
 
+    def _count_rate_limit(self) -> None:
+        self.rate_limited += 1
@@ -1,5 +1,5 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 
 from dotenv import load_dotenv, find_dotenv
@@ -27,6 +27,51 @@ class Settings:
     fids_stat_path: Optional[str]
     probe_origin_enabled: bool
     allow_subdomains: bool
+    concurrent_run: bool = False
+    feed_concurrency: int = 4
+    fetch_concurrency: int = 8
+    per_host_concurrency: int = 2
+    parse_processes: int = 0
+    split_parse_processes: int = 0
+    split_parse_min_bytes: int = 64 * 1024 * 1024
+    fetch_cache_max_bytes: int = 256 * 1024 * 1024
+    http_cache_enabled: bool = True
+    http_cache_dir: str = 'cache'
+    http_cache_max_bytes: int = 100 * 1024 * 1024
+    http_pool_connections: int = 32
+    http_pool_maxsize: int = 4
+    http_retries: int = 1
+    http_backoff_factor: float = 0.5
+    stream_fetch: bool = False
+    max_feed_bytes: int = 0
+    validation_batch_size: int = 2000
+    telegram_api_base: str = 'https://api.telegram.org'
+    telegram_coalesce_seconds: float = 1.0
+    telegram_flush_seconds: float = 30.0
+    log_events: bool = False
+    log_max_bytes: int = 0
+    log_compress: bool = False
+    stage_timings: bool = False
+    offer_index_enabled: bool = False
+    offer_index_path: str = 'cache/offers.sqlite'
+    daemon_interval_minutes: float = 60.0
+    daemon_feed_intervals: Dict[str, float] = field(default_factory=dict)
+    daily_summary_times: List[str] = field(default_factory=lambda: ['09:00', '17:00'])
+    daemon_persist_seconds: int = 60
+    adaptive_schedule: bool = False
+    schedule_min_minutes: float = 15.0
+    schedule_max_minutes: float = 120.0
+    schedule_state_path: str = 'cache/schedule.json'
+    origin_probe_ttl_seconds: float = 300.0
+    subfeed_max_depth: int = 3
+    stats_db_path: Optional[str] = None
+    stats_raw_days: float = 7.0
+    report_top_n: int = 10
+    sample_size: int = 0
+    sample_fraction: float = 0.0
+    sample_full_hours: float = 24.0
+    sample_escalate_rate: float = 0.01
+    sample_state_path: str = 'cache/sampling.json'
 
 
 def _split_csv(value: Optional[str]) -> List[str]:
@@ -35,6 +80,16 @@ def _split_csv(value: Optional[str]) -> List[str]:
     return [v.strip() for v in value.split(',') if v.strip()]
 
 
+def _parse_intervals(value: Optional[str]) -> Dict[str, float]:
+    # "url=минуты,url=минуты"; '=' ищется с конца, так что query-параметры в url не мешают
+    intervals: Dict[str, float] = {}
+    for item in _split_csv(value):
+        url, sep, minutes = item.rpartition('=')
+        if sep and url.strip():
+            intervals[url.strip()] = float(minutes)
+    return intervals
+
+
 def load_settings() -> Settings:
     # Надёжно подхватываем .env из корня репозитория, даже если current working directory другой
     env_path = find_dotenv(usecwd=True)
@@ -72,7 +127,73 @@ def load_settings() -> Settings:
         repo_root = Path(__file__).resolve().parent.parent
         fids_stat_path = str((repo_root / fids_stat_path).resolve())
     probe_origin_enabled = (os.getenv('ORIGIN_PROBE_ENABLED', 'false').lower() in ['1', 'true', 'yes', 'y', 'on'])
+    # Сколько секунд результат проверки сайта переиспользуется следующими прогонами (0 — только внутри прогона)
+    origin_probe_ttl_seconds = float(os.getenv('ORIGIN_PROBE_TTL_SECONDS', '300'))
+    # Глубина обхода вложенных индексов (feed.xml внутри feed.xml); 1 — только подфиды корня
+    subfeed_max_depth = int(os.getenv('SUBFEED_MAX_DEPTH', '3'))
     allow_subdomains = (os.getenv('ALLOW_SUBDOMAINS', 'false').lower() in ['1', 'true', 'yes', 'y', 'on'])
+    # Параллельный прогон: фиды и подфиды качаются одновременно, разбор — в пуле процессов
+    concurrent_run = (os.getenv('CONCURRENT_RUN', 'false').lower() in ['1', 'true', 'yes', 'y', 'on'])
+    feed_concurrency = int(os.getenv('FEED_CONCURRENCY', '4'))
+    fetch_concurrency = int(os.getenv('FETCH_CONCURRENCY', '8'))
+    per_host_concurrency = int(os.getenv('PER_HOST_CONCURRENCY', '2'))
+    parse_processes = int(os.getenv('PARSE_PROCESSES', '0'))
+    # Тело большого фида режется по офферам и проверяется в нескольких процессах (0 — выключено)
+    split_parse_processes = int(os.getenv('SPLIT_PARSE_PROCESSES', '0'))
+    split_parse_min_bytes = int(float(os.getenv('SPLIT_PARSE_MIN_MB', '64')) * 1024 * 1024)
+    # Сколько скачанных тел держать в памяти за прогон для повторного использования
+    fetch_cache_max_bytes = int(os.getenv('FETCH_CACHE_MAX_MB', '256')) * 1024 * 1024
+    # Кэш между прогонами (ETag/Last-Modified, хэш тела, результат проверки) — рядом с каталогом логов
+    http_cache_enabled = (os.getenv('HTTP_CACHE_ENABLED', 'true').lower() in ['1', 'true', 'yes', 'y', 'on'])
+    http_cache_dir = os.getenv('HTTP_CACHE_DIR') or str(Path(log_dir).parent / 'cache')
+    http_cache_max_bytes = int(os.getenv('HTTP_CACHE_MAX_MB', '100')) * 1024 * 1024
+    # Пул keep-alive соединений: число хостов в пуле и максимум соединений к одному хосту
+    http_pool_connections = int(os.getenv('HTTP_POOL_CONNECTIONS', '32'))
+    http_pool_maxsize = int(os.getenv('HTTP_POOL_MAXSIZE', '4'))
+    http_retries = int(os.getenv('HTTP_RETRIES', '1'))
+    http_backoff_factor = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
+    # Потоковая загрузка: тело фида сразу идёт в парсер и не хранится целиком
+    stream_fetch = (os.getenv('STREAM_FETCH', 'false').lower() in ['1', 'true', 'yes', 'y', 'on'])
+    max_feed_bytes = int(float(os.getenv('MAX_FEED_MB', '0')) * 1024 * 1024)
+    # Пакетная (numpy) проверка офферов пачками по N штук; 0 — построчно
+    validation_batch_size = int(os.getenv('VALIDATION_BATCH_SIZE', '2000'))
+    # Адрес Bot API (можно указать локальный фейковый сервер) и окно склейки алертов, с
+    telegram_api_base = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org')
+    telegram_coalesce_seconds = float(os.getenv('TELEGRAM_COALESCE_SECONDS', '1'))
+    # Сколько при выходе ждать отправки очереди алертов, с (0 — без ограничения)
+    telegram_flush_seconds = float(os.getenv('TELEGRAM_FLUSH_SECONDS', '30'))
+    # JSONL-лог событий рядом с текстовым, ротация логов по размеру и gzip старых дней
+    log_events = (os.getenv('LOG_EVENTS', 'false').lower() in ['1', 'true', 'yes', 'y', 'on'])
+    log_max_bytes = int(float(os.getenv('LOG_MAX_MB', '0')) * 1024 * 1024)
+    log_compress = (os.getenv('LOG_COMPRESS', 'false').lower() in ['1', 'true', 'yes', 'y', 'on'])
+    # Замер времени по стадиям (fetch, parse, validate, ...) и сводка в конце прогона; включается и флагом --profile
+    stage_timings = (os.getenv('STAGE_TIMINGS', 'false').lower() in ['1', 'true', 'yes', 'y', 'on'])
+    # Индекс офферов (id → хэш полей и ошибки): проверяются только новые и изменённые офферы
+    offer_index_enabled = (os.getenv('OFFER_INDEX', 'false').lower() in ['1', 'true', 'yes', 'y', 'on'])
+    offer_index_path = os.getenv('OFFER_INDEX_PATH') or str(Path(http_cache_dir) / 'offers.sqlite')
+    # Режим демона (--daemon): интервал проверки фида (минуты, можно переопределить для отдельных фидов),
+    # время суточных отчётов и как часто сохранять счётчики в fids_stat.json
+    daemon_interval_minutes = float(os.getenv('DAEMON_INTERVAL_MINUTES', '60'))
+    daemon_feed_intervals = _parse_intervals(os.getenv('FEED_INTERVALS'))
+    daily_summary_times = _split_csv(os.getenv('DAILY_SUMMARY_TIMES', '09:00,17:00'))
+    daemon_persist_seconds = int(os.getenv('DAEMON_PERSIST_SECONDS', '60'))
+    # Адаптивное расписание: интервал фида подстраивается под частоту изменений и стоимость проверки
+    adaptive_schedule = (os.getenv('ADAPTIVE_SCHEDULE', 'false').lower() in ['1', 'true', 'yes', 'y', 'on'])
+    schedule_min_minutes = float(os.getenv('SCHEDULE_MIN_MINUTES', '15'))
+    schedule_max_minutes = float(os.getenv('SCHEDULE_MAX_MINUTES', '120'))
+    schedule_state_path = os.getenv('SCHEDULE_STATE_PATH') or str(Path(http_cache_dir) / 'schedule.json')
+    # База статистики прогонов (SQLite); по умолчанию рядом с fids_stat.json, который из неё пересобирается
+    stats_db_path = os.getenv('STATS_DB_PATH')
+    # История по фидам: сколько дней хранить каждую проверку (дальше — часовые агрегаты); строк в --report
+    stats_raw_days = float(os.getenv('STATS_RAW_DAYS', '7'))
+    report_top_n = int(os.getenv('REPORT_TOP_N', '10'))
+    # Выборочная проверка больших фидов: проверяются max(SAMPLE_SIZE, SAMPLE_FRACTION · офферов) случайных офферов,
+    # все — раз в SAMPLE_FULL_HOURS и сразу, если доля офферов с ошибками в выборке ≥ SAMPLE_ESCALATE_PERCENT
+    sample_size = int(os.getenv('SAMPLE_SIZE', '0'))
+    sample_fraction = float(os.getenv('SAMPLE_FRACTION', '0'))
+    sample_full_hours = float(os.getenv('SAMPLE_FULL_HOURS', '24'))
+    sample_escalate_rate = float(os.getenv('SAMPLE_ESCALATE_PERCENT', '1')) / 100
+    sample_state_path = os.getenv('SAMPLE_STATE_PATH') or str(Path(http_cache_dir) / 'sampling.json')
 
     return Settings(
         owners=owners,
@@ -88,6 +209,51 @@ def load_settings() -> Settings:
         fids_stat_path=fids_stat_path,
         probe_origin_enabled=probe_origin_enabled,
         allow_subdomains=allow_subdomains,
+        concurrent_run=concurrent_run,
+        feed_concurrency=feed_concurrency,
+        fetch_concurrency=fetch_concurrency,
+        per_host_concurrency=per_host_concurrency,
+        parse_processes=parse_processes,
+        split_parse_processes=split_parse_processes,
+        split_parse_min_bytes=split_parse_min_bytes,
+        fetch_cache_max_bytes=fetch_cache_max_bytes,
+        http_cache_enabled=http_cache_enabled,
+        http_cache_dir=http_cache_dir,
+        http_cache_max_bytes=http_cache_max_bytes,
+        http_pool_connections=http_pool_connections,
+        http_pool_maxsize=http_pool_maxsize,
+        http_retries=http_retries,
+        http_backoff_factor=http_backoff_factor,
+        stream_fetch=stream_fetch,
+        max_feed_bytes=max_feed_bytes,
+        validation_batch_size=validation_batch_size,
+        telegram_api_base=telegram_api_base,
+        telegram_coalesce_seconds=telegram_coalesce_seconds,
+        telegram_flush_seconds=telegram_flush_seconds,
+        log_events=log_events,
+        log_max_bytes=log_max_bytes,
+        log_compress=log_compress,
+        stage_timings=stage_timings,
+        offer_index_enabled=offer_index_enabled,
+        offer_index_path=offer_index_path,
+        daemon_interval_minutes=daemon_interval_minutes,
+        daemon_feed_intervals=daemon_feed_intervals,
+        daily_summary_times=daily_summary_times,
+        daemon_persist_seconds=daemon_persist_seconds,
+        adaptive_schedule=adaptive_schedule,
+        schedule_min_minutes=schedule_min_minutes,
+        schedule_max_minutes=schedule_max_minutes,
+        schedule_state_path=schedule_state_path,
+        origin_probe_ttl_seconds=origin_probe_ttl_seconds,
+        subfeed_max_depth=subfeed_max_depth,
+        stats_db_path=stats_db_path,
+        stats_raw_days=stats_raw_days,
+        report_top_n=report_top_n,
+        sample_size=sample_size,
+        sample_fraction=sample_fraction,
+        sample_full_hours=sample_full_hours,
+        sample_escalate_rate=sample_escalate_rate,
+        sample_state_path=sample_state_path,
     )
 
 
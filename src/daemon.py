@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import datetime as dt
+import signal
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pytz
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MAX_INSTANCES, JobEvent
+from apscheduler.executors.pool import ThreadPoolExecutor as JobExecutor
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+try:
+    from .config import Settings
+    from .fetch import domain_match_cache_stats
+    from .main import RunContext, RunTotals, _timed_feed, open_run_log, open_schedule, record_schedule, save_daily_stats, send_daily_summary
+    from .timing import RunTimings
+except Exception:  # noqa: BLE001
+    from config import Settings  # type: ignore
+    from fetch import domain_match_cache_stats  # type: ignore
+    from main import RunContext, RunTotals, _timed_feed, open_run_log, open_schedule, record_schedule, save_daily_stats, send_daily_summary  # type: ignore
+    from timing import RunTimings  # type: ignore
+
+# Первые проверки фидов разносятся по этому окну, чтобы при старте не качать всё разом
+DAEMON_STAGGER_SECONDS = 60
+
+
+def feed_owners(settings: Settings) -> Dict[str, List[str]]:
+    # Один фид у нескольких владельцев — одна задача: фид качается и проверяется один раз
+    feeds: Dict[str, List[str]] = {}
+    for owner_key, owner in settings.owners.items():
+        for feed_url in owner.feeds:
+            feeds.setdefault(feed_url, []).append(owner_key)
+    return feeds
+
+
+class FeedDaemon:
+    """Долгоживущий режим (--daemon): проверки фидов по расписанию в одном процессе.
+
+    Пулы соединений и процессов, кэши и очередь Telegram живут между проверками. У каждого
+    фида своя задача с интервалом; max_instances=1 — медленный фид не запускается повторно,
+    пока идёт прошлая проверка. Счётчики копятся в памяти и периодически пишутся
+    строкой в базу статистики (StatsStore), суточные отчёты отправляются по DAILY_SUMMARY_TIMES.
+    С ADAPTIVE_SCHEDULE интервал фида пересчитывается после каждой проверки (AdaptiveSchedule).
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.tz = pytz.timezone(settings.timezone)
+        self.run_log = open_run_log(settings)
+        self.ctx = RunContext.from_settings(settings)
+        self.ctx.run_log = self.run_log
+        # Память по фиду — только если задачи фидов идут по одной и без пулов процессов
+        serial = settings.feed_concurrency <= 1 and not settings.concurrent_run and settings.split_parse_processes == 0
+        self.ctx.timings = RunTimings(settings.stage_timings, per_feed_rss=serial)
+        self.schedule = open_schedule(settings)
+        self._totals = RunTotals()
+        self._since = time.time()
+        self._fetch_hits = 0
+        self._fetch_misses = 0
+        self._domain_seen = domain_match_cache_stats()
+        self._telegram_seen = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.scheduler = BackgroundScheduler(
+            timezone=self.tz,
+            executors={
+                'default': JobExecutor(max(1, settings.feed_concurrency)),
+                # Отчёты и сохранение статистики не ждут, пока освободятся потоки фидов
+                'service': JobExecutor(1),
+            },
+            job_defaults={'max_instances': 1, 'coalesce': True, 'misfire_grace_time': None},
+        )
+
+    def check_feed(self, feed_url: str, owners: List[str]) -> None:
+        ctx = self.ctx.next_run(self.settings)
+        # Сообщения копятся в буфере и пишутся одним блоком, чтобы секции фидов не перемешивались
+        messages: List[str] = []
+        started = time.perf_counter()
+        runs = [_timed_feed(self.settings, owner, feed_url, self.run_log.path, ctx, log=messages.append) for owner in owners]
+        if self._adaptive(feed_url):
+            interval = record_schedule(self.schedule, ctx, feed_url, time.perf_counter() - started)
+            self.scheduler.reschedule_job(feed_url, trigger=IntervalTrigger(seconds=interval, timezone=self.tz))
+            messages.append(f'🗓 Следующая проверка фида через {interval / 60:.1f} мин')
+        with self._lock:
+            for message in messages:
+                self.run_log.info(message)
+            for run in runs:
+                self._totals.add(run)
+            self._fetch_hits += ctx.fetch_cache.hits
+            self._fetch_misses += ctx.fetch_cache.misses
+
+    def _adaptive(self, feed_url: str) -> bool:
+        # Интервал из FEED_INTERVALS задан явно и не подстраивается
+        return self.schedule is not None and feed_url not in self.settings.daemon_feed_intervals
+
+    def persist(self) -> None:
+        # Записывает накопленное с прошлого сохранения в базу статистики
+        if self.schedule is not None:
+            self.schedule.save()
+        if self.ctx.sampling is not None:
+            self.ctx.sampling.save()
+        with self._lock:
+            totals, self._totals = self._totals, RunTotals()
+            since, self._since = self._since, time.time()
+            fetch_hits, fetch_misses = self._fetch_hits, self._fetch_misses
+            self._fetch_hits = self._fetch_misses = 0
+        domain_hits, domain_misses = domain_match_cache_stats()
+        seen_hits, seen_misses = self._domain_seen
+        self._domain_seen = (domain_hits, domain_misses)
+        timings = self.ctx.timings.take()
+        if self.ctx.notifier is not None:
+            sent_seconds = self.ctx.notifier.send_seconds
+            timings.add('telegram', sent_seconds - self._telegram_seen)
+            self._telegram_seen = sent_seconds
+        if not totals.total_feeds:
+            return
+        counters = totals.counters()
+        counters.update(
+            fetch_cache_hits=fetch_hits,
+            fetch_cache_misses=fetch_misses,
+            domain_cache_hits=domain_hits - seen_hits,
+            domain_cache_misses=domain_misses - seen_misses,
+        )
+        stage_seconds = timings.stage_seconds() if timings.enabled else {}
+        save_daily_stats(self.settings, counters, stage_seconds, totals.feeds, since, mode='daemon')
+        if self.ctx.http_cache is not None:
+            self.ctx.http_cache.prune()
+        if timings.enabled:
+            self.run_log.info(timings.summary())
+
+    def send_summary(self) -> None:
+        self.persist()
+        send_daily_summary(self.settings, self.run_log)
+
+    def add_jobs(self) -> None:
+        feeds = feed_owners(self.settings)
+        now = dt.datetime.now(self.tz)
+        for n, (feed_url, owners) in enumerate(feeds.items()):
+            seconds = self.settings.daemon_feed_intervals.get(feed_url, self.settings.daemon_interval_minutes) * 60
+            start = now + dt.timedelta(seconds=n * DAEMON_STAGGER_SECONDS / len(feeds))
+            if self._adaptive(feed_url):
+                # После перезапуска фид проверяется в срок из сохранённого расписания, а не сразу
+                seconds = self.schedule.interval(feed_url)
+                stats = self.schedule.feeds.get(feed_url)
+                if stats is not None and stats.next_due:
+                    start = max(start, dt.datetime.fromtimestamp(stats.next_due, self.tz))
+            self.scheduler.add_job(
+                self.check_feed,
+                IntervalTrigger(seconds=seconds, timezone=self.tz),
+                args=(feed_url, owners),
+                id=feed_url,
+                name=f'feed {feed_url}',
+                next_run_time=start,
+            )
+        for at in self.settings.daily_summary_times:
+            hour, _, minute = at.partition(':')
+            self.scheduler.add_job(
+                self.send_summary,
+                CronTrigger(hour=int(hour), minute=int(minute or 0), timezone=self.tz),
+                id=f'summary {at}',
+                executor='service',
+            )
+        self.scheduler.add_job(
+            self.persist,
+            IntervalTrigger(seconds=max(1, self.settings.daemon_persist_seconds), timezone=self.tz),
+            id='persist',
+            executor='service',
+        )
+        self.scheduler.add_listener(self._on_event, EVENT_JOB_ERROR | EVENT_JOB_MAX_INSTANCES)
+        times = ', '.join(self.settings.daily_summary_times) or 'нет'
+        if self.schedule is not None:
+            interval = f'адаптивный {self.settings.schedule_min_minutes:g}–{self.settings.schedule_max_minutes:g} мин'
+        else:
+            interval = f'{self.settings.daemon_interval_minutes:g} мин'
+        self.run_log.info(f'🛰 Демон запущен: фидов={len(feeds)}, интервал={interval}, отчёты в {times} ({self.settings.timezone})')
+
+    def _on_event(self, event: JobEvent) -> None:
+        if event.code == EVENT_JOB_MAX_INSTANCES:
+            self.run_log.info(f'⏭ {event.job_id}: прошлая проверка ещё идёт, запуск пропущен')
+            return
+        exception: Optional[BaseException] = getattr(event, 'exception', None)
+        self.run_log.info(f'💥 Задача {event.job_id} завершилась с ошибкой: {exception!r}')
+
+    def stop(self, *_: object) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.add_jobs()
+        self.scheduler.start()
+        try:
+            self._stop.wait()
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        # Текущие проверки доводятся до конца, очередь алертов отправляется, счётчики сохраняются
+        self.run_log.info('🛑 Остановка демона: ждём текущие проверки')
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=True)
+        self.ctx.close()
+        if self.ctx.notifier is not None:
+            self.ctx.notifier.close()
+        self.persist()
+        self.run_log.info('🛑 Демон остановлен, статистика сохранена')
+        self.run_log.close()
+
+
+def run_daemon(settings: Settings) -> None:
+    FeedDaemon(settings).run()
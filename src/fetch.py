@@ -1,12 +1,41 @@
 from __future__ import annotations
 
 import re
+import socket
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
-from typing import Iterable, List, Optional
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit, urlunsplit
 
 import time
 import requests
 from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+try:
+    from urllib3.exceptions import NameResolutionError
+except ImportError:  # urllib3 1.x: ошибка DNS — это NewConnectionError
+    NameResolutionError = None  # type: ignore[assignment,misc]
+
+
+@dataclass
+class FetchTimings:
+    # Миллисекунды. dns/connect равны 0, если использовано уже открытое keep-alive соединение.
+    dns_ms: float = 0.0
+    connect_ms: float = 0.0  # TCP + TLS
+    ttfb_ms: float = 0.0  # от отправки запроса до заголовков ответа (включая ретраи)
+    download_ms: float = 0.0
+    total_ms: float = 0.0
 
 
 @dataclass
@@ -15,27 +44,414 @@ class FetchResult:
     status_code: int
     content: Optional[bytes]
     error: Optional[str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    timings: Optional[FetchTimings] = None
+    size: Optional[int] = None  # распакованный размер тела; при потоковой загрузке content не хранится
+    too_large: bool = False
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status_code == 304
+
+
+class FeedTooLarge(Exception):
+    def __init__(self, url: str, limit: int, read: int) -> None:
+        super().__init__(f'Размер фида превысил лимит {limit} байт (прочитано {read} байт)')
+        self.url = url
+        self.limit = limit
+        self.read = read
+
+
+class HostLimiter:
+    """Ограничивает число одновременных запросов: всего и на один хост."""
+
+    def __init__(self, global_limit: int, per_host_limit: int) -> None:
+        self._global = threading.BoundedSemaphore(max(1, global_limit))
+        self._per_host_limit = max(1, per_host_limit)
+        self._hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = _normalize_host(extract_domain(url or '') or '')
+        with self._lock:
+            sem = self._hosts.get(host)
+            if sem is None:
+                sem = self._hosts[host] = threading.BoundedSemaphore(self._per_host_limit)
+            return sem
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        # Сначала слот хоста, потом глобальный — чтобы не держать глобальный слот в ожидании медленного хоста
+        with self._host_semaphore(url):
+            with self._global:
+                yield
+
+
+def normalize_url(url: str) -> str:
+    # Ключ кэша: регистр схемы/хоста, порт по умолчанию и фрагмент не влияют на ответ сервера
+    raw = (url or '').strip()
+    try:
+        parts = urlsplit(raw)
+        port = parts.port
+    except ValueError:
+        return raw
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        netloc += f':{port}'
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+class FetchCache:
+    """Кэш загрузок на один прогон: каждый URL скачивается не больше одного раза.
+
+    Одновременные запросы одного URL ждут первую загрузку. Тела хранятся в пределах
+    max_bytes, самые старые вытесняются первыми.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries: 'OrderedDict[str, FetchResult]' = OrderedDict()
+        self._inflight: Dict[str, Tuple[threading.Event, List[FetchResult]]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, url: str, fetch: Callable[[], FetchResult]) -> FetchResult:
+        key = normalize_url(url)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return cached
+            waiting = self._inflight.get(key)
+            if waiting is None:
+                self.misses += 1
+                waiting = self._inflight[key] = (threading.Event(), [])
+                owner = True
+            else:
+                self.hits += 1
+                owner = False
+        done, holder = waiting
+        if not owner:
+            done.wait()
+            return holder[0]
+        result = FetchResult(url=url, status_code=0, content=None, error='fetch failed')
+        try:
+            result = fetch()
+        finally:
+            holder.append(result)
+            with self._lock:
+                self._store(key, result)
+                self._inflight.pop(key, None)
+            done.set()
+        return result
+
+    def _store(self, key: str, result: FetchResult) -> None:
+        size = len(result.content or b'')
+        if size > self.max_bytes:
+            return
+        self._entries[key] = result
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.content or b'')
 
 
-def fetch_url(url: str, timeout_seconds: int, user_agent: str, connect_timeout: Optional[int] = None, read_timeout: Optional[int] = None, retries: int = 1) -> FetchResult:
+def fetch_url(url: str, timeout_seconds: int, user_agent: str, connect_timeout: Optional[int] = None, read_timeout: Optional[int] = None, retries: int = 1, limiter: Optional[HostLimiter] = None, extra_headers: Optional[Dict[str, str]] = None, fetcher: Optional['Fetcher'] = None) -> FetchResult:
+    if fetcher is not None:
+        # Пул соединений, таймауты и ретраи настроены в Fetcher
+        return fetcher.fetch(url, extra_headers)
     headers = {"User-Agent": user_agent}
+    if extra_headers:
+        headers.update(extra_headers)
     connect = connect_timeout or timeout_seconds
     read = read_timeout or timeout_seconds
     attempt = 0
     while True:
         attempt += 1
         try:
-            resp = requests.get(url, headers=headers, timeout=(connect, read))
-            return FetchResult(url=url, status_code=resp.status_code, content=resp.content, error=None)
+            if limiter is not None:
+                with limiter.slot(url):
+                    resp = requests.get(url, headers=headers, timeout=(connect, read))
+            else:
+                resp = requests.get(url, headers=headers, timeout=(connect, read))
+            return FetchResult(
+                url=url,
+                status_code=resp.status_code,
+                content=resp.content,
+                error=None,
+                etag=resp.headers.get('ETag'),
+                last_modified=resp.headers.get('Last-Modified'),
+            )
         except Exception as exc:  # noqa: BLE001
             if attempt > max(1, retries):
                 return FetchResult(url=url, status_code=0, content=None, error=str(exc))
             time.sleep(min(2 ** (attempt - 1), 4))
 
 
+# Тайминги установки соединения пишутся в thread-local: один поток ведёт один запрос за раз
+_connect_timings = threading.local()
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Не ждём дольше этого, даже если сервер прислал больший Retry-After
+RETRY_AFTER_MAX_SECONDS = 60
+
+# Проверка доступности сайта: HEAD, а если сервер ответил на него ошибкой — GET одного байта
+PROBE_RANGE_HEADERS = {'Range': 'bytes=0-0'}
+
+
+def _create_connection(
+    host: str,
+    port: int,
+    timeout: object,
+    source_address: Optional[Tuple[str, int]],
+    socket_options: Optional[Iterable[Tuple[int, int, Union[int, bytes]]]],
+) -> socket.socket:
+    # Как urllib3.util.connection.create_connection: все адреса getaddrinfo по очереди (IPv6/IPv4),
+    # таймаут подключения — на каждую попытку; время разрешения имени пишется в тайминги запроса
+    started = time.perf_counter()
+    try:
+        infos = socket.getaddrinfo(host.strip('[]'), port, allowed_gai_family(), socket.SOCK_STREAM)
+    finally:
+        _connect_timings.dns_ms = getattr(_connect_timings, 'dns_ms', 0.0) + (time.perf_counter() - started) * 1000
+    err: Optional[OSError] = None
+    for family, socktype, proto, _canonname, address in infos:
+        sock = None
+        try:
+            sock = socket.socket(family, socktype, proto)
+            for option in socket_options or ():
+                sock.setsockopt(*option)
+            if timeout is None or isinstance(timeout, (int, float)):
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(address)
+            return sock
+        except OSError as e:
+            err = e
+            if sock is not None:
+                sock.close()
+    if err is not None:
+        raise err
+    raise OSError('getaddrinfo returns an empty list')
+
+
+class _TimedConnectionMixin:
+    def _new_conn(self):  # type: ignore[no-untyped-def]
+        # Тот же разбор ошибок, что в HTTPConnection._new_conn; подключение — через _create_connection
+        try:
+            sock = _create_connection(self._dns_host, self.port, self.timeout, self.source_address, self.socket_options)
+        except socket.gaierror as e:
+            if NameResolutionError is None:
+                raise NewConnectionError(self, f'Failed to establish a new connection: {e}') from e
+            raise NameResolutionError(self.host, self, e) from e
+        except socket.timeout as e:
+            raise ConnectTimeoutError(self, f'Connection to {self.host} timed out. (connect timeout={self.timeout})') from e
+        except OSError as e:
+            raise NewConnectionError(self, f'Failed to establish a new connection: {e}') from e
+        sys.audit('http.client.connect', self, self.host, self.port)
+        return sock
+
+    def connect(self) -> None:
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_timings.connect_ms = getattr(_connect_timings, 'connect_ms', 0.0) + (time.perf_counter() - started) * 1000
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs) -> None:  # type: ignore[no-untyped-def]
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+class _CappedRetry(Retry):
+    def parse_retry_after(self, retry_after: str) -> float:
+        return min(super().parse_retry_after(retry_after), RETRY_AFTER_MAX_SECONDS)
+
+
+class Fetcher:
+    """HTTP-клиент прогона: один Session с пулом keep-alive соединений, сжатием и ретраями.
+
+    pool_maxsize с pool_block=True ограничивает число соединений к одному хосту;
+    ретраи с backoff и учётом Retry-After выполняет urllib3.
+    """
+
+    def __init__(
+        self,
+        user_agent: str,
+        timeout_seconds: int,
+        pool_connections: int = 32,
+        pool_maxsize: int = 4,
+        retries: int = 1,
+        backoff_factor: float = 0.5,
+        limiter: Optional[HostLimiter] = None,
+        max_bytes: int = 0,
+    ) -> None:
+        self.timeout = (timeout_seconds, timeout_seconds)
+        self.limiter = limiter
+        self.max_bytes = max_bytes  # 0 — без ограничения
+        retry = _CappedRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = _TimedAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        # Только те кодировки, которые urllib3 умеет распаковать (br — при установленном brotli)
+        self.session.headers.update({'User-Agent': user_agent, 'Accept-Encoding': ACCEPT_ENCODING})
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, url: str, extra_headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        with self.stream(url, extra_headers) as (res, chunks):
+            try:
+                content = b''.join(chunks)
+            except FeedTooLarge as exc:
+                res.error = str(exc)
+                res.too_large = True
+                return res
+            except Exception as exc:  # noqa: BLE001
+                res.error = str(exc)
+                return res
+            if res.error is None:
+                res.content = content
+            return res
+
+    @contextmanager
+    def stream(self, url: str, extra_headers: Optional[Dict[str, str]] = None) -> Iterator[Tuple[FetchResult, Iterator[bytes]]]:
+        """Открывает потоковую загрузку: отдаёт результат с заголовками и итератор распакованных порций тела.
+
+        content в результате не заполняется; size и тайминги загрузки появляются после чтения тела.
+        При превышении max_bytes итератор бросает FeedTooLarge.
+        """
+        with (self.limiter.slot(url) if self.limiter is not None else nullcontext()):
+            _connect_timings.dns_ms = 0.0
+            _connect_timings.connect_ms = 0.0
+            started = time.perf_counter()
+            try:
+                resp = self.session.get(url, headers=extra_headers, timeout=self.timeout, stream=True)
+            except Exception as exc:  # noqa: BLE001
+                yield FetchResult(url=url, status_code=0, content=None, error=str(exc), timings=self._timings(started, None, time.perf_counter())), iter(())
+                return
+            headers_at = time.perf_counter()
+            with resp:
+                res = FetchResult(
+                    url=url,
+                    status_code=resp.status_code,
+                    content=None,
+                    error=None,
+                    etag=resp.headers.get('ETag'),
+                    last_modified=resp.headers.get('Last-Modified'),
+                    timings=self._timings(started, headers_at, headers_at),
+                )
+                yield res, self._iter_body(resp, res, started, headers_at)
+
+    def probe(self, url: str) -> FetchResult:
+        # Тело не читается: HEAD многие серверы не поддерживают (405/403/...), тогда — ranged GET
+        res = self._status(url, 'HEAD', None)
+        if res.error is None and res.status_code >= 400:
+            res = self._status(url, 'GET', PROBE_RANGE_HEADERS)
+        return res
+
+    def _status(self, url: str, method: str, headers: Optional[Dict[str, str]]) -> FetchResult:
+        with (self.limiter.slot(url) if self.limiter is not None else nullcontext()):
+            _connect_timings.dns_ms = 0.0
+            _connect_timings.connect_ms = 0.0
+            started = time.perf_counter()
+            try:
+                # stream=True и закрытие без чтения: если сервер проигнорировал Range, тело не качается
+                with self.session.request(method, url, headers=headers, timeout=self.timeout, stream=True) as resp:
+                    status = resp.status_code
+            except Exception as exc:  # noqa: BLE001
+                return FetchResult(url=url, status_code=0, content=None, error=str(exc), timings=self._timings(started, None, time.perf_counter()))
+            finished = time.perf_counter()
+            return FetchResult(url=url, status_code=status, content=None, error=None, size=0, timings=self._timings(started, finished, finished))
+
+    def _iter_body(self, resp: requests.Response, res: FetchResult, started: float, headers_at: float) -> Iterator[bytes]:
+        limit = self.max_bytes
+        declared = resp.headers.get('Content-Length')
+        # Сжатое тело не больше распакованного — слишком большой Content-Length отсекаем сразу
+        if limit and declared and declared.isdigit() and 'Content-Encoding' not in resp.headers and int(declared) > limit:
+            res.size = 0
+            raise FeedTooLarge(res.url, limit, int(declared))
+        read = 0
+        try:
+            for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                read += len(chunk)
+                if limit and read > limit:
+                    raise FeedTooLarge(res.url, limit, read)
+                yield chunk
+        finally:
+            res.size = read
+            res.timings = self._timings(started, headers_at, time.perf_counter())
+
+    @staticmethod
+    def _timings(started: float, headers_at: Optional[float], finished: float) -> FetchTimings:
+        dns_ms = getattr(_connect_timings, 'dns_ms', 0.0)
+        # connect() включает _new_conn(), где уже учтён DNS
+        connect_ms = max(0.0, getattr(_connect_timings, 'connect_ms', 0.0) - dns_ms)
+        head_ms = ((headers_at or finished) - started) * 1000
+        return FetchTimings(
+            dns_ms=dns_ms,
+            connect_ms=connect_ms,
+            ttfb_ms=max(0.0, head_ms - dns_ms - connect_ms),
+            download_ms=(finished - headers_at) * 1000 if headers_at is not None else 0.0,
+            total_ms=(finished - started) * 1000,
+        )
+
+    def close(self) -> None:
+        self.session.close()
+
+
 def extract_domain(url: str) -> Optional[str]:
-    match = re.match(r"^https?://([^/]+)/?", url.strip())
-    return match.group(1) if match else None
+    # То же, что re.match(r"^https?://([^/]+)/?", url.strip()), но срезами — вызывается на каждый url/picture
+    s = url.strip()
+    if s.startswith('https://'):
+        start = 8
+    elif s.startswith('http://'):
+        start = 7
+    else:
+        return None
+    end = s.find('/', start)
+    host = s[start:] if end < 0 else s[start:end]
+    return host or None
 
 
 def _normalize_host(host: str) -> str:
@@ -45,59 +461,130 @@ def _normalize_host(host: str) -> str:
     return h
 
 
-def is_same_domain(url: str, domain: str, allow_subdomains: bool = False) -> bool:
-    other = _normalize_host(extract_domain(url or '') or '')
-    base = _normalize_host(domain or '')
+# Сколько пар (хост, домен) помнить: в одном фиде обычно 2–3 хоста, размер с запасом на все фиды прогона
+DOMAIN_MATCH_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=DOMAIN_MATCH_CACHE_SIZE)
+def host_matches(host: str, base: str, allow_subdomains: bool = False) -> bool:
+    # Общий LRU для валидатора и extract_subfeed_links; статистика — domain_match_cache_stats()
+    other = _normalize_host(host)
+    base = _normalize_host(base)
     if not allow_subdomains:
         return other == base
     # allow foo.base
     return other == base or other.endswith('.' + base)
 
 
+def domain_match_cache_stats() -> Tuple[int, int]:
+    # (попадания, промахи) кэша host_matches в текущем процессе
+    info = host_matches.cache_info()
+    return info.hits, info.misses
+
+
+def is_same_domain(url: str, domain: str, allow_subdomains: bool = False) -> bool:
+    return host_matches(extract_domain(url or '') or '', domain or '', allow_subdomains)
+
+
 def extract_origin(url: str) -> Optional[str]:
     # returns scheme://host or None
     m = re.match(r"^(https?://[^/]+)/?", url.strip())
     return m.group(1) if m else None
 
 
+# Теги со ссылками на подфиды (с любым пространством имён) и порция, которой тело индекса идёт в парсер
+SUBFEED_LINK_TAGS = ('url', 'link', '{*}url', '{*}link')
+INDEX_SCAN_CHUNK_SIZE = 64 * 1024
+
+
+def is_index_feed(url: str) -> bool:
+    # feed.xml — индекс: ссылки из него проверяются как подфиды
+    return url.lower().endswith('feed.xml')
+
+
+def iter_subfeed_links(source: Union[bytes, Iterable[bytes]], parent_feed_url: str) -> Iterator[str]:
+    """Потоково отдаёт ссылки на подфиды (`<url>`/`<link>` на `.xml` в домене фида) в порядке документа.
+
+    Каждая ссылка отдаётся, как только разобран её элемент, — загрузку подфида можно начинать,
+    не дожидаясь конца индекса. Разобранные элементы удаляются из дерева. Повторы отбрасываются.
+    """
+    parser = etree.XMLPullParser(events=('end',), tag=SUBFEED_LINK_TAGS, recover=True, remove_comments=True, huge_tree=True)
+    parent_domain = extract_domain(parent_feed_url) or ''
+    seen: set = set()
+
+    def _drain() -> Iterator[str]:
+        for _, el in parser.read_events():
+            link = (el.text or '').strip()
+            if link and link not in seen and link.lower().endswith('.xml') and is_same_domain(link, parent_domain):
+                seen.add(link)
+                yield link
+            el.clear(keep_tail=True)
+            node = el
+            while node is not None:
+                parent = node.getparent()
+                if parent is None:
+                    break
+                while node.getprevious() is not None:
+                    del parent[0]
+                node = parent
+
+    if isinstance(source, (bytes, bytearray)):
+        data = memoryview(source)
+        source = (bytes(data[i:i + INDEX_SCAN_CHUNK_SIZE]) for i in range(0, len(data), INDEX_SCAN_CHUNK_SIZE))
+    try:
+        for chunk in source:
+            parser.feed(chunk)
+            yield from _drain()
+        parser.close()
+    except etree.XMLSyntaxError:
+        return
+    yield from _drain()
+
+
 def extract_subfeed_links(feed_xml_bytes: bytes, parent_feed_url: str) -> List[str]:
     # Parse XML and select url-like nodes ending with .xml within same domain
-    parser = etree.XMLParser(recover=True, remove_comments=True)
-    try:
-        root = etree.fromstring(feed_xml_bytes, parser=parser)
-    except Exception:
-        return []
-    parent_domain = extract_domain(parent_feed_url) or ''
-    candidates: List[str] = []
-    # Collect text of <url> elements
-    for el in root.xpath('//*[local-name()="url"]'):
-        t = (el.text or '').strip()
-        if t:
-            candidates.append(t)
-    # Also consider <link> elements
-    for el in root.xpath('//*[local-name()="link"]'):
-        t = (el.text or '').strip()
-        if t:
-            candidates.append(t)
-    subfeeds: List[str] = []
-    for link in candidates:
-        low = link.lower()
-        if not low.endswith('.xml'):
-            continue
-        if is_same_domain(link, parent_domain):
-            subfeeds.append(link)
-    # de-duplicate
-    return list(dict.fromkeys(subfeeds))
+    return list(iter_subfeed_links(feed_xml_bytes, parent_feed_url))
 
 
 def iter_all_feed_urls(root_feed_url: str, root_content: bytes) -> Iterable[str]:
     # If URL ends with feed.xml – include extracted subfeeds. Always include the root itself.
     yield root_feed_url
-    if root_feed_url.lower().endswith('feed.xml'):
-        for sub in extract_subfeed_links(root_content, root_feed_url):
+    if is_index_feed(root_feed_url):
+        for sub in iter_subfeed_links(root_content, root_feed_url):
             yield sub
 
 
+def crawl_feed_urls(
+    root_feed_url: str,
+    root_links: Iterable[str],
+    expand: Callable[[str], Iterable[str]],
+    max_depth: int = 1,
+) -> Iterator[str]:
+    """Корень, затем подфиды в порядке обнаружения (лениво — можно сразу ставить в загрузку).
+
+    Вложенный индекс (…feed.xml) раскрывается сразу за своей ссылкой, пока глубина не больше
+    max_depth: expand(url) скачивает его и отдаёт его ссылки. Каждый URL отдаётся один раз,
+    так что повторы и циклы между индексами не обходятся заново.
+    """
+    visited = {normalize_url(root_feed_url)}
+    yield root_feed_url
+
+    def _walk(links: Iterable[str], depth: int) -> Iterator[str]:
+        for link in links:
+            key = normalize_url(link)
+            if key in visited:
+                continue
+            visited.add(key)
+            # Индекс скачивается до того, как ссылку заберут на проверку: иначе потоковая проверка
+            # заняла бы загрузку, и тело для разбора ссылок не сохранилось бы
+            nested = expand(link) if depth < max_depth and is_index_feed(link) else None
+            yield link
+            if nested is not None:
+                yield from _walk(nested, depth + 1)
+
+    yield from _walk(root_links, 1)
+
+
 def explain_fetch_problem(url: str, status_code: int, error: Optional[str]) -> Optional[str]:
     """
     Возвращает краткое русскоязычное пояснение для менеджеров, почему ссылка могла не открыться.
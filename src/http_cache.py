@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    from .fetch import FetchResult, normalize_url
+except Exception:  # noqa: BLE001
+    from fetch import FetchResult, normalize_url  # type: ignore
+
+# Меняется при изменении правил проверки или формата записей — старые записи игнорируются
+CACHE_VERSION = 2
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    rules: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    result: Optional[dict] = None  # CheckResult.to_dict() прошлой проверки
+    subfeeds: Optional[List[str]] = None  # ссылки, извлечённые из корневого фида
+
+
+def hash_content(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_chunks(chunks: Iterable[bytes], digest: 'hashlib._Hash') -> Iterator[bytes]:
+    # Считает хэш по ходу потоковой загрузки, не копя тело в памяти
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+class HttpCache:
+    """Кэш между прогонами: ETag/Last-Modified, хэш тела и результат проверки по каждому URL.
+
+    Одна запись — один JSON-файл в каталоге кэша. Если суммарный размер больше max_bytes,
+    prune() удаляет самые давно обновлённые записи.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, allow_subdomains: bool) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.rules = f'v{CACHE_VERSION}:allow_subdomains={allow_subdomains}'
+        self.not_modified = 0
+        self.unchanged = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> Path:
+        key = hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()
+        return self.directory / f'{key}.json'
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        try:
+            with self._path(url).open('r', encoding='utf-8') as f:
+                entry = CacheEntry(**json.load(f))
+        except Exception:  # noqa: BLE001
+            return None
+        if entry.rules != self.rules:
+            return None
+        return entry
+
+    def put(self, entry: CacheEntry) -> None:
+        path = self._path(entry.url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with tmp.open('w', encoding='utf-8') as f:
+            json.dump(asdict(entry), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        entry = self.get(url)
+        # Условный запрос имеет смысл, только если по 304 есть что переиспользовать
+        if entry is None or entry.result is None:
+            return {}
+        if entry.subfeeds is None and url.lower().endswith('feed.xml'):
+            return {}
+        headers: Dict[str, str] = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def prune(self) -> int:
+        if not self.directory.exists():
+            return 0
+        files = []
+        total = 0
+        for p in self.directory.glob('*.json'):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        removed = 0
+        for _, size, p in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+class ProbeCache:
+    """Результаты проверки доступности сайтов (origin) между прогонами, с коротким TTL.
+
+    Все origin в одном JSON-файле: читается при создании, записывается в save().
+    """
+
+    def __init__(self, path: str, ttl_seconds: float) -> None:
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                self._entries: Dict[str, list] = dict(json.load(f))
+        except Exception:  # noqa: BLE001
+            self._entries = {}
+
+    def get(self, origin: str) -> Optional[FetchResult]:
+        key = normalize_url(origin)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl_seconds:
+                self.requests += 1
+                return None
+            self.hits += 1
+        _, status, error = entry
+        return FetchResult(url=origin, status_code=status, content=None, error=error, size=0)
+
+    def put(self, origin: str, res: FetchResult) -> None:
+        with self._lock:
+            self._entries[normalize_url(origin)] = [time.time(), res.status_code, res.error]
+
+    def save(self) -> None:
+        now = time.time()
+        with self._lock:
+            entries = {k: v for k, v in self._entries.items() if now - v[0] <= self.ttl_seconds}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with tmp.open('w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.path)
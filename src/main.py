@@ -1,8 +1,15 @@
 from __future__ import annotations
+import cProfile
 import datetime as dt
+import hashlib
+import tempfile
+import time
 import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import pytz
 import sys
@@ -11,19 +18,41 @@ import json
 # Импорты работают и в режиме пакета (python -m src.main), и при запуске как скрипт (python src/main.py)
 try:
     from .config import Settings, load_settings
-    from .fetch import fetch_url, extract_domain, iter_all_feed_urls, extract_origin, explain_fetch_problem
-    from .parser import parse_offers
-    from .validator import validate_offer, ValidationIssue
-    from .alert import NegativeAlert, format_negative, format_summary, send_telegram
-    from .alert import format_grouped_negative, summary_from_json
+    from .fetch import FeedTooLarge, FetchCache, Fetcher, FetchResult, HostLimiter, fetch_url, normalize_url, domain_match_cache_stats, extract_domain, crawl_feed_urls, is_index_feed, iter_subfeed_links, extract_origin, explain_fetch_problem
+    from .http_cache import CacheEntry, HttpCache, ProbeCache, hash_chunks, hash_content
+    from .offer_index import IssueDelta
+    from .parser import FeedFormat, sniff_format
+    from .pipeline import CheckResult, check_offers, check_offers_split
+    from .validator import ValidationIssue
+    from .alert import NegativeAlert, TelegramDispatcher, format_negative, format_summary, send_telegram
+    from .alert import format_grouped_negative, format_issue_delta, format_issue_summary, format_owner_summary, format_sample, summary_from_json
+    from .runlog import RunLog
+    from .sampling import SamplingState
+    from .scheduling import AdaptiveSchedule
+    from .report import build_report
+    from .stats_store import FeedRun, StatsStore
+    from .timing import RunTimings, timed_iter
 except Exception:  # noqa: BLE001
     from config import Settings, load_settings  # type: ignore
-    from fetch import fetch_url, extract_domain, iter_all_feed_urls, extract_origin, explain_fetch_problem  # type: ignore
-    from parser import parse_offers  # type: ignore
-    from validator import validate_offer, ValidationIssue  # type: ignore
-    from alert import NegativeAlert, format_negative, format_summary, send_telegram  # type: ignore
-    from alert import format_grouped_negative, summary_from_json  # type: ignore
-from typing import Dict
+    from fetch import FeedTooLarge, FetchCache, Fetcher, FetchResult, HostLimiter, fetch_url, normalize_url, domain_match_cache_stats, extract_domain, crawl_feed_urls, is_index_feed, iter_subfeed_links, extract_origin, explain_fetch_problem  # type: ignore
+    from http_cache import CacheEntry, HttpCache, ProbeCache, hash_chunks, hash_content  # type: ignore
+    from offer_index import IssueDelta  # type: ignore
+    from parser import FeedFormat, sniff_format  # type: ignore
+    from pipeline import CheckResult, check_offers, check_offers_split  # type: ignore
+    from validator import ValidationIssue  # type: ignore
+    from alert import NegativeAlert, TelegramDispatcher, format_negative, format_summary, send_telegram  # type: ignore
+    from alert import format_grouped_negative, format_issue_delta, format_issue_summary, format_owner_summary, format_sample, summary_from_json  # type: ignore
+    from runlog import RunLog  # type: ignore
+    from sampling import SamplingState  # type: ignore
+    from scheduling import AdaptiveSchedule  # type: ignore
+    from report import build_report  # type: ignore
+    from stats_store import FeedRun, StatsStore  # type: ignore
+    from timing import RunTimings, timed_iter  # type: ignore
+
+
+# Тело больше этого не передаётся в процесс PARSE_PROCESSES через pickle (копия в канале и ещё одна в процессе):
+# оно пишется во временный файл, и процесс читает его порциями
+POOL_PICKLE_MAX_BYTES = 8 * 1024 * 1024
 
 
 def ensure_log_dir(path: str) -> Path:
@@ -48,6 +77,13 @@ def log_public_url(settings: Settings, log_path: Path) -> str | None:
         return None
     return settings.log_public_base_url.rstrip('/') + '/' + log_path.name
 
+def issue_detail_path(settings: Settings, url: str) -> str:
+    # Файл со всеми ошибками тела — в каталоге логов, один на URL за день (перезаписывается следующей проверкой)
+    date_str = dt.datetime.now(pytz.timezone(settings.timezone)).strftime('%Y-%m-%d')
+    key = hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()[:12]
+    return str(Path(settings.log_dir) / f'{date_str}-issues-{key}.jsonl')
+
+
 def stats_json_path(settings: Settings, log_dir_path: Path) -> Path:
     # Определяем путь к JSON: если указан FIDS_STAT_PATH и это директория – храним в <dir>/fids_stat.json
     if getattr(settings, 'fids_stat_path', None):
@@ -56,30 +92,615 @@ def stats_json_path(settings: Settings, log_dir_path: Path) -> Path:
     return log_dir_path / 'fids_stat.json'
 
 
+def stats_db_path(settings: Settings, log_dir_path: Path) -> Path:
+    # База статистики (STATS_DB_PATH), по умолчанию рядом с fids_stat.json
+    if settings.stats_db_path:
+        return Path(settings.stats_db_path)
+    return stats_json_path(settings, log_dir_path).with_suffix('.sqlite')
+
+
 def log_info(log_path: Path, message: str) -> None:
     print(message)
     append_log(log_path, message)
 
 
 
-def process_feed(settings: Settings, owner: str, feed_url: str, log_path: Path) -> Tuple[bool, int, int, int]:
-    # Returns (has_error, offers_checked)
-    log_info(log_path, f'▶ Проверка фида: {feed_url} (владелец: {owner})')
-    res = fetch_url(feed_url, settings.request_timeout_seconds, settings.user_agent)
-    if res.error or res.status_code >= 400 or not res.content:
-        hint = explain_fetch_problem(feed_url, res.status_code, res.error)
-        alert = NegativeAlert(
-            owner=owner,
-            feed_url=feed_url,
-            offer_id='-',
-            message='Фид недоступен, поля не проверены',
-            details=f'status={res.status_code}, error={res.error}',
-            hint=hint,
+@dataclass
+class UrlCheck:
+    # Итог по одной ссылке: загрузка, проверка офферов и заметки для лога
+    url: str
+    fetch: Optional[FetchResult] = None
+    checked: Optional[CheckResult] = None
+    failed_probe: Optional[FetchResult] = None
+    notes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class FeedOutcome:
+    # Что прогон узнал о фиде: хэши тел ссылок и была ли недоступность (для адаптивного расписания),
+    # метрики загрузки и ошибки по полям (для истории в базе статистики)
+    fingerprints: Dict[str, Optional[str]] = field(default_factory=dict)
+    failed: bool = False
+    status: Optional[int] = None  # HTTP-статус корневого фида
+    fetch_ms: float = 0.0  # загрузка фида и подфидов
+    bytes: int = 0
+    issues_by_field: Dict[str, int] = field(default_factory=dict)
+    estimated: bool = False  # хоть одна ссылка проверена выборочно — счётчики ошибок оценочные
+
+    def add_fetch(self, res: Optional[FetchResult]) -> None:
+        if res is None:
+            return
+        if res.timings is not None:
+            self.fetch_ms += res.timings.total_ms
+        self.bytes += _body_size(res)
+
+    def fingerprint(self) -> Optional[str]:
+        # Общий хэш фида; None — если хоть для одной ссылки хэш неизвестен
+        if not self.fingerprints or None in self.fingerprints.values():
+            return None
+        digest = hashlib.sha256()
+        for url in sorted(self.fingerprints):
+            digest.update(f'{url}\0{self.fingerprints[url]}\0'.encode('utf-8'))
+        return digest.hexdigest()
+
+
+def _fetch_ok(res: FetchResult) -> bool:
+    return not (res.error or res.status_code >= 400 or not res.content)
+
+
+def _body_size(res: FetchResult) -> int:
+    return res.size if res.size is not None else len(res.content or b'')
+
+
+@dataclass
+class RunContext:
+    # Общие ресурсы прогона. Без CONCURRENT_RUN всё выполняется последовательно, как раньше.
+    fetcher: Optional[Fetcher] = None
+    fetch_pool: Optional[ThreadPoolExecutor] = None
+    cpu_pool: Optional[ProcessPoolExecutor] = None
+    split_pool: Optional[ProcessPoolExecutor] = None
+    lookahead: int = 1
+    fetch_cache: FetchCache = field(default_factory=FetchCache)
+    http_cache: Optional[HttpCache] = None
+    streaming: bool = False
+    notifier: Optional[TelegramDispatcher] = None
+    run_log: Optional[RunLog] = None
+    timings: RunTimings = field(default_factory=RunTimings)
+    track_changes: bool = False
+    probes: FetchCache = field(default_factory=FetchCache)
+    probe_cache: Optional[ProbeCache] = None
+    probe_pool: Optional[ThreadPoolExecutor] = None
+    sampling: Optional[SamplingState] = None
+    escalate_rate: float = 0.0
+    outcomes: Dict[str, FeedOutcome] = field(default_factory=dict)
+    _fingerprints: Dict[str, str] = field(default_factory=dict)
+    _deltas: Dict[str, IssueDelta] = field(default_factory=dict)
+    _streamed: Dict[str, Tuple[Optional[CheckResult], List[str]]] = field(default_factory=dict)
+    _formats: Dict[str, FeedFormat] = field(default_factory=dict)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> 'RunContext':
+        fetch_cache = FetchCache(max_bytes=settings.fetch_cache_max_bytes)
+        http_cache = None
+        if settings.http_cache_enabled:
+            http_cache = HttpCache(settings.http_cache_dir, settings.http_cache_max_bytes, settings.allow_subdomains)
+        limiter = None
+        if settings.concurrent_run:
+            limiter = HostLimiter(settings.fetch_concurrency, settings.per_host_concurrency)
+        fetcher = Fetcher(
+            settings.user_agent,
+            settings.request_timeout_seconds,
+            pool_connections=settings.http_pool_connections,
+            pool_maxsize=settings.http_pool_maxsize,
+            retries=settings.http_retries,
+            backoff_factor=settings.http_backoff_factor,
+            limiter=limiter,
+            max_bytes=settings.max_feed_bytes,
         )
-        text = format_negative(alert, settings.timezone)
-        log_info(log_path, text)
+        notifier = None
         if settings.telegram_enabled:
-            send_telegram(settings.telegram_bot_token, settings.telegram_chat_id, text)
+            notifier = TelegramDispatcher(
+                settings.telegram_bot_token,
+                settings.telegram_chat_id,
+                api_base=settings.telegram_api_base,
+                coalesce_seconds=settings.telegram_coalesce_seconds,
+                flush_seconds=settings.telegram_flush_seconds,
+            )
+        ctx = cls(
+            fetcher=fetcher,
+            fetch_cache=fetch_cache,
+            http_cache=http_cache,
+            streaming=settings.stream_fetch,
+            notifier=notifier,
+            track_changes=settings.adaptive_schedule,
+        )
+        if settings.probe_origin_enabled:
+            # Проверка сайта идёт в своём пуле одновременно с загрузкой подфида
+            ctx.probe_pool = ThreadPoolExecutor(
+                max_workers=max(1, settings.fetch_concurrency) if settings.concurrent_run else 1,
+                thread_name_prefix='probe',
+            )
+            if settings.origin_probe_ttl_seconds > 0:
+                ctx.probe_cache = ProbeCache(str(Path(settings.http_cache_dir) / 'probes.json'), settings.origin_probe_ttl_seconds)
+        if (settings.sample_size > 0 or settings.sample_fraction > 0) and not settings.offer_index_enabled:
+            # С индексом офферов и так проверяются только изменённые офферы — выборка не нужна
+            ctx.sampling = SamplingState(settings.sample_state_path, settings.sample_size, settings.sample_fraction, settings.sample_full_hours * 3600)
+            ctx.escalate_rate = settings.sample_escalate_rate
+        if settings.split_parse_processes > 0:
+            ctx.split_pool = ProcessPoolExecutor(max_workers=settings.split_parse_processes)
+        if settings.concurrent_run:
+            fetch_workers = max(1, settings.fetch_concurrency)
+            ctx.fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='fetch')
+            ctx.lookahead = fetch_workers
+            if settings.parse_processes > 0:
+                ctx.cpu_pool = ProcessPoolExecutor(max_workers=settings.parse_processes)
+        return ctx
+
+    def fetch(self, settings: Settings, url: str) -> FetchResult:
+        # Корневой фид, его подфиды и одинаковые фиды разных владельцев качаются один раз за прогон
+        def _download() -> FetchResult:
+            headers = self._conditional_headers(url)
+            res = fetch_url(url, settings.request_timeout_seconds, settings.user_agent, extra_headers=headers, fetcher=self.fetcher)
+            self._count_download(res)
+            return res
+        return self.fetch_cache.get_or_fetch(url, _download)
+
+    def _count_download(self, res: FetchResult) -> None:
+        if res.timings is not None:
+            self.timings.add('fetch', res.timings.total_ms / 1000, bytes=_body_size(res))
+
+    def probe(self, origin: str) -> FetchResult:
+        # Один запрос на сайт за прогон (одновременные ждут первый); между прогонами — кэш с TTL
+        return self.probes.get_or_fetch(origin, lambda: self._probe_origin(origin))
+
+    def _probe_origin(self, origin: str) -> FetchResult:
+        cached = self.probe_cache.get(origin) if self.probe_cache is not None else None
+        if cached is not None:
+            return cached
+        res = self.fetcher.probe(origin) if self.fetcher is not None else FetchResult(url=origin, status_code=0, content=None, error='no fetcher')
+        if self.probe_cache is not None:
+            self.probe_cache.put(origin, res)
+        return res
+
+    def probe_async(self, origin: str) -> 'Future[FetchResult]':
+        if self.probe_pool is None:
+            fut: Future = Future()
+            fut.set_result(self.probe(origin))
+            return fut
+        return self.probe_pool.submit(self.probe, origin)
+
+    def check_url(self, settings: Settings, url: str, fetched: Optional[FetchResult] = None) -> UrlCheck:
+        item = UrlCheck(url)
+        if self.streaming and self.fetcher is not None:
+            item.fetch = self.fetch_cache.get_or_fetch(url, lambda: self._stream_check(settings, url))
+            streamed = self._streamed.get(normalize_url(url))
+            if streamed is not None:
+                item.checked, notes = streamed
+                item.notes = list(notes)
+                return item
+            # Тело уже скачано целиком (корневой feed.xml) — проверяем его из памяти
+        else:
+            item.fetch = fetched if fetched is not None else self.fetch(settings, url)
+        if item.fetch.not_modified or _fetch_ok(item.fetch):
+            item.checked = self.check_fetched(settings, url, item.fetch, item.notes.append)
+        return item
+
+    def _stream_check(self, settings: Settings, url: str) -> FetchResult:
+        # Тело не буферизуется: распакованные порции сразу идут в инкрементальный парсер
+        headers = self._conditional_headers(url)
+        notes: List[str] = []
+        checked: Optional[CheckResult] = None
+        with self.fetcher.stream(url, headers) as (res, chunks):
+            if res.not_modified:
+                checked = self._cached_result(url, notes.append)
+            elif not (res.error or res.status_code >= 400):
+                digest = hashlib.sha256()
+                try:
+                    checked = check_offers(
+                        hash_chunks(chunks, digest),
+                        url,
+                        settings.allow_subdomains,
+                        settings.validation_batch_size,
+                        timed=self.timings.enabled,
+                        index_path=settings.offer_index_path if settings.offer_index_enabled else None,
+                        sample_size=self._sample_size(url),
+                        detail_path=issue_detail_path(settings, url),
+                    )
+                except FeedTooLarge as exc:
+                    res.error = str(exc)
+                    res.too_large = True
+                except Exception as exc:  # noqa: BLE001
+                    res.error = str(exc)
+                else:
+                    if res.size:
+                        self._store_result(url, res, digest.hexdigest(), checked, revalidated=True)
+                        self.remember_fingerprint(url, digest.hexdigest())
+                        if self._record_sample(url, checked):
+                            # Тело уже прочитано потоком — все офферы проверяются в следующем прогоне
+                            notes.append(f'🚨 {format_sample(checked.sample)}: выше порога, в следующем прогоне проверяются все офферы')
+                    else:
+                        checked = None
+        self._count_download(res)
+        self._streamed[normalize_url(url)] = (checked, notes)
+        return res
+
+    def _conditional_headers(self, url: str) -> Optional[Dict[str, str]]:
+        if self.http_cache is None:
+            return None
+        # По 304 результат выборочной проверки не переиспользуется, если пора проверить все офферы
+        if self.sampling is not None and self.sampling.full_due(url):
+            entry = self.http_cache.get(url)
+            if entry is not None and (entry.result or {}).get('sample'):
+                return None
+        return self.http_cache.conditional_headers(url)
+
+    def _sample_size(self, url: str) -> int:
+        return self.sampling.sample_size(url) if self.sampling is not None else 0
+
+    def _record_sample(self, url: str, result: CheckResult) -> bool:
+        # Запоминает, целиком ли проверено тело; True — доля ошибок в выборке не ниже порога
+        if self.sampling is None:
+            return False
+        escalate = result.sample is not None and result.sample.rate >= self.escalate_rate
+        self.sampling.record(url, result.offers_checked, sampled=result.sample is not None, escalate=escalate)
+        return escalate
+
+    def cached_subfeeds(self, url: str) -> List[str]:
+        entry = self.http_cache.get(url) if self.http_cache is not None else None
+        return list((entry.subfeeds if entry else None) or [])
+
+    def remember_subfeeds(self, url: str, subfeeds: List[str]) -> None:
+        if self.http_cache is None:
+            return
+        entry = self.http_cache.get(url) or CacheEntry(url=url, rules=self.http_cache.rules)
+        entry.subfeeds = subfeeds
+        self.http_cache.put(entry)
+
+    def index_links(self, url: str, res: FetchResult) -> Iterator[str]:
+        # Ссылки индекса: из тела потоковым разбором, а при 304 — сохранённые с прошлого прогона
+        if res.not_modified:
+            yield from self.cached_subfeeds(url)
+            return
+        if not _fetch_ok(res):
+            return
+        links: List[str] = []
+        for link in iter_subfeed_links(res.content, url):
+            links.append(link)
+            yield link
+        self.remember_subfeeds(url, links)
+
+    def crawl(self, settings: Settings, feed_url: str, res: FetchResult) -> Iterator[str]:
+        # Корень и подфиды, вложенные индексы — до SUBFEED_MAX_DEPTH; ссылки отдаются по мере разбора
+        root_links = self.index_links(feed_url, res) if is_index_feed(feed_url) else iter(())
+        return crawl_feed_urls(
+            feed_url,
+            root_links,
+            lambda link: self.index_links(link, self.fetch(settings, link)),
+            settings.subfeed_max_depth,
+        )
+
+    def _cached_result(self, url: str, emit: Callable[[str], None]) -> Optional[CheckResult]:
+        entry = self.http_cache.get(url) if self.http_cache is not None else None
+        if entry is None or entry.result is None:
+            return None
+        self.http_cache.count('not_modified')
+        self.remember_fingerprint(url, entry.content_hash)
+        emit('♻ Фид не изменился (HTTP 304), используется результат прошлой проверки')
+        return CheckResult.from_dict(entry.result)
+
+    def _store_result(self, url: str, res: FetchResult, content_hash: str, result: CheckResult, revalidated: bool) -> None:
+        cache = self.http_cache
+        if cache is None:
+            return
+        entry = cache.get(url) or CacheEntry(url=url, rules=cache.rules)
+        if revalidated:
+            cache.count('revalidated')
+            entry.result = result.to_dict()
+        entry.content_hash = content_hash
+        entry.etag = res.etag
+        entry.last_modified = res.last_modified
+        cache.put(entry)
+
+    def check_fetched(self, settings: Settings, url: str, res: FetchResult, emit: Callable[[str], None]) -> Optional[CheckResult]:
+        # При 304 или неизменном хэше тела разбор и проверка пропускаются — берём результат прошлого прогона
+        cache = self.http_cache
+        if cache is None:
+            if res.not_modified:
+                return None
+            if self.track_changes:
+                self.remember_fingerprint(url, hash_content(res.content))
+            return self.check(settings, res.content, url, emit)
+        if res.not_modified:
+            return self._cached_result(url, emit)
+        entry = cache.get(url)
+        content_hash = hash_content(res.content)
+        self.remember_fingerprint(url, content_hash)
+        if (
+            entry is not None
+            and entry.result is not None
+            and entry.content_hash == content_hash
+            and not (entry.result.get('sample') and self._sample_size(url) == 0)
+        ):
+            cache.count('unchanged')
+            emit('♻ Содержимое фида не изменилось, используется результат прошлой проверки')
+            result = CheckResult.from_dict(entry.result)
+            self._store_result(url, res, content_hash, result, revalidated=False)
+            return result
+        result = self.check(settings, res.content, url, emit)
+        self._store_result(url, res, content_hash, result, revalidated=True)
+        return result
+
+    def feed_format(self, url: str, content: bytes) -> FeedFormat:
+        # Формат тела определяется один раз и общий для извлечения подфидов и разбора офферов
+        key = normalize_url(url)
+        fmt = self._formats.get(key)
+        if fmt is None:
+            fmt = self._formats[key] = sniff_format(content)
+        return fmt
+
+    def check(self, settings: Settings, content: bytes, url: str, emit: Callable[[str], None]) -> CheckResult:
+        fmt = self.feed_format(url, content)
+        sample_size = self._sample_size(url) if fmt.offer_tags else 0
+        if sample_size:
+            result = self._check_offers(settings, content, url, fmt, sample_size)
+            if not self._record_sample(url, result):
+                return result
+            emit(f'🚨 {format_sample(result.sample)}: выше порога, проверяются все офферы')
+        result = self._check_all(settings, content, url, fmt)
+        self._record_sample(url, result)
+        return result
+
+    def _check_all(self, settings: Settings, content: bytes, url: str, fmt: FeedFormat) -> CheckResult:
+        index_path = settings.offer_index_path if settings.offer_index_enabled else None
+        if fmt.offer_tags and self.split_pool is not None and index_path is None and len(content) >= settings.split_parse_min_bytes:
+            # Индексу офферов нужен один проход по фиду по порядку — с OFFER_INDEX тело не режется
+            result = check_offers_split(
+                content,
+                url,
+                settings.allow_subdomains,
+                self.split_pool,
+                settings.split_parse_processes,
+                settings.validation_batch_size,
+                self.timings.enabled,
+                issue_detail_path(settings, url),
+            )
+            if result is not None:
+                return result
+        return self._check_offers(settings, content, url, fmt, index_path=index_path)
+
+    def _check_offers(
+        self,
+        settings: Settings,
+        content: bytes,
+        url: str,
+        fmt: FeedFormat,
+        sample_size: int = 0,
+        index_path: Optional[str] = None,
+    ) -> CheckResult:
+        args = (
+            content,
+            url,
+            settings.allow_subdomains,
+            settings.validation_batch_size,
+            self.timings.enabled,
+            index_path,
+            fmt,
+            sample_size,
+            issue_detail_path(settings, url),
+        )
+        if self.cpu_pool is None:
+            return check_offers(*args)
+        if len(content) <= POOL_PICKLE_MAX_BYTES:
+            return self.cpu_pool.submit(check_offers, *args).result()
+        with tempfile.NamedTemporaryFile(prefix='fids-', suffix='.xml') as tmp:
+            tmp.write(content)
+            tmp.flush()
+            return self.cpu_pool.submit(check_offers, tmp.name, *args[1:]).result()
+
+    def remember_fingerprint(self, url: str, content_hash: Optional[str]) -> None:
+        if content_hash:
+            self._fingerprints[normalize_url(url)] = content_hash
+
+    def fingerprint(self, url: str) -> Optional[str]:
+        return self._fingerprints.get(normalize_url(url))
+
+    def run_delta(self, url: str, delta: Optional[IssueDelta]) -> Optional[IssueDelta]:
+        # Сравнение с прошлым прогоном считается при первой проверке URL; тот же фид у другого
+        # владельца (или повторная проверка) получает то же сравнение, а не «ничего нового»
+        key = normalize_url(url)
+        if delta is not None:
+            return self._deltas.setdefault(key, delta)
+        return self._deltas.get(key)
+
+    def next_run(self, settings: Settings) -> 'RunContext':
+        # Следующий прогон на тех же пулах, кэшах и очереди алертов (режим демона); кэш загрузок
+        # и сравнения с прошлым прогоном — свои, иначе фид не перекачается
+        return replace(
+            self,
+            fetch_cache=FetchCache(max_bytes=settings.fetch_cache_max_bytes),
+            probes=FetchCache(),
+            outcomes={},
+            _fingerprints={},
+            _deltas={},
+            _streamed={},
+            _formats={},
+        )
+
+    def close(self) -> None:
+        if self.fetcher is not None:
+            self.fetcher.close()
+        if self.fetch_pool is not None:
+            self.fetch_pool.shutdown(wait=True)
+        if self.cpu_pool is not None:
+            self.cpu_pool.shutdown(wait=True)
+        if self.split_pool is not None:
+            self.split_pool.shutdown(wait=True)
+        if self.probe_pool is not None:
+            self.probe_pool.shutdown(wait=True)
+        if self.probe_cache is not None:
+            self.probe_cache.save()
+        if self.sampling is not None:
+            self.sampling.save()
+
+
+def _probe_and_check(settings: Settings, ctx: RunContext, url: str) -> UrlCheck:
+    # Quick origin availability check — if site is down, the subfeed is not checked
+    origin = extract_origin(url) or ''
+    if not (settings.probe_origin_enabled and origin):
+        return ctx.check_url(settings, url)
+    pending = ctx.probe_async(origin)
+    # Подфид качается, пока идёт проверка сайта; при потоковой загрузке скачивание — это и проверка,
+    # поэтому её начинаем только после ответа сайта
+    fetched = None if ctx.streaming else ctx.fetch(settings, url)
+    with ctx.timings.stage('probe'):
+        probe = pending.result()
+    if probe.error or probe.status_code >= 400:
+        return UrlCheck(url, failed_probe=probe)
+    return ctx.check_url(settings, url, fetched)
+
+
+def _stream_root_probe(settings: Settings, ctx: RunContext, url: str) -> Optional[FetchResult]:
+    # Потоковая проверка корня — это и его загрузка, поэтому сайт проверяется до неё; None — сайт доступен
+    origin = extract_origin(url) or ''
+    if not (settings.probe_origin_enabled and origin):
+        return None
+    with ctx.timings.stage('probe'):
+        probe = ctx.probe(origin)
+    return probe if probe.error or probe.status_code >= 400 else None
+
+
+def _iter_checked(settings: Settings, ctx: RunContext, urls: Iterable[str], done: Dict[str, UrlCheck]) -> Iterator[UrlCheck]:
+    # Отдаёт результаты строго в порядке urls; в параллельном режиме держит в работе до ctx.lookahead ссылок
+    if ctx.fetch_pool is None:
+        for url in urls:
+            yield done.get(url) or _probe_and_check(settings, ctx, url)
+        return
+    pending: Deque[Future] = deque()
+    for url in urls:
+        if url in done:
+            fut: Future = Future()
+            fut.set_result(done[url])
+        else:
+            fut = ctx.fetch_pool.submit(_probe_and_check, settings, ctx, url)
+        pending.append(fut)
+        if len(pending) >= ctx.lookahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _notify(settings: Settings, ctx: RunContext, owner: str, text: str) -> None:
+    # Через очередь TelegramDispatcher проверка не ждёт отправку; без него — как раньше, синхронно
+    if not settings.telegram_enabled:
+        return
+    with ctx.timings.stage('alert'):
+        if ctx.notifier is not None:
+            ctx.notifier.submit(text, owner)
+        else:
+            send_telegram(settings.telegram_bot_token, settings.telegram_chat_id, text, settings.telegram_api_base)
+
+
+def _logger(ctx: RunContext, log_path: Path) -> Callable[[str], None]:
+    if ctx.run_log is not None:
+        return ctx.run_log.info
+    return lambda message: log_info(log_path, message)
+
+
+def _event(ctx: RunContext, kind: str, **fields: object) -> None:
+    if ctx.run_log is not None:
+        ctx.run_log.event(kind, **fields)
+
+
+def _record_fetch(ctx: RunContext, owner: str, feed_url: str, url: str, res: Optional[FetchResult]) -> None:
+    if res is None:
+        return
+    if res.timings is not None:
+        # В общий итог загрузка попадает один раз (_count_download), здесь — разбивка по фиду
+        ctx.timings.add('fetch', res.timings.total_ms / 1000, feed_url, bytes=_body_size(res), run_total=False)
+    _event(
+        ctx,
+        'fetch_done',
+        owner=owner,
+        url=url,
+        status=res.status_code,
+        bytes=_body_size(res),
+        not_modified=res.not_modified,
+        error=res.error,
+        timings={k: round(v, 3) for k, v in asdict(res.timings).items()} if res.timings is not None else None,
+    )
+
+
+def _report_delta(
+    settings: Settings,
+    ctx: RunContext,
+    owner: str,
+    url: str,
+    delta: Optional[IssueDelta],
+    emit: Callable[[str], None],
+) -> None:
+    # С индексом офферов в Telegram уходят только изменения: новые ошибки подробно, остальное числом
+    if delta is None:
+        emit('♻ Ошибки те же, что в прошлом прогоне (фид не изменился)')
+        return
+    emit(
+        f'🧮 Офферов проверено заново: {delta.revalidated}, без изменений: {delta.reused}; '
+        f'ошибок новых={delta.new}, продолжаются={delta.ongoing}, исправлено={delta.resolved}'
+    )
+    if delta.new or delta.resolved:
+        _notify(settings, ctx, owner, format_issue_delta(owner, url, delta, settings.timezone))
+
+
+def _send_alert(settings: Settings, ctx: RunContext, alert: NegativeAlert, emit: Callable[[str], None]) -> None:
+    text = format_negative(alert, settings.timezone)
+    emit(text)
+    _notify(settings, ctx, alert.owner, text)
+
+
+def _unavailable_alert(owner: str, url: str, res: FetchResult, message: str) -> NegativeAlert:
+    if res.too_large:
+        return NegativeAlert(owner, url, '-', 'Фид превышает допустимый размер, проверка прервана', res.error, 'Фид слишком большой для проверки (лимит MAX_FEED_MB).')
+    hint = explain_fetch_problem(url, res.status_code, res.error)
+    return NegativeAlert(owner, url, '-', message, f'status={res.status_code}, error={res.error}', hint)
+
+
+def process_feed(
+    settings: Settings,
+    owner: str,
+    feed_url: str,
+    log_path: Path,
+    ctx: Optional[RunContext] = None,
+    log: Optional[Callable[[str], None]] = None,
+    outcome: Optional[FeedOutcome] = None,
+) -> Tuple[bool, int, int, int]:
+    # Returns (has_error, offers_checked, offers_with_errors, total_issues)
+    ctx = ctx or RunContext()
+    emit = log or _logger(ctx, log_path)
+    emit(f'▶ Проверка фида: {feed_url} (владелец: {owner})')
+    _event(ctx, 'feed_start', owner=owner, feed_url=feed_url)
+    outcome = ctx.outcomes[feed_url] = outcome or FeedOutcome()
+    done: Dict[str, UrlCheck] = {}
+    stream_root = ctx.streaming and not feed_url.lower().endswith('feed.xml')
+    failed_probe = _stream_root_probe(settings, ctx, feed_url) if stream_root else None
+    if failed_probe is not None:
+        # Сайт недоступен — тело не проверяется; фид качается только ради проверки доступности, как без потока
+        res = ctx.fetch(settings, feed_url)
+        root_ok = res.not_modified or _fetch_ok(res)
+        done[feed_url] = UrlCheck(feed_url, failed_probe=failed_probe)
+    elif stream_root:
+        # Подфидов нет — корневой фид сразу качается потоком в парсер, без отдельной загрузки
+        root = ctx.check_url(settings, feed_url)
+        res = root.fetch
+        root_ok = root.checked is not None
+        done[feed_url] = root
+    else:
+        res = ctx.fetch(settings, feed_url)
+        root_ok = res.not_modified or _fetch_ok(res)
+    _record_fetch(ctx, owner, feed_url, feed_url, res)
+    outcome.status = res.status_code or None
+    outcome.add_fetch(res)
+    if not root_ok:
+        outcome.failed = True
+        _send_alert(settings, ctx, _unavailable_alert(owner, feed_url, res, 'Фид недоступен, поля не проверены'), emit)
         return True, 0, 0, 0
 
     has_error = False
@@ -87,154 +708,433 @@ def process_feed(settings: Settings, owner: str, feed_url: str, log_path: Path)
     offers_with_errors = 0
     total_issues = 0
 
-    log_info(log_path, f'✅ Фид доступен: status={res.status_code}, bytes={len(res.content or b"")}')
+    emit(f'✅ Фид доступен: status={res.status_code}, bytes={_body_size(res)}')
 
     # Iterate over root and subfeeds when root is feed.xml
-    urls_to_check = list(iter_all_feed_urls(feed_url, res.content))
-    log_info(log_path, f'🔗 Ссылок для проверки: {len(urls_to_check)}')
-    for url in urls_to_check:
-        log_info(log_path, f'→ Проверка ссылки: {url}')
-        # Quick origin availability check — if site is down, skip noisy offer validations
-        origin = extract_origin(url) or ''
-        if settings.probe_origin_enabled and origin:
-            origin_probe = fetch_url(origin, settings.request_timeout_seconds, settings.user_agent)
-            if origin_probe.error or origin_probe.status_code >= 400:
-                hint = explain_fetch_problem(origin, origin_probe.status_code, origin_probe.error)
-                alert = NegativeAlert(owner, url, '-', 'Сайт недоступен, поля не проверены', f'status={origin_probe.status_code}, error={origin_probe.error}', hint)
-                text = format_negative(alert, settings.timezone)
-                log_info(log_path, text)
-                if settings.telegram_enabled:
-                    send_telegram(settings.telegram_bot_token, settings.telegram_chat_id, text)
-                has_error = True
-                continue
-
-        sub = fetch_url(url, settings.request_timeout_seconds, settings.user_agent)
-        if sub.error or sub.status_code >= 400 or not sub.content:
-            hint = explain_fetch_problem(url, sub.status_code, sub.error)
-            alert = NegativeAlert(owner, url, '-', 'Подфид недоступен, поля не проверены', f'status={sub.status_code}, error={sub.error}', hint)
-            text = format_negative(alert, settings.timezone)
-            log_info(log_path, text)
-            if settings.telegram_enabled:
-                send_telegram(settings.telegram_bot_token, settings.telegram_chat_id, text)
+    urls_to_check: Iterable[str] = [feed_url] if done else ctx.crawl(settings, feed_url, res)
+    crawl_seconds = [0.0]
+    if ctx.timings.enabled:
+        urls_to_check = timed_iter(iter(urls_to_check), crawl_seconds)
+    # С пулом загрузок подфиды ставятся в работу по мере разбора индекса, и число ссылок
+    # известно только в конце; последовательно — список собирается заранее, как раньше
+    lazy = ctx.fetch_pool is not None
+    if not lazy:
+        urls_to_check = list(urls_to_check)
+        emit(f'🔗 Ссылок для проверки: {len(urls_to_check)}')
+    links_checked = 0
+    for item in _iter_checked(settings, ctx, urls_to_check, done):
+        links_checked += 1
+        url = item.url
+        emit(f'→ Проверка ссылки: {url}')
+        if url != feed_url:
+            _record_fetch(ctx, owner, feed_url, url, item.fetch)
+            outcome.add_fetch(item.fetch)
+        if item.failed_probe is not None:
+            origin = extract_origin(url) or ''
+            probe = item.failed_probe
+            hint = explain_fetch_problem(origin, probe.status_code, probe.error)
+            _send_alert(settings, ctx, NegativeAlert(owner, url, '-', 'Сайт недоступен, поля не проверены', f'status={probe.status_code}, error={probe.error}', hint), emit)
+            outcome.failed = True
             has_error = True
             continue
 
-        offers = parse_offers(sub.content)
-        offers_checked += len(offers)
-        log_info(log_path, f'📦 Найдено офферов: {len(offers)}')
-        grouped: Dict[str, List[ValidationIssue]] = {}
-        for offer in offers:
-            issues: List[ValidationIssue] = validate_offer(offer.fields, url)
-            if issues:
-                offers_with_errors += 1
-                total_issues += len(issues)
-                grouped.setdefault(offer.id or '-', []).extend(issues)
+        for note in item.notes:
+            emit(note)
+        checked = item.checked
+        if checked is None:
+            _send_alert(settings, ctx, _unavailable_alert(owner, url, item.fetch, 'Подфид недоступен, поля не проверены'), emit)
+            outcome.failed = True
+            has_error = True
+            continue
+
+        outcome.fingerprints[url] = ctx.fingerprint(url)
+
+        offers_checked += checked.offers_checked
+        offers_with_errors += checked.offers_with_errors
+        total_issues += checked.total_issues
+        emit(f'📦 Найдено офферов: {checked.offers_checked}')
+        if checked.sample is not None:
+            outcome.estimated = True
+            emit(f'🎯 {format_sample(checked.sample)}')
+        # Результат может быть общим для двух владельцев одного фида — время учитываем один раз
+        stage_seconds, checked.stage_seconds = checked.stage_seconds, {}
+        for stage, seconds in stage_seconds.items():
+            ctx.timings.add(stage, seconds, feed_url, offers=checked.offers_checked)
+        _event(ctx, 'offers_parsed', owner=owner, url=url, offers=checked.offers_checked)
+        grouped: Dict[str, List[ValidationIssue]] = checked.grouped
+        if settings.offer_index_enabled:
+            _report_delta(settings, ctx, owner, url, ctx.run_delta(url, checked.delta), emit)
         if grouped:
-            text = format_grouped_negative(owner, url, grouped, settings.timezone)
-            log_info(log_path, text)
-            if settings.telegram_enabled:
-                send_telegram(settings.telegram_bot_token, settings.telegram_chat_id, text)
+            by_field: Dict[str, int] = {}
+            for group in checked.summary.values():
+                by_field[group.field] = by_field.get(group.field, 0) + group.count
+            if checked.sample is not None and checked.sample.sampled:
+                # Как и счётчики результата — пересчёт с выборки на всё тело
+                scale = checked.sample.population / checked.sample.sampled
+                by_field = {name: round(count * scale) for name, count in by_field.items()}
+            for name, count in by_field.items():
+                outcome.issues_by_field[name] = outcome.issues_by_field.get(name, 0) + count
+            _event(
+                ctx,
+                'issues_found',
+                owner=owner,
+                url=url,
+                offers_with_errors=checked.offers_with_errors,
+                issues=checked.total_issues,
+                by_field=by_field,
+            )
+            if checked.truncated:
+                # Офферов с ошибками много — в алерте сводка по видам ошибок, подробности — в файле по ссылке
+                detail_url = None
+                if checked.detail_path:
+                    detail_url = log_public_url(settings, Path(checked.detail_path)) or checked.detail_path
+                text = format_issue_summary(
+                    owner, url, checked.summary.values(), checked.offers_with_errors, checked.total_issues, settings.timezone, detail_url
+                )
+            else:
+                text = format_grouped_negative(owner, url, grouped, settings.timezone)
+            if checked.sample is not None:
+                text += f'\n🎯 {format_sample(checked.sample)}'
+            emit(text)
+            if not settings.offer_index_enabled:
+                _notify(settings, ctx, owner, text)
             has_error = True
         else:
-            log_info(log_path, '✓ Ошибок не найдено для этой ссылки')
+            emit('✓ Ошибок не найдено для этой ссылки')
 
+    if not done:
+        ctx.timings.add('subfeeds', crawl_seconds[0], feed_url)
+    if lazy:
+        emit(f'🔗 Проверено ссылок: {links_checked}')
     return has_error, offers_checked, offers_with_errors, total_issues
 
 
-def main() -> None:
-    settings = load_settings()
-    log_path = today_log_file(settings.log_dir, settings.timezone)
-    # Режим суточного отчёта из JSON (для cron 09:00/17:00): python src/main.py --daily-summary
-    if len(sys.argv) > 1 and sys.argv[1] in ('--daily-summary', '--send-daily', '--summary'):
-        stats_dir = ensure_log_dir(settings.log_dir)
-        stats_path = stats_json_path(settings, stats_dir)
-        stats = {
-            'total_feeds': 0,
-            'feeds_with_errors': 0,
-            'total_offers': 0,
-            'offers_with_errors': 0,
-            'total_issues': 0,
-        }
-        # Пытаемся прочитать из основного пути, иначе резервно из корня репо (fids_stat.json)
-        for candidate in (stats_path, Path('fids_stat.json')):
-            try:
-                if candidate.exists():
-                    with candidate.open('r', encoding='utf-8') as f:
-                        data = json.load(f) or {}
-                        if isinstance(data, dict):
-                            stats.update(data)
-                            break
-            except Exception:
-                continue
-        # Формируем суточный отчёт по готовым данным
-        text = summary_from_json(stats, log_public_url(settings, log_path), settings.timezone)
-        print(text)
-        append_log(log_path, text)
-        if settings.telegram_enabled and settings.telegram_enabled_success:
-            send_telegram(settings.telegram_bot_token, settings.telegram_chat_id, text)
+def _timed_feed(
+    settings: Settings,
+    owner: str,
+    feed_url: str,
+    log_path: Path,
+    ctx: RunContext,
+    log: Optional[Callable[[str], None]] = None,
+) -> FeedRun:
+    started = time.perf_counter()
+    outcome = FeedOutcome()
+    with ctx.timings.feed_rss(feed_url):
+        has_error, offers, offers_with_errors, issues = process_feed(settings, owner, feed_url, log_path, ctx, log, outcome)
+    seconds = time.perf_counter() - started
+    ctx.timings.add('feed', seconds, feed_url, offers=offers)
+    return FeedRun(
+        owner,
+        feed_url,
+        has_error,
+        offers,
+        offers_with_errors,
+        issues,
+        seconds,
+        status=outcome.status,
+        failed=outcome.failed,
+        fetch_ms=outcome.fetch_ms,
+        bytes=outcome.bytes,
+        issues_by_field=outcome.issues_by_field,
+        estimated=outcome.estimated,
+    )
+
+
+def open_schedule(settings: Settings) -> Optional[AdaptiveSchedule]:
+    if not settings.adaptive_schedule:
+        return None
+    return AdaptiveSchedule(settings.schedule_state_path, settings.schedule_min_minutes * 60, settings.schedule_max_minutes * 60)
+
+
+def record_schedule(schedule: AdaptiveSchedule, ctx: RunContext, feed_url: str, seconds: float) -> float:
+    outcome = ctx.outcomes.get(feed_url) or FeedOutcome(failed=True)
+    return schedule.record(feed_url, outcome.fingerprint(), outcome.failed, seconds)
+
+
+def run_feeds(
+    settings: Settings,
+    log_path: Path,
+    ctx: RunContext,
+    schedule: Optional[AdaptiveSchedule] = None,
+) -> Iterator[FeedRun]:
+    feeds = [
+        (owner_key, feed_url)
+        for owner_key, owner in settings.owners.items()
+        for feed_url in owner.feeds
+    ]
+    if schedule is not None:
+        # Фиды, которым по адаптивному расписанию ещё рано, в этом прогоне пропускаются
+        due = [(owner_key, feed_url) for owner_key, feed_url in feeds if schedule.is_due(feed_url)]
+        if len(due) < len(feeds):
+            _logger(ctx, log_path)(f'⏭ По расписанию пропущено фидов: {len(feeds) - len(due)} из {len(feeds)}')
+        feeds = due
+    recorded: Set[str] = set()
+
+    def _record(feed_url: str, seconds: float) -> None:
+        # Фид нескольких владельцев учитывается один раз — по первой (не из кэша прогона) проверке
+        if schedule is not None and feed_url not in recorded:
+            recorded.add(feed_url)
+            record_schedule(schedule, ctx, feed_url, seconds)
+
+    if not settings.concurrent_run:
+        for owner_key, feed_url in feeds:
+            feed_run = _timed_feed(settings, owner_key, feed_url, log_path, ctx)
+            _record(feed_url, feed_run.seconds)
+            yield feed_run
         return
 
-    total_feeds = 0
-    feeds_with_errors = 0
-    total_offers = 0
-    offers_with_errors = 0
-    total_issues = 0
+    def _buffered(owner_key: str, feed_url: str) -> Tuple[FeedRun, List[str]]:
+        # Сообщения фида копятся в буфере и пишутся одним блоком, чтобы секции фидов не перемешивались
+        messages: List[str] = []
+        feed_run = _timed_feed(settings, owner_key, feed_url, log_path, ctx, log=messages.append)
+        return feed_run, messages
 
-    for owner_key, owner in settings.owners.items():
-        for feed_url in owner.feeds:
-            total_feeds += 1
-            has_error, offers_count, offers_err, issues_cnt = process_feed(settings, owner_key, feed_url, log_path)
-            total_offers += offers_count
-            offers_with_errors += offers_err
-            total_issues += issues_cnt
-            if has_error:
-                feeds_with_errors += 1
-    
-    # Обновляем суточную статистику в JSON (fids_stat)
-    stats_path = stats_json_path(settings, ensure_log_dir(settings.log_dir))
+    with ThreadPoolExecutor(max_workers=max(1, settings.feed_concurrency), thread_name_prefix='feed') as pool:
+        futures = [pool.submit(_buffered, owner_key, feed_url) for owner_key, feed_url in feeds]
+        # Результаты забираем в исходном порядке фидов — лог и счётчики детерминированы
+        for fut in futures:
+            feed_run, messages = fut.result()
+            emit = _logger(ctx, log_path)
+            for message in messages:
+                emit(message)
+            _record(feed_run.feed, feed_run.seconds)
+            yield feed_run
+
+
+@dataclass
+class RunTotals:
+    # Счётчики прогона (или накопленные демоном между сохранениями в fids_stat.json)
+    total_feeds: int = 0
+    feeds_with_errors: int = 0
+    total_offers: int = 0
+    offers_with_errors: int = 0
+    total_issues: int = 0
+    estimated_feeds: int = 0
+    # Результаты по фидам — в базу статистики (feed_runs)
+    feeds: List[FeedRun] = field(default_factory=list)
 
-    today = pytz.timezone(settings.timezone).localize(dt.datetime.now()).strftime('%Y-%m-%d')
+    def add(self, run: FeedRun) -> None:
+        self.feeds.append(run)
+        self.total_feeds += 1
+        self.total_offers += run.offers
+        self.offers_with_errors += run.offers_with_errors
+        self.total_issues += run.issues
+        if run.has_error:
+            self.feeds_with_errors += 1
+        if run.estimated:
+            self.estimated_feeds += 1
+
+    def counters(self) -> Dict[str, int]:
+        return {
+            'total_feeds': self.total_feeds,
+            'feeds_with_errors': self.feeds_with_errors,
+            'total_offers': self.total_offers,
+            'offers_with_errors': self.offers_with_errors,
+            'total_issues': self.total_issues,
+            'estimated_feeds': self.estimated_feeds,
+        }
+
+
+def cache_report(ctx: RunContext, domain_hits: int, domain_misses: int) -> str:
+    domain_rate = domain_hits * 100 / max(1, domain_hits + domain_misses)
+    text = (
+        f'🗄 Кэш загрузок: попаданий={ctx.fetch_cache.hits}, промахов={ctx.fetch_cache.misses}'
+        f'\n🔎 Кэш доменов: попаданий={domain_hits}, промахов={domain_misses} ({domain_rate:.1f}%)'
+    )
+    if ctx.probe_cache is not None:
+        text += f'\n🛰 Проверка сайтов: запросов={ctx.probe_cache.requests}, из кэша между прогонами={ctx.probe_cache.hits}'
+    if ctx.http_cache is not None:
+        text += (
+            f'\n💾 Кэш между прогонами: 304={ctx.http_cache.not_modified}, '
+            f'без изменений={ctx.http_cache.unchanged}, проверено заново={ctx.http_cache.revalidated}'
+        )
+    return text
+
+
+def save_daily_stats(
+    settings: Settings,
+    counters: Dict[str, int],
+    stage_seconds: Dict[str, float],
+    feeds: Iterable[FeedRun] = (),
+    started: Optional[float] = None,
+    mode: str = 'run',
+) -> None:
+    # Прогон пишется строкой в базу статистики; fids_stat.json (суммы за день) пересобирается из неё
+    log_dir_path = ensure_log_dir(settings.log_dir)
+    today = _today(settings)
+    store = StatsStore(str(stats_db_path(settings, log_dir_path)), settings.stats_raw_days)
+    try:
+        store.record_run(today, mode, counters, stage_seconds, feeds, started, view_path=stats_json_path(settings, log_dir_path))
+    finally:
+        store.close()
+
+
+def _today(settings: Settings) -> str:
+    return pytz.timezone(settings.timezone).localize(dt.datetime.now()).strftime('%Y-%m-%d')
+
+
+def send_daily_summary(settings: Settings, run_log: RunLog) -> None:
+    stats_path = stats_json_path(settings, ensure_log_dir(settings.log_dir))
     stats = {
-        'date': today,
         'total_feeds': 0,
         'feeds_with_errors': 0,
         'total_offers': 0,
         'offers_with_errors': 0,
         'total_issues': 0,
     }
+    # Суммы за сегодня и по владельцам — из базы статистики
+    owners: Dict[str, Dict[str, int]] = {}
+    from_store = False
+    db_path = stats_db_path(settings, stats_path.parent)
+    today = _today(settings)
+    if db_path.exists():
+        store = StatsStore(str(db_path))
+        try:
+            if store.has_day(today):
+                stats.update(store.day_totals(today))
+                owners = store.owner_totals(today)
+                from_store = True
+        finally:
+            store.close()
+    # Если сегодня прогонов ещё не было — как раньше, из основного пути, иначе резервно из корня репо (fids_stat.json)
+    candidates = () if from_store else (stats_path, Path('fids_stat.json'))
+    for candidate in candidates:
+        try:
+            if candidate.exists():
+                with candidate.open('r', encoding='utf-8') as f:
+                    data = json.load(f) or {}
+                    if isinstance(data, dict):
+                        stats.update(data)
+                        break
+        except Exception:
+            continue
+    # Формируем суточный отчёт по готовым данным
+    text = summary_from_json(stats, log_public_url(settings, run_log.path), settings.timezone)
+    if owners:
+        text += '\n\n' + format_owner_summary(owners)
+    run_log.info(text)
+    if settings.telegram_enabled and settings.telegram_enabled_success:
+        send_telegram(settings.telegram_bot_token, settings.telegram_chat_id, text, settings.telegram_api_base)
+
+
+def print_report(settings: Settings) -> None:
+    # python -m src.main --report: тренды по фидам из базы статистики
+    db_path = stats_db_path(settings, ensure_log_dir(settings.log_dir))
+    if not db_path.exists():
+        print(f'📈 Нет базы статистики: {db_path}')
+        return
+    store = StatsStore(str(db_path), settings.stats_raw_days)
+    try:
+        print(build_report(store, settings.report_top_n, settings.timezone))
+    finally:
+        store.close()
+
+
+def open_run_log(settings: Settings) -> RunLog:
+    return RunLog(
+        settings.log_dir,
+        settings.timezone,
+        events=settings.log_events,
+        max_bytes=settings.log_max_bytes,
+        compress=settings.log_compress,
+    )
+
+
+def run_once(settings: Settings, profile: bool = False) -> None:
+    # Лог открыт на весь прогон и пишется через буфер (закрывается и при аварийном выходе — atexit)
+    run_log = open_run_log(settings)
+    log_path = run_log.path
+    # Режим суточного отчёта из JSON (для cron 09:00/17:00): python src/main.py --daily-summary
+    if len(sys.argv) > 1 and sys.argv[1] in ('--daily-summary', '--send-daily', '--summary'):
+        try:
+            send_daily_summary(settings, run_log)
+        finally:
+            run_log.close()
+        return
+
+    totals = RunTotals()
+    started = time.time()
+    ctx = RunContext.from_settings(settings)
+    ctx.run_log = run_log
+    ctx.timings = RunTimings(settings.stage_timings or profile, per_feed_rss=not settings.concurrent_run and settings.split_parse_processes == 0)
+    schedule = open_schedule(settings)
     try:
-        if stats_path.exists():
-            with stats_path.open('r', encoding='utf-8') as f:
-                prev = json.load(f)
-            if prev.get('date') == today:
-                stats.update({k: int(prev.get(k, 0)) for k in stats.keys() if k != 'date'})
-    except Exception:
-        pass
-
-    stats['total_feeds'] += total_feeds
-    stats['feeds_with_errors'] += feeds_with_errors
-    stats['total_offers'] += total_offers
-    stats['offers_with_errors'] += offers_with_errors
-    stats['total_issues'] += total_issues
-
-    stats_path.parent.mkdir(parents=True, exist_ok=True)
-    with stats_path.open('w', encoding='utf-8') as f:
-        json.dump(stats, f, ensure_ascii=False)
+        for feed_run in run_feeds(settings, log_path, ctx, schedule):
+            totals.add(feed_run)
+    finally:
+        ctx.close()
+        if schedule is not None:
+            schedule.save()
+    domain_hits, domain_misses = domain_match_cache_stats()
+    if ctx.http_cache is not None:
+        ctx.http_cache.prune()
+    run_log.info(cache_report(ctx, domain_hits, domain_misses))
+
+    counters = totals.counters()
+    counters.update(
+        fetch_cache_hits=ctx.fetch_cache.hits,
+        fetch_cache_misses=ctx.fetch_cache.misses,
+        domain_cache_hits=domain_hits,
+        domain_cache_misses=domain_misses,
+    )
+    stage_seconds = ctx.timings.stage_seconds() if ctx.timings.enabled else {}
+    save_daily_stats(settings, counters, stage_seconds, totals.feeds, started)
 
     # Отправляем позитивное сообщение по итогам текущего прогона
     run_text = format_summary(
-        total_feeds,
-        feeds_with_errors,
-        total_offers,
-        offers_with_errors,
-        total_issues,
+        totals.total_feeds,
+        totals.feeds_with_errors,
+        totals.total_offers,
+        totals.offers_with_errors,
+        totals.total_issues,
         None,
         settings.timezone,
+        totals.estimated_feeds,
     )
-    print(run_text)
-    append_log(log_path, run_text)
-    if settings.telegram_enabled and settings.telegram_enabled_success:
-        send_telegram(settings.telegram_bot_token, settings.telegram_chat_id, run_text)
+    run_log.info(run_text)
+    if settings.telegram_enabled_success:
+        _notify(settings, ctx, '', run_text)
+    if ctx.notifier is not None:
+        # Дожидаемся отправки очереди алертов перед выходом, но не дольше TELEGRAM_FLUSH_SECONDS
+        ctx.notifier.close()
+        ctx.timings.add('telegram', ctx.notifier.send_seconds)
+        if ctx.notifier.sent or ctx.notifier.failed or ctx.notifier.dropped:
+            print(
+                f'📨 Telegram: отправлено={ctx.notifier.sent}, ошибок={ctx.notifier.failed}, '
+                f'429={ctx.notifier.rate_limited}, отброшено={ctx.notifier.dropped}'
+            )
+    if ctx.timings.enabled:
+        run_log.info(ctx.timings.summary())
+    run_log.close()
+
+
+def main() -> None:
+    settings = load_settings()
+    if '--daemon' in sys.argv[1:]:
+        # Импорт здесь: daemon сам импортирует main, а APScheduler нужен только демону
+        try:
+            from .daemon import run_daemon
+        except Exception:  # noqa: BLE001
+            from daemon import run_daemon  # type: ignore
+        run_daemon(settings)
+        return
+    if '--report' in sys.argv[1:]:
+        print_report(settings)
+        return
+    if '--profile' not in sys.argv[1:]:
+        run_once(settings)
+        return
+    # cProfile профилирует главный поток: нагляднее всего без CONCURRENT_RUN
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        run_once(settings, profile=True)
+    finally:
+        profiler.disable()
+        stamp = dt.datetime.now(pytz.timezone(settings.timezone)).strftime('%Y-%m-%d-%H%M%S')
+        prof_path = ensure_log_dir(settings.log_dir) / f'{stamp}-profile.prof'
+        profiler.dump_stats(str(prof_path))
+        print(f'🧪 Профиль: {prof_path} (python -m pstats, snakeviz, flameprof)')
 
 
 
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .validator import ValidationIssue
+except Exception:  # noqa: BLE001
+    from validator import ValidationIssue  # type: ignore
+
+# Меняется при изменении правил проверки или формата хэша — индекс фида строится заново
+INDEX_VERSION = 1
+
+
+@dataclass
+class IssueDelta:
+    # Сравнение ошибок фида с прошлым прогоном
+    new_grouped: Dict[str, List[ValidationIssue]] = field(default_factory=dict)  # первые офферы с новыми ошибками
+    new: int = 0
+    ongoing: int = 0
+    resolved: int = 0
+    revalidated: int = 0  # офферов проверено заново (новые и изменённые)
+    reused: int = 0  # офферов без изменений, ошибки взяты из индекса
+
+
+def offer_hash(fields: Dict[str, List[str]]) -> int:
+    h = hashlib.blake2b(digest_size=8)
+    for tag in sorted(fields):
+        h.update(tag.encode('utf-8'))
+        h.update(b'\x1f')
+        h.update('\x1e'.join(fields[tag]).encode('utf-8'))
+        h.update(b'\x1d')
+    return int.from_bytes(h.digest(), 'big', signed=True)
+
+
+def encode_issues(issues: List[ValidationIssue]) -> Optional[str]:
+    if not issues:
+        return None
+    return json.dumps([[i.field, i.message, i.details] for i in issues], ensure_ascii=False)
+
+
+def decode_issues(raw: Optional[str]) -> List[ValidationIssue]:
+    if not raw:
+        return []
+    return [ValidationIssue(*issue) for issue in json.loads(raw)]
+
+
+class OfferIndex:
+    """Индекс офферов в SQLite: по каждому фиду id оффера → хэш полей и найденные ошибки.
+
+    Позволяет проверять только новые и изменённые офферы. Пишутся только изменения
+    (upsert изменённых, удаление пропавших), так что запись пропорциональна churn.
+    WAL и busy_timeout — чтобы фиды можно было обновлять из нескольких потоков/процессов.
+    """
+
+    def __init__(self, path: str, rules: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.rules = f'v{INDEX_VERSION}:{rules}'
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(
+            '''
+            CREATE TABLE IF NOT EXISTS feeds (feed TEXT PRIMARY KEY, rules TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS offers (
+                feed TEXT NOT NULL,
+                offer_key TEXT NOT NULL,
+                hash INTEGER NOT NULL,
+                issues TEXT,
+                PRIMARY KEY (feed, offer_key)
+            ) WITHOUT ROWID;
+            '''
+        )
+
+    def load(self, feed: str) -> Dict[str, Tuple[int, Optional[str]]]:
+        row = self._conn.execute('SELECT rules FROM feeds WHERE feed = ?', (feed,)).fetchone()
+        if row is None or row[0] != self.rules:
+            return {}
+        return {key: (h, issues) for key, h, issues in self._conn.execute('SELECT offer_key, hash, issues FROM offers WHERE feed = ?', (feed,))}
+
+    def update(
+        self,
+        feed: str,
+        changed: Iterable[Tuple[str, int, Optional[str]]],
+        removed: Iterable[str],
+        reset: bool = False,
+    ) -> None:
+        # reset=True — индекс фида строился по другим правилам, старые записи удаляются целиком
+        with self._conn:
+            if reset:
+                self._conn.execute('DELETE FROM offers WHERE feed = ?', (feed,))
+            self._conn.execute('INSERT OR REPLACE INTO feeds (feed, rules) VALUES (?, ?)', (feed, self.rules))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO offers (feed, offer_key, hash, issues) VALUES (?, ?, ?, ?)',
+                ((feed, key, h, issues) for key, h, issues in changed),
+            )
+            self._conn.executemany('DELETE FROM offers WHERE feed = ? AND offer_key = ?', ((feed, key) for key in removed))
+
+    def close(self) -> None:
+        self._conn.close()
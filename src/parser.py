@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional
+import itertools
+import os
+import re
+from dataclasses import dataclass, field
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from lxml import etree
 
@@ -12,45 +15,322 @@ class Offer:
     fields: Dict[str, List[str]]  # field -> list of values, preserves duplicates
 
 
-def parse_offers(xml_bytes: bytes) -> List[Offer]:
-    parser = etree.XMLParser(recover=True, remove_comments=True)
-    root = etree.fromstring(xml_bytes, parser=parser)
+OfferSource = Union[bytes, str, 'os.PathLike[str]', IO[bytes], Iterable[bytes]]
 
-    offers_xpath_candidates = [
-        '//offer',  # YML-like
-        '//item',   # RSS item fallback
-    ]
-    offer_nodes: List[etree._Element] = []
-    for xp in offers_xpath_candidates:
-        nodes = root.xpath(xp)
-        if nodes:
-            offer_nodes = nodes
+OFFER_TAGS = ('offer', 'item')  # YML-like, RSS item fallback
+
+# Поля оффера, которые извлекаются за один обход его потомков
+OFFER_FIELDS = ('url', 'name', 'picture', 'price', 'oldprice')
+
+# Размер порции, которой bytes/файлы подаются в инкрементальный парсер
+CHUNK_SIZE = 1024 * 1024
+
+# Сколько байт начала тела смотрит sniff_format
+SNIFF_BYTES = 4096
+# Корни известных форматов: local-name корня -> (формат, тег оффера)
+FORMAT_ROOTS = {
+    'yml_catalog': ('yml', 'offer'),
+    'rss': ('rss', 'item'),
+    'RDF': ('rss', 'item'),
+}
+# Корни индексов подфидов (`<feeds><feed><url>…</url></feed></feeds>`): офферов в них нет
+INDEX_ROOTS = ('feeds',)
+
+_BOMS = ((b'\xef\xbb\xbf', 'utf-8'), (b'\xff\xfe', 'utf-16-le'), (b'\xfe\xff', 'utf-16-be'))
+_ENCODING_RE = re.compile(r'^\s*<\?xml[^>]*?encoding\s*=\s*["\']([\w.\-]+)["\']')
+_COMMENT_RE = re.compile(r'<!--.*?-->', re.S)
+_ROOT_RE = re.compile(r'<((?:[A-Za-z_][\w.\-]*:)?([A-Za-z_][\w.\-]*))([^>]*)>?')
+_NS_DECL_RE = re.compile(r'xmlns(?::([\w.\-]+))?\s*=\s*["\']([^"\']*)["\']')
+_HEAD_OFFER_RE = re.compile(r'<(?:[\w.\-]+:)?(offer|item)[\s>/]')
+
+_XML_DECL_RE = re.compile(rb'^(?:\xef\xbb\xbf)?\s*<\?xml[^>]*\?>')
+_XMLNS_RE = re.compile(rb'\sxmlns(:[\w.\-]+)?\s*=\s*("[^"]*"|\'[^\']*\')')
+_OFFER_START_RE = re.compile(rb'<(offer|item)[\s/>]')
+# Обёртка куска: офферы разбираются в том же окружении пространств имён, что и в целом фиде
+_CHUNK_ROOT = b'fids-chunk'
+# Кусок не должен выйти больше chunk_size во столько раз, иначе тело не режется
+SPLIT_MAX_FACTOR = 4
+
+
+@dataclass
+class FeedFormat:
+    # Формат тела по первым килобайтам: корень, пространства имён, кодировка и что в нём искать
+    kind: str = 'unknown'  # yml | rss | index | unknown
+    root: Optional[str] = None  # local-name корневого элемента
+    namespaces: Dict[str, str] = field(default_factory=dict)  # префикс ('' — по умолчанию) -> URI
+    encoding: str = 'utf-8'
+    offer_tag: Optional[str] = None
+
+    @property
+    def offer_tags(self) -> Tuple[str, ...]:
+        # Индекс подфидов офферов не содержит; неизвестный формат — тег по первому встреченному, как раньше
+        if self.kind == 'index':
+            return ()
+        return (self.offer_tag,) if self.offer_tag else OFFER_TAGS
+
+
+def sniff_format(head: bytes) -> FeedFormat:
+    """Определяет формат по началу тела (SNIFF_BYTES байт), не разбирая документ.
+
+    yml/rss — по корню (`yml_catalog`, `rss`, `rdf:RDF`), тег оффера известен заранее;
+    index — по корню `feeds`. Для другого корня смотрится начало тела: есть offer/item — формат
+    с этим тегом оффера, иначе unknown: офферы ищутся, как раньше. Ссылки вида `<url>…xml</url>`
+    в начале тела индексом не считаются — это может быть `<shop><url>` каталога перед офферами.
+    """
+    head = head[:SNIFF_BYTES]
+    encoding = 'utf-8'
+    for bom, name in _BOMS:
+        if head.startswith(bom):
+            encoding = name
+            head = head[len(bom):]
+            break
+    text = head.decode(encoding, errors='replace')
+    if encoding == 'utf-8':
+        m = _ENCODING_RE.match(text)
+        if m:
+            encoding = m.group(1).lower()
+    fmt = FeedFormat(encoding=encoding)
+    text = _COMMENT_RE.sub('', text)
+    # Декларация, DOCTYPE и processing instructions под _ROOT_RE не подходят — первое совпадение и есть корень
+    m = _ROOT_RE.search(text)
+    if m is None:
+        return fmt
+    fmt.root = m.group(2)
+    fmt.namespaces = {prefix or '': uri for prefix, uri in _NS_DECL_RE.findall(m.group(3))}
+    known = FORMAT_ROOTS.get(fmt.root)
+    if known is not None:
+        fmt.kind, fmt.offer_tag = known
+        return fmt
+    if fmt.root in INDEX_ROOTS:
+        fmt.kind = 'index'
+        return fmt
+    offer = _HEAD_OFFER_RE.search(text[m.end():])
+    if offer is not None:
+        fmt.offer_tag = offer.group(1)
+        fmt.kind = 'yml' if fmt.offer_tag == 'offer' else 'rss'
+    return fmt
+
+
+def _extract_offer(node: etree._Element, fields_set: Tuple[str, ...], local_names: Dict[str, Optional[str]]) -> Offer:
+    # Один обход потомков оффера вместо findall + xpath на каждое поле.
+    # Как и раньше: значения прямых дочерних тегов без пространства имён, а если таких нет —
+    # всех потомков с тем же local-name (namespaced-теги, вложенные элементы).
+    # local_names — кэш тег -> local-name на весь документ (None для ненужных тегов).
+    direct: Dict[str, List[str]] = {}
+    nested: Dict[str, List[str]] = {}
+    offer_id = node.get('id')
+    id_text = None
+    for child in node.iterchildren(etree.Element):
+        tag = child.tag
+        if tag == 'id' and id_text is None:
+            id_text = child.text or ''
+        for el in child.iter(etree.Element):
+            name = local_names.get(el.tag, '')
+            if name == '':
+                name = local_names[el.tag] = _local_name(el.tag, fields_set)
+            if name is None:
+                continue
+            value = (el.text or '').strip()
+            if el is child and tag == name:
+                direct.setdefault(name, []).append(value)
+            nested.setdefault(name, []).append(value)
+    fields: Dict[str, List[str]] = {}
+    for tag in fields_set:
+        values = direct.get(tag) or nested.get(tag)
+        if values:
+            fields[tag] = values
+    return Offer(id=str(offer_id or id_text or ''), fields=fields)
+
+
+def _local_name(tag: str, fields_set: Tuple[str, ...]) -> Optional[str]:
+    name = tag.rpartition('}')[2]
+    return name if name in fields_set else None
+
+
+def _iter_chunks(source: OfferSource) -> Iterator[bytes]:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = memoryview(source)
+        for start in range(0, len(data), CHUNK_SIZE):
+            yield bytes(data[start:start + CHUNK_SIZE])
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield from iter(lambda: f.read(CHUNK_SIZE), b'')
+    elif hasattr(source, 'read'):
+        yield from iter(lambda: source.read(CHUNK_SIZE), b'')
+    else:
+        # Уже готовый поток порций, например распакованное тело HTTP-ответа
+        yield from source
+
+
+def _peek(chunks: Iterator[bytes], size: int) -> Tuple[bytes, Iterator[bytes]]:
+    # Первые size байт потока (или весь поток, если он короче) и тот же поток целиком
+    taken: List[bytes] = []
+    read = 0
+    for chunk in chunks:
+        taken.append(chunk)
+        read += len(chunk)
+        if read >= size:
             break
+    return b''.join(taken)[:size], itertools.chain(taken, chunks)
+
+
+def iter_offers(
+    source: OfferSource,
+    fields: Tuple[str, ...] = OFFER_FIELDS,
+    tags: Optional[Tuple[str, ...]] = None,
+) -> Iterator[Offer]:
+    """Потоково отдаёт офферы из bytes, пути к файлу, file-like объекта или итератора порций bytes.
+
+    Данные подаются в XMLPullParser по частям, так что разбор идёт параллельно со скачиванием,
+    а разобранные элементы сразу удаляются из дерева — память не растёт с размером фида.
+    Тег оффера выбирается по первому встреченному: `offer` (YML) или `item` (RSS).
+    fields — набор извлекаемых полей; все они собираются за один обход каждого оффера.
+    tags — допустимые теги оффера (FeedFormat.offer_tags); None — формат определяется по началу
+    тела (sniff_format). Пустой кортеж — индекс подфидов: офферов нет, тело не разбирается.
+    """
+    chunks = _iter_chunks(source)
+    if tags is None:
+        head, chunks = _peek(chunks, SNIFF_BYTES)
+        tags = sniff_format(head).offer_tags
+    if not tags:
+        # Тело всё равно дочитывается: при потоковой загрузке по нему считаются хэш и размер
+        for _ in chunks:
+            pass
+        return
+    parser = etree.XMLPullParser(
+        events=('start', 'end'),
+        tag=tags,
+        recover=True,
+        remove_comments=True,
+        huge_tree=True,
+    )
+    offer_tag = None
+    depth = 0
+    fields = tuple(fields)
+    local_names: Dict[str, Optional[str]] = {}
 
-    offers: List[Offer] = []
-    for node in offer_nodes:
-        offer_id = node.get('id') or node.findtext('id') or ''
-        fields: Dict[str, List[str]] = {}
-        for tag in ['url', 'name', 'picture', 'price', 'oldprice']:
-            values = [
-                (child.text or '').strip()
-                for child in node.findall(tag)
-            ]
-            # Some feeds use namespaced tags; try local-name wildcard search
-            if not values:
-                values = [
-                    (el.text or '').strip()
-                    for el in node.xpath(f'.//*[local-name()="{tag}"]')
-                ]
-            if values:
-                fields[tag] = values
-        offers.append(Offer(id=str(offer_id), fields=fields))
+    def _drain() -> Iterator[Offer]:
+        nonlocal offer_tag, depth
+        for event, el in parser.read_events():
+            if offer_tag is None:
+                offer_tag = el.tag
+            if el.tag != offer_tag:
+                continue
+            # Вложенные одноимённые элементы отдаём вместе с внешним оффером
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            if depth:
+                continue
+            yield _extract_offer(el, fields, local_names)
+            el.clear(keep_tail=True)
+            parent = el.getparent()
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
 
-    return offers
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from _drain()
+        parser.close()
+    except etree.XMLSyntaxError:
+        # recover=True не спасает от пустого/не-XML тела — как и раньше, просто нет офферов
+        return
+    yield from _drain()
 
 
+def parse_offers(xml_bytes: bytes, fields: Tuple[str, ...] = OFFER_FIELDS) -> List[Offer]:
+    return list(iter_offers(xml_bytes, fields))
 
 
+@dataclass
+class OfferChunks:
+    # Тело фида, разрезанное по границам офферов: каждый кусок — самостоятельный XML-документ
+    content: bytes
+    tag: str
+    head: bytes
+    bounds: List[Tuple[int, int]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    def __iter__(self) -> Iterator[bytes]:
+        # Куски собираются по одному, чтобы не держать в памяти вторую копию тела
+        tail = b'</' + _CHUNK_ROOT + b'>'
+        for start, end in self.bounds:
+            yield self.head + self.content[start:end] + tail
+
 
+def _inside_markup(window: bytes) -> bool:
+    # Позиция сразу после window внутри незакрытого комментария или CDATA
+    return window.rfind(b'<!--') > window.rfind(b'-->') or window.rfind(b'<![CDATA[') > window.rfind(b']]>')
 
 
+def split_offers(content: bytes, chunk_size: int) -> Optional[OfferChunks]:
+    """Режет тело фида на куски примерно по chunk_size байт по границам офферов верхнего уровня.
+
+    Каждый кусок оборачивается XML-декларацией фида и элементом с xmlns-объявлениями из шапки,
+    так что iter_offers по кускам подряд даёт те же офферы, что и по целому телу.
+    Граница ставится только перед `<offer`, где все открытые офферы закрыты и нет незакрытых
+    комментариев/CDATA. None — тело не режется (нет офферов, DTD с сущностями, не UTF-8-совместимая
+    кодировка и т. п.): такой фид разбирается целиком, как раньше.
+    """
+    first = _OFFER_START_RE.search(content)
+    if first is None:
+        return None
+    header = content[:first.start()]
+    if _inside_markup(header) or b'<!ENTITY' in header:
+        return None
+    tag = first.group(1)
+    start_re = re.compile(rb'<' + tag + rb'[\s/>]')
+    close = b'</' + tag + b'>'
+    last = content.rfind(close)
+    if last < first.start():
+        return None
+    region_end = last + len(close)
+    if start_re.search(content, region_end):
+        # После последнего закрытого оффера есть незакрытый (обрезанное тело) — разбор целиком
+        return None
+
+    namespaces: Dict[bytes, bytes] = {}
+    for prefix, value in _XMLNS_RE.findall(header):
+        namespaces[prefix] = value
+    decl = _XML_DECL_RE.match(header)
+    head = (decl.group(0) if decl else b'') + b'<' + _CHUNK_ROOT
+    head += b''.join(b' xmlns' + prefix + b'=' + value for prefix, value in namespaces.items()) + b'>'
+
+    # Один проход по телу: курсор регулярки идёт только вперёд, глубина вложенности офферов
+    # считается по открывающим/закрывающим тегам, комментарии и CDATA пропускаются целиком
+    # (общий префикс «<» позволяет регулярке быстро проматывать текст между тегами)
+    token_re = re.compile(
+        rb'<(?:(' + tag + rb'[\s/>])|/' + tag + rb'\s*>|(!--.*?-->|!\[CDATA\[.*?\]\]>)|(!--|!\[CDATA\[))',
+        re.DOTALL,
+    )
+    bounds: List[Tuple[int, int]] = []
+    begin = first.start()
+    limit = begin + chunk_size
+    depth = 0
+    for m in token_re.finditer(content, begin, region_end):
+        kind = m.lastindex
+        if kind == 2:
+            continue
+        if kind == 3:
+            # Незакрытый комментарий/CDATA: дальше границ нет
+            break
+        if kind == 1:
+            at = m.start()
+            if at >= limit:
+                if depth == 0:
+                    bounds.append((begin, at))
+                    begin = at
+                    limit = begin + chunk_size
+                elif at - begin > SPLIT_MAX_FACTOR * chunk_size:
+                    # Границы не находятся (вложенные офферы, самозакрытые теги) — разбор целиком
+                    return None
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+    bounds.append((begin, region_end))
+    return OfferChunks(content=content, tag=tag.decode('ascii'), head=head, bounds=bounds)
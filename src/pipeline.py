@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+try:
+    from .offer_index import IssueDelta, OfferIndex, decode_issues, encode_issues, offer_hash
+    from .parser import FeedFormat, Offer, OfferSource, iter_offers, split_offers
+    from .sampling import SampleEstimate, reservoir_sample
+    from .timing import timed_iter
+    from .validator import FeedValidator, ValidationIssue
+except Exception:  # noqa: BLE001
+    from offer_index import IssueDelta, OfferIndex, decode_issues, encode_issues, offer_hash  # type: ignore
+    from parser import FeedFormat, Offer, OfferSource, iter_offers, split_offers  # type: ignore
+    from sampling import SampleEstimate, reservoir_sample  # type: ignore
+    from timing import timed_iter  # type: ignore
+    from validator import FeedValidator, ValidationIssue  # type: ignore
+
+
+# Порциями по столько офферов идёт инкрементальная проверка с индексом
+INDEX_CHUNK_SIZE = 2000
+
+# Размер куска тела при разборе в нескольких процессах: примерно 4 куска на процесс, в этих пределах
+SPLIT_MIN_BYTES = 1024 * 1024
+SPLIT_MAX_BYTES = 16 * 1024 * 1024
+
+# Поимённо (оффер → ошибки) хранятся первые столько офферов с ошибками; остальные — в сводке и файле деталей
+GROUPED_MAX_OFFERS = 20
+# Примеров offer id на один вид ошибки
+ISSUE_EXAMPLES = 3
+
+# Компактная запись ошибок оффера для передачи из процесса: (offer_id, [(поле, сообщение, детали), ...])
+IssueRecord = Tuple[str, List[Tuple[str, str, Optional[str]]]]
+
+
+@dataclass
+class IssueGroup:
+    # Ошибки одного вида (поле, сообщение) по всему телу: сколько их и несколько офферов для примера
+    field: str
+    message: str
+    count: int = 0
+    examples: List[str] = field(default_factory=list)
+
+
+class IssueDetail:
+    """Все ошибки тела построчно в JSONL: offer_id, field, message, details.
+
+    Файл создаётся при первой записи; пишется во временный и переименовывается в close(),
+    так что по ссылке не бывает недописанного файла. Файл прошлой проверки того же URL
+    удаляется сразу: если теперь ошибок не больше GROUPED_MAX_OFFERS, он был бы устаревшим.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.unlink(missing_ok=True)
+        self._tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        self._file: Optional[TextIO] = None
+
+    def write(self, offer_id: str, issues: List[ValidationIssue]) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self._tmp.open('w', encoding='utf-8')
+        for issue in issues:
+            record = {'offer_id': offer_id, 'field': issue.field, 'message': issue.message, 'details': issue.details}
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self) -> Optional[str]:
+        # Путь к файлу, если в него что-то записано
+        if self._file is None:
+            return None
+        self._file.close()
+        self._file = None
+        os.replace(self._tmp, self.path)
+        return str(self.path)
+
+    def abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._tmp.unlink(missing_ok=True)
+
+
+@dataclass
+class CheckResult:
+    offers_checked: int = 0
+    offers_with_errors: int = 0
+    total_issues: int = 0
+    # Первые GROUPED_MAX_OFFERS офферов с ошибками; truncated — были и другие (все они — в summary и detail_path)
+    grouped: Dict[str, List[ValidationIssue]] = field(default_factory=dict)
+    summary: Dict[Tuple[str, str], IssueGroup] = field(default_factory=dict)
+    truncated: bool = False
+    detail_path: Optional[str] = None
+    # Время разбора/проверки этого тела (только с timed=True); в кэш между прогонами не пишется
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    # Новые/продолжающиеся/исправленные ошибки относительно прошлого прогона (только с индексом офферов)
+    delta: Optional[IssueDelta] = None
+    # Проверена только выборка офферов: offers_checked — все офферы тела, offers_with_errors и total_issues —
+    # оценка на всё тело; grouped/summary — ошибки, найденные в выборке
+    sample: Optional[SampleEstimate] = None
+
+    def add(self, offer_id: str, issues: List[ValidationIssue], detail: Optional[IssueDetail] = None) -> None:
+        # Учитывает ошибки одного оффера; память и время не растут с числом офферов с ошибками
+        offer_id = offer_id or '-'
+        self.offers_with_errors += 1
+        self.total_issues += len(issues)
+        for issue in issues:
+            group = self.summary.get((issue.field, issue.message))
+            if group is None:
+                group = self.summary[(issue.field, issue.message)] = IssueGroup(issue.field, issue.message)
+            group.count += 1
+            if len(group.examples) < ISSUE_EXAMPLES and offer_id not in group.examples:
+                group.examples.append(offer_id)
+        if not self.truncated and (offer_id in self.grouped or len(self.grouped) < GROUPED_MAX_OFFERS):
+            self.grouped.setdefault(offer_id, []).extend(issues)
+            return
+        if not self.truncated and detail is not None:
+            # Офферы, уже сохранённые поимённо, тоже попадают в файл деталей
+            for known_id, known in self.grouped.items():
+                detail.write(known_id, known)
+        self.truncated = True
+        if detail is not None:
+            detail.write(offer_id, issues)
+
+    def to_dict(self) -> dict:
+        return {
+            'offers_checked': self.offers_checked,
+            'offers_with_errors': self.offers_with_errors,
+            'total_issues': self.total_issues,
+            'grouped': {
+                offer_id: [[i.field, i.message, i.details] for i in issues]
+                for offer_id, issues in self.grouped.items()
+            },
+            'summary': [asdict(group) for group in self.summary.values()],
+            'truncated': self.truncated,
+            'detail_path': self.detail_path,
+            'sample': asdict(self.sample) if self.sample is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CheckResult':
+        return cls(
+            offers_checked=int(data.get('offers_checked', 0)),
+            offers_with_errors=int(data.get('offers_with_errors', 0)),
+            total_issues=int(data.get('total_issues', 0)),
+            grouped={
+                offer_id: [ValidationIssue(*issue) for issue in issues]
+                for offer_id, issues in (data.get('grouped') or {}).items()
+            },
+            summary={(g['field'], g['message']): IssueGroup(**g) for g in data.get('summary') or []},
+            truncated=bool(data.get('truncated')),
+            detail_path=data.get('detail_path'),
+            sample=SampleEstimate(**data['sample']) if data.get('sample') else None,
+        )
+
+
+def check_offers(
+    source: OfferSource,
+    url: str,
+    allow_subdomains: bool,
+    batch_size: int = 0,
+    timed: bool = False,
+    index_path: Optional[str] = None,
+    fmt: Optional[FeedFormat] = None,
+    sample_size: int = 0,
+    detail_path: Optional[str] = None,
+) -> CheckResult:
+    # Разбор и проверка одного тела фида (bytes или поток порций).
+    # Функция верхнего уровня — тело в виде bytes можно отдавать в пул процессов.
+    # timed=True: время разбора (ожидание офферов от парсера) и остальное — проверка — в stage_seconds.
+    # index_path: проверяются только новые и изменённые офферы (см. OfferIndex), в result.delta — сравнение с прошлым прогоном.
+    # fmt: уже определённый формат тела (sniff_format); без него формат определяется по началу тела.
+    # sample_size: проверяется равномерная выборка из стольких офферов (reservoir_sample), тело разбирается целиком;
+    # с индексом офферов не используется.
+    # detail_path: если офферов с ошибками больше GROUPED_MAX_OFFERS, все ошибки пишутся сюда (IssueDetail).
+    result = CheckResult()
+    validator = FeedValidator(url, allow_subdomains=allow_subdomains, batch_size=batch_size)
+    offers = iter_offers(source, tags=fmt.offer_tags if fmt is not None else None)
+    parse_seconds = [0.0]
+    if timed:
+        offers = timed_iter(offers, parse_seconds)
+    started = time.perf_counter()
+    if index_path:
+        checked = _check_incremental(validator, offers, url, index_path, result)
+    elif sample_size > 0:
+        checked = _check_sample(validator, offers, sample_size, result)
+    else:
+        checked = ((offer.id, issues) for offer, issues in validator.validate_many(offers))
+    detail = IssueDetail(detail_path) if detail_path else None
+    try:
+        for offer_id, issues in checked:
+            result.offers_checked += 1
+            if issues:
+                result.add(offer_id, issues, detail)
+    except BaseException:
+        if detail is not None:
+            detail.abort()
+        raise
+    if detail is not None:
+        result.detail_path = detail.close()
+    if result.sample is not None:
+        result.sample.with_errors = result.offers_with_errors
+        result.sample.issues = result.total_issues
+        result.offers_checked = result.sample.population
+        result.offers_with_errors = result.sample.estimated_with_errors
+        result.total_issues = result.sample.estimated_issues
+    if timed:
+        total = time.perf_counter() - started
+        result.stage_seconds = {'parse': parse_seconds[0], 'validate': total - parse_seconds[0]}
+    return result
+
+
+def _check_chunk(
+    chunk: bytes,
+    tag: str,
+    url: str,
+    allow_subdomains: bool,
+    batch_size: int,
+    timed: bool,
+) -> Tuple[int, List[IssueRecord], Dict[str, float]]:
+    # Выполняется в процессе пула: обратно уходят число офферов и ошибки, а не сами офферы
+    validator = FeedValidator(url, allow_subdomains=allow_subdomains, batch_size=batch_size)
+    offers = iter_offers(chunk, tags=(tag,))
+    parse_seconds = [0.0]
+    if timed:
+        offers = timed_iter(offers, parse_seconds)
+    started = time.perf_counter()
+    count = 0
+    records: List[IssueRecord] = []
+    for offer, issues in validator.validate_many(offers):
+        count += 1
+        if issues:
+            records.append((offer.id, [(i.field, i.message, i.details) for i in issues]))
+    stage_seconds = {}
+    if timed:
+        stage_seconds = {'parse': parse_seconds[0], 'validate': time.perf_counter() - started - parse_seconds[0]}
+    return count, records, stage_seconds
+
+
+def check_offers_split(
+    content: bytes,
+    url: str,
+    allow_subdomains: bool,
+    pool: Executor,
+    processes: int,
+    batch_size: int = 0,
+    timed: bool = False,
+    detail_path: Optional[str] = None,
+) -> Optional[CheckResult]:
+    # Разбор и проверка большого тела в нескольких процессах: тело режется по границам офферов
+    # (parser.split_offers), куски проверяются в пуле, ошибки собираются в порядке фида —
+    # результат тот же, что у check_offers. None — тело не режется, его нужно проверить целиком.
+    # В stage_seconds — время, суммированное по процессам.
+    chunk_size = min(SPLIT_MAX_BYTES, max(SPLIT_MIN_BYTES, len(content) // (max(1, processes) * 4)))
+    chunks = split_offers(content, chunk_size)
+    if chunks is None or len(chunks) < 2:
+        return None
+    result = CheckResult()
+    if timed:
+        result.stage_seconds = {'parse': 0.0, 'validate': 0.0}
+    pending: Deque['Future[Tuple[int, List[IssueRecord], Dict[str, float]]]'] = deque()
+    detail = IssueDetail(detail_path) if detail_path else None
+
+    def _collect() -> None:
+        count, records, stage_seconds = pending.popleft().result()
+        result.offers_checked += count
+        for offer_id, issues in records:
+            result.add(offer_id, [ValidationIssue(*issue) for issue in issues], detail)
+        for stage, seconds in stage_seconds.items():
+            result.stage_seconds[stage] += seconds
+
+    # В очереди не больше двух кусков на процесс, чтобы копии кусков не копились в памяти
+    try:
+        for chunk in chunks:
+            if len(pending) >= 2 * max(1, processes):
+                _collect()
+            pending.append(pool.submit(_check_chunk, chunk, chunks.tag, url, allow_subdomains, batch_size, timed))
+        while pending:
+            _collect()
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        if detail is not None:
+            detail.abort()
+        raise
+    if detail is not None:
+        result.detail_path = detail.close()
+    return result
+
+
+def _check_sample(
+    validator: FeedValidator,
+    offers: Iterator[Offer],
+    sample_size: int,
+    result: CheckResult,
+) -> Iterator[Tuple[str, List[ValidationIssue]]]:
+    # Офферы выборки копятся в памяти (не больше sample_size) и проверяются после разбора всего тела
+    sample, population = reservoir_sample(offers, sample_size)
+    for offer, issues in validator.validate_many(offer for _, offer in sample):
+        yield offer.id, issues
+    if population > len(sample):
+        result.sample = SampleEstimate(len(sample), population, 0)
+
+
+def _check_incremental(
+    validator: FeedValidator,
+    offers: Iterator[Offer],
+    url: str,
+    index_path: str,
+    result: CheckResult,
+) -> Iterator[Tuple[str, List[ValidationIssue]]]:
+    # Отдаёт (offer_id, issues) в порядке фида; в валидатор идут только офферы, чей хэш полей изменился.
+    # Офферы обрабатываются порциями, так что в памяти не копится весь фид.
+    index = OfferIndex(index_path, f'allow_subdomains={validator.allow_subdomains}')
+    try:
+        previous = index.load(url)
+        delta = IssueDelta()
+        keys: Set[str] = set()
+        updates: List[Tuple[str, int, Optional[str]]] = []
+        for chunk in _chunks(offers, INDEX_CHUNK_SIZE):
+            prepared = []
+            todo: List[Offer] = []
+            for offer in chunk:
+                offer_id = offer.id or '-'
+                key = offer_id
+                n = 0
+                while key in keys:
+                    n += 1
+                    key = f'{offer_id}#{n}'
+                keys.add(key)
+                h = offer_hash(offer.fields)
+                prev = previous.get(key)
+                unchanged = prev is not None and prev[0] == h
+                prepared.append((key, offer_id, h, prev, unchanged))
+                if not unchanged:
+                    todo.append(offer)
+            fresh = iter([issues for _, issues in validator.validate_many(todo)])
+            for key, offer_id, h, prev, unchanged in prepared:
+                if unchanged:
+                    issues = decode_issues(prev[1]) if prev[1] else []
+                    delta.ongoing += len(issues)
+                    delta.reused += 1
+                else:
+                    issues = next(fresh)
+                    updates.append((key, h, encode_issues(issues)))
+                    _count_delta(delta, offer_id, decode_issues(prev[1]) if prev else [], issues)
+                    delta.revalidated += 1
+                yield offer_id, issues
+        removed = [key for key in previous if key not in keys]
+        for key in removed:
+            delta.resolved += len(decode_issues(previous[key][1]))
+        index.update(url, updates, removed, reset=not previous)
+    finally:
+        index.close()
+    result.delta = delta
+
+
+def _chunks(items: Iterator[Offer], size: int) -> Iterator[List[Offer]]:
+    chunk: List[Offer] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _count_delta(delta: IssueDelta, offer_id: str, before: List[ValidationIssue], after: List[ValidationIssue]) -> None:
+    # Ошибки сравниваются как мультимножества (поле, сообщение, детали)
+    remaining: Dict[Tuple[str, str, Optional[str]], int] = {}
+    for issue in before:
+        k = (issue.field, issue.message, issue.details)
+        remaining[k] = remaining.get(k, 0) + 1
+    for issue in after:
+        k = (issue.field, issue.message, issue.details)
+        if remaining.get(k):
+            remaining[k] -= 1
+            delta.ongoing += 1
+        else:
+            delta.new += 1
+            if offer_id in delta.new_grouped or len(delta.new_grouped) < GROUPED_MAX_OFFERS:
+                delta.new_grouped.setdefault(offer_id, []).append(issue)
+    delta.resolved += sum(remaining.values())
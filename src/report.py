@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    from .alert import now_str
+    from .stats_store import DAY, FeedTrend, StatsStore
+except Exception:  # noqa: BLE001
+    from alert import now_str  # type: ignore
+    from stats_store import DAY, FeedTrend, StatsStore  # type: ignore
+
+# Окно отчёта и окно сравнения (неделя к неделе)
+REPORT_WINDOW_DAYS = 7
+# Сколько полей с ошибками показывать у проблемного фида
+REPORT_TOP_FIELDS = 3
+
+
+def _mb(size: float) -> str:
+    return f'{size / 1024 / 1024:.1f} МБ'
+
+
+def _delta(current: float, previous: Optional[FeedTrend], value: Callable[[FeedTrend], float], fmt: Callable[[float], str]) -> str:
+    if previous is None or not previous.checks:
+        return 'новый'
+    diff = current - value(previous)
+    if fmt(abs(diff)) == fmt(0.0):
+        return 'без изменений к прошлой неделе'
+    return f'Δ {"+" if diff > 0 else "−"}{fmt(abs(diff))} к прошлой неделе'
+
+
+def _top(trends: Dict[str, FeedTrend], key: Callable[[FeedTrend], float], top_n: int) -> List[FeedTrend]:
+    ranked = sorted((t for t in trends.values() if t.checks and key(t) > 0), key=key, reverse=True)
+    return ranked[:top_n]
+
+
+def build_report(store: StatsStore, top_n: int, timezone: str, now: Optional[float] = None) -> str:
+    """Отчёт по истории фидов за последние 7 дней в сравнении с предыдущими 7 днями.
+
+    Самые медленные (средняя загрузка фида с подфидами, мс), самые большие (наибольший объём
+    фида с подфидами), самые проблемные (ошибок за проверку, недоступность, главные поля)
+    и сильнее всего замедлившиеся неделя к неделе. Данные — из базы статистики, без разбора текстовых логов.
+    """
+    now = time.time() if now is None else now
+    window = REPORT_WINDOW_DAYS * DAY
+    week = store.feed_trends(now - window, now)
+    previous = store.feed_trends(now - 2 * window, now - window)
+    parts = [
+        f'📈 Отчёт по фидам за {REPORT_WINDOW_DAYS} дней (сравнение с предыдущими {REPORT_WINDOW_DAYS})',
+        '',
+        f'⏰ Время: {now_str(timezone)}',
+        f'🌍 Фидов: {len(week)}, проверок: {sum(t.checks for t in week.values())}',
+    ]
+    if not week:
+        parts.append('Нет данных: за неделю не было проверок')
+        return '\n'.join(parts)
+
+    parts += ['', '🐢 Самые медленные (средняя загрузка):']
+    for n, t in enumerate(_top(week, lambda t: t.avg_fetch_ms, top_n), 1):
+        delta = _delta(t.avg_fetch_ms, previous.get(t.feed), lambda p: p.avg_fetch_ms, lambda v: f'{v:.0f} мс')
+        parts.append(f'{n}. {t.feed} — {t.avg_fetch_ms:.0f} мс (макс {t.fetch_ms_max:.0f} мс), {delta}')
+
+    # Размер — по максимуму за окно: при ответе 304 тело не качается и размер не известен
+    parts += ['', '📦 Самые большие:']
+    for n, t in enumerate(_top(week, lambda t: t.bytes_max, top_n), 1):
+        delta = _delta(t.bytes_max, previous.get(t.feed), lambda p: p.bytes_max, _mb)
+        parts.append(f'{n}. {t.feed} — {_mb(t.bytes_max)}, {delta}')
+
+    parts += ['', '❌ Самые проблемные:']
+    broken = _top(week, lambda t: t.avg_issues + t.failures / t.checks, top_n)
+    for n, t in enumerate(broken, 1):
+        fields = sorted(t.issues_by_field.items(), key=lambda item: item[1], reverse=True)[:REPORT_TOP_FIELDS]
+        line = f'{n}. {t.feed} — ошибок за проверку {t.avg_issues:.1f}'
+        if t.failures:
+            line += f', фид или подфид недоступен в {t.failures} из {t.checks} проверок'
+        if fields:
+            line += ', поля: ' + ', '.join(f'{name} ({count})' for name, count in fields)
+        if t.estimated:
+            line += f', оценка по выборке в {t.estimated} из {t.checks} проверок'
+        parts.append(f'{line}, {_delta(t.avg_issues, previous.get(t.feed), lambda p: p.avg_issues, lambda v: f"{v:.1f}")}')
+    if not broken:
+        parts.append('нет')
+
+    slower = sorted(
+        (
+            (t.avg_fetch_ms - previous[t.feed].avg_fetch_ms, t)
+            for t in week.values()
+            if t.checks and t.feed in previous and previous[t.feed].checks
+        ),
+        key=lambda item: item[0],
+        reverse=True,
+    )
+    parts += ['', '📉 Сильнее всего замедлились (неделя к неделе):']
+    regressions = [(diff, t) for diff, t in slower[:top_n] if diff > 0]
+    for n, (diff, t) in enumerate(regressions, 1):
+        parts.append(f'{n}. {t.feed} — {previous[t.feed].avg_fetch_ms:.0f} → {t.avg_fetch_ms:.0f} мс (+{diff:.0f} мс)')
+    if not regressions:
+        parts.append('нет')
+    return '\n'.join(parts)
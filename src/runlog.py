@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import atexit
+import datetime as dt
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, Optional
+
+import pytz
+
+try:
+    import fcntl
+except ImportError:  # Windows: ротация без межпроцессной блокировки
+    fcntl = None  # type: ignore[assignment]
+
+# Размер буфера файла лога: запись на диск порциями, а не на каждую строку
+LOG_BUFFER_SIZE = 64 * 1024
+# Не реже чем раз в столько секунд буфер сбрасывается на диск
+LOG_FLUSH_SECONDS = 2.0
+
+
+class _DailyFile:
+    """Файл лога за день, открытый на всё время работы.
+
+    При смене дня открывается новый файл. Если задан max_bytes, переполненный файл
+    переименовывается в `<имя>.N`. Если включён compress, такие части и файлы прошлых дней
+    сжимаются в gzip.
+
+    В один каталог могут писать несколько процессов (демон и ручной прогон): ротация и сжатие
+    идут под flock на `.<suffix>.lock`. Файл, переименованный другим процессом, замечается
+    при flush() и открывается заново; последняя часть сжимается только при следующей ротации,
+    когда её уже никто не дописывает.
+    """
+
+    def __init__(self, directory: Path, suffix: str, max_bytes: int = 0, compress: bool = False) -> None:
+        self.directory = directory
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.date = ''
+        self.path: Optional[Path] = None
+        self._file: Optional[IO[str]] = None
+        self._size = 0
+
+    def write(self, date: str, text: str) -> None:
+        if date != self.date or self._file is None:
+            self._open(date)
+        assert self._file is not None
+        self._file.write(text)
+        self._size += len(text.encode('utf-8'))
+        if self.max_bytes and self._size >= self.max_bytes:
+            self._rotate()
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            if not self._is_current():
+                # Файл дня переименовал другой процесс — дальше пишем в новый
+                self._open(self.date)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self, date: str) -> None:
+        self.close()
+        self.date = date
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f'{date}{self.suffix}'
+        self._file = self.path.open('a', encoding='utf-8', buffering=LOG_BUFFER_SIZE)
+        self._size = self.path.stat().st_size
+        if self.compress:
+            self._compress_old_days()
+
+    def _is_current(self) -> bool:
+        # Открытый файл — всё ещё тот, что лежит по self.path
+        assert self._file is not None and self.path is not None
+        try:
+            return os.path.samestat(os.fstat(self._file.fileno()), self.path.stat())
+        except OSError:
+            return False
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with (self.directory / f'.{self.suffix.lstrip("-")}.lock').open('a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _rotate(self) -> None:
+        assert self.path is not None
+        self._file.flush()  # type: ignore[union-attr]
+        with self._locked():
+            # Другой процесс мог уже переименовать файл — тогда просто открываем новый
+            if self._is_current():
+                n = 1
+                while self.path.with_name(f'{self.path.name}.{n}').exists() or self.path.with_name(f'{self.path.name}.{n}.gz').exists():
+                    n += 1
+                self.path.rename(self.path.with_name(f'{self.path.name}.{n}'))
+                if self.compress:
+                    for k in range(1, n):
+                        part = self.path.with_name(f'{self.path.name}.{k}')
+                        if part.exists():
+                            _gzip_file(part)
+        self._open(self.date)
+
+    def _compress_old_days(self) -> None:
+        with self._locked():
+            for p in self.directory.glob(f'*{self.suffix}*'):
+                if p.name.endswith('.gz') or p.name.startswith(self.date) or not p.exists():
+                    continue
+                _gzip_file(p)
+
+
+def _gzip_file(path: Path) -> None:
+    target = path.with_name(path.name + '.gz')
+    try:
+        with path.open('rb') as src, gzip.open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        path.unlink()
+    except OSError as e:
+        print(f'[log] не удалось сжать {path}: {e}')
+
+
+class RunLog:
+    """Лог прогона: текстовый лог дня и, по желанию, JSONL с типизированными событиями.
+
+    Файлы держатся открытыми и пишутся через буфер; все записи под одним локом,
+    поэтому писать можно из нескольких потоков (воркеры фидов, пул загрузок).
+    """
+
+    def __init__(
+        self,
+        log_dir: str,
+        timezone: str,
+        events: bool = False,
+        max_bytes: int = 0,
+        compress: bool = False,
+    ) -> None:
+        directory = Path(log_dir)
+        self._tz = pytz.timezone(timezone)
+        self._text = _DailyFile(directory, '-feed-test.log', max_bytes, compress)
+        self._events = _DailyFile(directory, '-feed-events.jsonl', max_bytes, compress) if events else None
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._closed = False
+        atexit.register(self.close)
+
+    @property
+    def path(self) -> Path:
+        # Текущий файл текстового лога (для ссылки LOG_PUBLIC_BASE_URL)
+        date = self._today()
+        if self._text.path is not None and self._text.date == date:
+            return self._text.path
+        return self._text.directory / f'{date}{self._text.suffix}'
+
+    def write(self, text: str) -> None:
+        # Формат как у прежнего append_log: сообщение и пустая строка после него
+        self._write(self._text, text.rstrip() + '\n\n')
+
+    def info(self, message: str) -> None:
+        print(message)
+        self.write(message)
+
+    def event(self, kind: str, **fields: object) -> None:
+        if self._events is None:
+            return
+        record = {'ts': dt.datetime.now(self._tz).isoformat(timespec='milliseconds'), 'event': kind}
+        record.update(fields)
+        self._write(self._events, json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._text.close()
+            if self._events is not None:
+                self._events.close()
+
+    def _today(self) -> str:
+        return dt.datetime.now(self._tz).strftime('%Y-%m-%d')
+
+    def _write(self, target: _DailyFile, text: str) -> None:
+        with self._lock:
+            if self._closed:
+                # После close() (например, из atexit) пишем напрямую, чтобы не терять строки
+                target.directory.mkdir(parents=True, exist_ok=True)
+                with (target.path or target.directory / f'{self._today()}{target.suffix}').open('a', encoding='utf-8') as f:
+                    f.write(text)
+                return
+            target.write(self._today(), text)
+            now = time.monotonic()
+            if now - self._last_flush >= LOG_FLUSH_SECONDS:
+                self._flush()
+                self._last_flush = now
+
+    def _flush(self) -> None:
+        self._text.flush()
+        if self._events is not None:
+            self._events.flush()
+
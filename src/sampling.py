@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, TypeVar
+
+try:
+    from .fetch import normalize_url
+except Exception:  # noqa: BLE001
+    from fetch import normalize_url  # type: ignore
+
+T = TypeVar('T')
+
+# Квантиль нормального распределения для 95% доверительного интервала
+Z_95 = 1.96
+
+
+def wilson_interval(errors: int, n: int, z: float = Z_95) -> Tuple[float, float]:
+    # Интервал Уилсона для доли: в отличие от p ± z·σ не вырождается при 0 ошибках в выборке
+    if n <= 0:
+        return 0.0, 1.0
+    p = errors / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+@dataclass
+class SampleEstimate:
+    # Итог выборочной проверки тела: сколько офферов проверено из скольких, сколько из них с ошибками и ошибок
+    sampled: int
+    population: int
+    with_errors: int
+    issues: int = 0
+
+    @property
+    def rate(self) -> float:
+        return self.with_errors / self.sampled if self.sampled else 0.0
+
+    @property
+    def estimated_with_errors(self) -> int:
+        # Пересчёт на всё тело
+        return round(self.rate * self.population)
+
+    @property
+    def estimated_issues(self) -> int:
+        return round(self.issues / self.sampled * self.population) if self.sampled else 0
+
+    @property
+    def bounds(self) -> Tuple[float, float]:
+        return wilson_interval(self.with_errors, self.sampled)
+
+
+def _log_random(rng: random.Random) -> float:
+    # log(U), U ∈ (0, 1): random() может вернуть 0
+    return math.log(rng.random() or 1e-300)
+
+
+def reservoir_sample(items: Iterable[T], k: int, rng: Optional[random.Random] = None) -> Tuple[List[Tuple[int, T]], int]:
+    """Равномерная выборка k элементов из потока неизвестной длины (алгоритм L).
+
+    Возвращает пары (номер в потоке, элемент) в порядке потока и длину потока. Случайные числа
+    нужны только при замене элемента выборки — O(k·log(n/k)), а не на каждый элемент.
+    """
+    rng = rng or random.Random()
+    it = iter(items)
+    sample: List[Tuple[int, T]] = list(enumerate(islice(it, k)))
+    n = len(sample)
+    if n < k or k <= 0:
+        return sample, n + sum(1 for _ in it)
+    log_w = _log_random(rng) / k
+    # -expm1 вместо 1 - exp: при W, близком к 1, разность не обнуляется
+    target = n + int(_log_random(rng) / math.log(-math.expm1(log_w)))
+    for i, item in enumerate(it, n):
+        n = i + 1
+        if i == target:
+            sample[rng.randrange(k)] = (i, item)
+            log_w += _log_random(rng) / k
+            target += int(_log_random(rng) / math.log(-math.expm1(log_w))) + 1
+    sample.sort(key=lambda pair: pair[0])
+    return sample, n
+
+
+@dataclass
+class FeedSampling:
+    last_full: float = 0.0  # время последней полной проверки (unix)
+    offers: int = 0  # офферов в теле на последней проверке
+    escalated: bool = False  # в выборке слишком много ошибок — следующая проверка полная
+
+
+class SamplingState:
+    """Когда по каждому URL проверялись все офферы, а когда — выборка.
+
+    Тело проверяется целиком, если URL ещё не проверялся полностью, с полной проверки прошло
+    full_seconds или прошлая выборка превысила порог ошибок; иначе — выборка из
+    max(size, fraction · число офферов) штук. Состояние — один JSON-файл, запись атомарная.
+    """
+
+    def __init__(self, path: str, size: int, fraction: float, full_seconds: float) -> None:
+        self.path = Path(path)
+        self.size = size
+        self.fraction = fraction
+        self.full_seconds = full_seconds
+        self.feeds: Dict[str, FeedSampling] = {}
+        self._lock = threading.Lock()
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                self.feeds = {url: FeedSampling(**data) for url, data in json.load(f).items()}
+        except Exception:  # noqa: BLE001
+            self.feeds = {}
+
+    def sample_size(self, url: str, now: Optional[float] = None) -> int:
+        # Размер выборки для тела; 0 — проверить все офферы
+        now = time.time() if now is None else now
+        with self._lock:
+            st = self.feeds.get(normalize_url(url))
+        if st is None or st.escalated or now - st.last_full >= self.full_seconds:
+            return 0
+        return max(self.size, math.ceil(self.fraction * st.offers))
+
+    def full_due(self, url: str) -> bool:
+        return self.sample_size(url) == 0
+
+    def record(self, url: str, offers: int, sampled: bool, escalate: bool = False, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            st = self.feeds.setdefault(normalize_url(url), FeedSampling())
+            st.offers = offers
+            if not sampled:
+                st.last_full = now
+                st.escalated = False
+            elif escalate:
+                st.escalated = True
+
+    def save(self) -> None:
+        with self._lock:
+            data = {url: asdict(st) for url, st in self.feeds.items()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with tmp.open('w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
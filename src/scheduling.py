@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+# Сглаживание оценок (интервал между изменениями, длительность проверки)
+EWMA_ALPHA = 0.3
+# Тяжёлый фид проверяется реже: интервал растягивается в sqrt(cost / медиана) раз, но не больше чем в столько
+COST_MAX_FACTOR = 4.0
+# Фид считается «пора проверять» чуть раньше срока — запуски из Jenkins не совпадают с расписанием точно
+DUE_SLACK = 0.1
+
+
+def _ewma(previous: float, value: float) -> float:
+    return value if previous <= 0 else previous + EWMA_ALPHA * (value - previous)
+
+
+@dataclass
+class FeedStats:
+    interval: float = 0.0  # текущий интервал, с
+    next_due: float = 0.0  # время следующей проверки (unix)
+    last_check: float = 0.0
+    last_change: float = 0.0  # когда содержимое менялось в последний раз
+    change_gap: float = 0.0  # EWMA интервала между изменениями, с
+    cost: float = 0.0  # EWMA длительности проверки, с
+    fingerprint: Optional[str] = None  # хэши тел фида и его подфидов
+    failures: int = 0  # проверок подряд, на которых фид (или подфид) был недоступен
+    checks: int = 0
+    changes: int = 0
+
+
+class AdaptiveSchedule:
+    """Адаптивный интервал проверки по каждому фиду.
+
+    Изменчивый фид проверяется примерно вдвое чаще, чем меняется (интервал = половина оценки
+    времени между изменениями); стабильный — всё реже. Тяжёлые фиды растягиваются сильнее.
+    Недоступный фид проверяется через min_seconds, затем с экспоненциальным backoff.
+    Состояние хранится в одном JSON-файле, запись атомарная.
+    """
+
+    def __init__(self, path: str, min_seconds: float, max_seconds: float) -> None:
+        self.path = Path(path)
+        self.min_seconds = min_seconds
+        self.max_seconds = max(min_seconds, max_seconds)
+        self.feeds: Dict[str, FeedStats] = {}
+        self._lock = threading.Lock()
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                self.feeds = {url: FeedStats(**data) for url, data in json.load(f).items()}
+        except Exception:  # noqa: BLE001
+            self.feeds = {}
+
+    def is_due(self, url: str, now: Optional[float] = None) -> bool:
+        st = self.feeds.get(url)
+        if st is None:
+            return True
+        now = time.time() if now is None else now
+        return now >= st.next_due - st.interval * DUE_SLACK
+
+    def interval(self, url: str) -> float:
+        st = self.feeds.get(url)
+        return st.interval if st is not None and st.interval else self.min_seconds
+
+    def record(
+        self,
+        url: str,
+        fingerprint: Optional[str],
+        failed: bool,
+        seconds: float,
+        now: Optional[float] = None,
+    ) -> float:
+        # Возвращает новый интервал фида
+        now = time.time() if now is None else now
+        with self._lock:
+            st = self.feeds.setdefault(url, FeedStats())
+            st.checks += 1
+            st.last_check = now
+            st.cost = _ewma(st.cost, seconds)
+            if failed:
+                st.failures += 1
+                interval = self.min_seconds * 2 ** (st.failures - 1)
+            elif fingerprint is None:
+                # Изменилось ли содержимое — неизвестно: интервал не растёт
+                st.failures = 0
+                interval = st.interval or self.min_seconds
+            else:
+                st.failures = 0
+                if fingerprint != st.fingerprint:
+                    if st.fingerprint is not None and st.last_change:
+                        st.change_gap = _ewma(st.change_gap, now - st.last_change)
+                        st.changes += 1
+                    st.last_change = now
+                    st.fingerprint = fingerprint
+                elif not st.last_change:
+                    st.last_change = now
+                # Давно не менялся — оценка «между изменениями» не меньше, чем прошло с последнего
+                gap = max(st.change_gap, now - st.last_change)
+                interval = gap / 2 * self._cost_factor(st.cost)
+            st.interval = min(self.max_seconds, max(self.min_seconds, interval))
+            st.next_due = now + st.interval
+            return st.interval
+
+    def _cost_factor(self, cost: float) -> float:
+        costs = [st.cost for st in self.feeds.values() if st.cost > 0]
+        if len(costs) < 2 or cost <= 0:
+            return 1.0
+        reference = statistics.median(costs)
+        return min(COST_MAX_FACTOR, max(1.0, (cost / reference) ** 0.5))
+
+    def save(self) -> None:
+        with self._lock:
+            data = {url: asdict(st) for url, st in self.feeds.items()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with tmp.open('w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
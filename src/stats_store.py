@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+# Счётчики прогона; суточный fids_stat.json — их суммы за день
+COUNTERS = (
+    'total_feeds',
+    'feeds_with_errors',
+    'total_offers',
+    'offers_with_errors',
+    'total_issues',
+    'estimated_feeds',  # фидов, у которых ошибки — оценка по выборке (SAMPLE_SIZE)
+    'fetch_cache_hits',
+    'fetch_cache_misses',
+    'domain_cache_hits',
+    'domain_cache_misses',
+)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Метрики фида, которые добавились к feed_runs позже первой версии базы (столбец → тип)
+_FEED_METRICS = (
+    ('ts', 'REAL NOT NULL DEFAULT 0'),
+    ('status', 'INTEGER'),
+    ('failed', 'INTEGER NOT NULL DEFAULT 0'),
+    ('fetch_ms', 'REAL NOT NULL DEFAULT 0'),
+    ('bytes', 'INTEGER NOT NULL DEFAULT 0'),
+    ('issues_by_field', 'TEXT'),
+    ('estimated', 'INTEGER NOT NULL DEFAULT 0'),
+)
+
+
+@dataclass
+class FeedRun:
+    # Результат проверки одного фида одного владельца
+    owner: str
+    feed: str
+    has_error: bool
+    offers: int
+    offers_with_errors: int
+    issues: int
+    seconds: float
+    status: Optional[int] = None  # HTTP-статус корневого фида (None — не ответил)
+    failed: bool = False  # фид или подфид недоступен
+    fetch_ms: float = 0.0
+    bytes: int = 0
+    issues_by_field: Dict[str, int] = field(default_factory=dict)
+    estimated: bool = False  # offers_with_errors и issues — оценка по выборке, а не точный счёт
+    finished: float = field(default_factory=time.time)
+
+
+@dataclass
+class FeedTrend:
+    # Метрики фида за окно (сырые проверки и часовые агрегаты вместе)
+    feed: str
+    checks: int = 0
+    failures: int = 0
+    broken: int = 0  # проверок с ошибками в офферах или недоступностью
+    offers: int = 0
+    issues: int = 0
+    fetch_ms: float = 0.0
+    fetch_ms_max: float = 0.0
+    bytes: int = 0
+    bytes_max: int = 0
+    issues_by_field: Dict[str, int] = field(default_factory=dict)
+    estimated: int = 0  # проверок, где ошибки — оценка по выборке
+
+    @property
+    def avg_fetch_ms(self) -> float:
+        return self.fetch_ms / self.checks if self.checks else 0.0
+
+    @property
+    def avg_issues(self) -> float:
+        return self.issues / self.checks if self.checks else 0.0
+
+
+def write_json_atomic(path: Path, data: dict) -> None:
+    # Через временный файл: читатель не увидит наполовину записанный JSON
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with tmp.open('w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class StatsStore:
+    """Статистика прогонов в SQLite: строка на прогон (или на сохранение демона) и строки по фидам.
+
+    Прогон записывается одной транзакцией, поэтому параллельные запуски из Jenkins не теряют
+    счётчики, а падение посреди записи не портит данные. Суточные и по владельцам суммы
+    считаются запросами по индексу на день. fids_stat.json — представление, которое
+    пересобирается из базы после каждой записи (под той же блокировкой, атомарно).
+
+    История по фидам: строки feed_runs хранятся raw_days дней, более старые сворачиваются
+    в часовые агрегаты (feed_hourly) — тренды за недели не требуют разбора текстовых логов.
+    """
+
+    def __init__(self, path: str, raw_days: float = 7) -> None:
+        self.raw_seconds = raw_days * DAY
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # isolation_level=None: транзакции открываются явно (BEGIN IMMEDIATE)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        counters = ''.join(f', {name} INTEGER NOT NULL DEFAULT 0' for name in COUNTERS)
+        self._conn.executescript(
+            f'''
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                day TEXT NOT NULL,
+                started REAL NOT NULL,
+                finished REAL NOT NULL,
+                mode TEXT NOT NULL{counters}
+            );
+            CREATE INDEX IF NOT EXISTS runs_day ON runs (day);
+            CREATE TABLE IF NOT EXISTS run_stages (
+                run_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                seconds REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS run_stages_day ON run_stages (day, stage);
+            CREATE TABLE IF NOT EXISTS feed_runs (
+                run_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                feed TEXT NOT NULL,
+                has_error INTEGER NOT NULL,
+                offers INTEGER NOT NULL,
+                offers_with_errors INTEGER NOT NULL,
+                issues INTEGER NOT NULL,
+                seconds REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS feed_runs_day_owner ON feed_runs (day, owner);
+            CREATE INDEX IF NOT EXISTS feed_runs_feed ON feed_runs (feed, run_id);
+            CREATE TABLE IF NOT EXISTS feed_hourly (
+                hour INTEGER NOT NULL,
+                owner TEXT NOT NULL,
+                feed TEXT NOT NULL,
+                checks INTEGER NOT NULL,
+                failures INTEGER NOT NULL,
+                broken INTEGER NOT NULL,
+                offers INTEGER NOT NULL,
+                issues INTEGER NOT NULL,
+                seconds REAL NOT NULL,
+                fetch_ms REAL NOT NULL,
+                fetch_ms_max REAL NOT NULL,
+                bytes INTEGER NOT NULL,
+                bytes_max INTEGER NOT NULL,
+                issues_by_field TEXT,
+                estimated INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (hour, owner, feed)
+            ) WITHOUT ROWID;
+            '''
+        )
+        # Столбцы, которых нет в базе, созданной прежней версией
+        runs_columns = {row[1] for row in self._conn.execute('PRAGMA table_info(runs)')}
+        for name in COUNTERS:
+            if name not in runs_columns:
+                self._conn.execute(f'ALTER TABLE runs ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0')
+        if 'estimated' not in {row[1] for row in self._conn.execute('PRAGMA table_info(feed_hourly)')}:
+            self._conn.execute('ALTER TABLE feed_hourly ADD COLUMN estimated INTEGER NOT NULL DEFAULT 0')
+        existing = {row[1] for row in self._conn.execute('PRAGMA table_info(feed_runs)')}
+        for column, kind in _FEED_METRICS:
+            if column not in existing:
+                self._conn.execute(f'ALTER TABLE feed_runs ADD COLUMN {column} {kind}')
+        if 'ts' not in existing:
+            # У строк из первой версии базы время проверки — время окончания их прогона
+            self._conn.execute('UPDATE feed_runs SET ts = (SELECT finished FROM runs WHERE runs.id = feed_runs.run_id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS feed_runs_ts ON feed_runs (ts)')
+
+    def record_run(
+        self,
+        day: str,
+        mode: str,
+        counters: Dict[str, int],
+        stage_seconds: Dict[str, float],
+        feeds: Iterable[FeedRun] = (),
+        started: Optional[float] = None,
+        view_path: Optional[Path] = None,
+    ) -> int:
+        # Запись прогона и пересборка view_path (fids_stat.json) — под одной блокировкой базы,
+        # так что представление всегда соответствует базе, в том числе при параллельных прогонах
+        finished = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                if view_path is not None and not self.has_day(day):
+                    self._import_view(view_path, day)
+                run_id = self._insert_run(day, mode, counters, stage_seconds, started or finished, finished)
+                self._conn.executemany(
+                    'INSERT INTO feed_runs (run_id, day, owner, feed, has_error, offers, offers_with_errors, issues, seconds,'
+                    ' ts, status, failed, fetch_ms, bytes, issues_by_field, estimated)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        (
+                            run_id, day, f.owner, f.feed, int(f.has_error), f.offers, f.offers_with_errors, f.issues,
+                            round(f.seconds, 3), f.finished, f.status, int(f.failed), round(f.fetch_ms, 1), f.bytes,
+                            json.dumps(f.issues_by_field, ensure_ascii=False) if f.issues_by_field else None,
+                            int(f.estimated),
+                        )
+                        for f in feeds
+                    ),
+                )
+                self._downsample(finished)
+                if view_path is not None:
+                    write_json_atomic(view_path, self.day_totals(day))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return run_id
+
+    def _insert_run(
+        self,
+        day: str,
+        mode: str,
+        counters: Dict[str, int],
+        stage_seconds: Dict[str, float],
+        started: float,
+        finished: float,
+    ) -> int:
+        names = [name for name in COUNTERS if name in counters]
+        columns = ''.join(f', {name}' for name in names)
+        marks = ', ?' * len(names)
+        cur = self._conn.execute(
+            f'INSERT INTO runs (day, started, finished, mode{columns}) VALUES (?, ?, ?, ?{marks})',
+            (day, started, finished, mode, *(int(counters[name]) for name in names)),
+        )
+        run_id = int(cur.lastrowid)
+        self._conn.executemany(
+            'INSERT INTO run_stages (run_id, day, stage, seconds) VALUES (?, ?, ?, ?)',
+            ((run_id, day, stage, float(seconds)) for stage, seconds in stage_seconds.items()),
+        )
+        return run_id
+
+    def _downsample(self, now: float) -> None:
+        # Строки старше raw_days сворачиваются в часовые агрегаты; граница выровнена по часу,
+        # так что каждый час сворачивается целиком за один раз
+        cutoff = int(now - self.raw_seconds) // HOUR * HOUR
+        rows = self._conn.execute(
+            'SELECT ts, owner, feed, failed, has_error, offers, issues, seconds, fetch_ms, bytes, issues_by_field, estimated'
+            ' FROM feed_runs WHERE ts < ?',
+            (cutoff,),
+        ).fetchall()
+        if not rows:
+            return
+        buckets: Dict[Tuple[int, str, str], list] = {}
+        for ts, owner, feed, failed, has_error, offers, issues, seconds, fetch_ms, size, by_field, estimated in rows:
+            key = (int(ts) // HOUR * HOUR, owner, feed)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = self._hourly_row(key) or [0, 0, 0, 0, 0, 0.0, 0.0, 0.0, 0, 0, {}, 0]
+            bucket[0] += 1
+            bucket[1] += int(failed)
+            bucket[2] += int(failed or has_error)
+            bucket[3] += offers
+            bucket[4] += issues
+            bucket[5] += seconds
+            bucket[6] += fetch_ms
+            bucket[7] = max(bucket[7], fetch_ms)
+            bucket[8] += size
+            bucket[9] = max(bucket[9], size)
+            for name, count in json.loads(by_field or '{}').items():
+                bucket[10][name] = bucket[10].get(name, 0) + count
+            bucket[11] += int(estimated)
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO feed_hourly (hour, owner, feed, checks, failures, broken, offers, issues, seconds,'
+            ' fetch_ms, fetch_ms_max, bytes, bytes_max, issues_by_field, estimated)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                (*key, *bucket[:10], json.dumps(bucket[10], ensure_ascii=False) if bucket[10] else None, bucket[11])
+                for key, bucket in buckets.items()
+            ),
+        )
+        self._conn.execute('DELETE FROM feed_runs WHERE ts < ?', (cutoff,))
+
+    def _hourly_row(self, key: Tuple[int, str, str]) -> Optional[list]:
+        row = self._conn.execute(
+            'SELECT checks, failures, broken, offers, issues, seconds, fetch_ms, fetch_ms_max, bytes, bytes_max, issues_by_field, estimated'
+            ' FROM feed_hourly WHERE hour = ? AND owner = ? AND feed = ?',
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        return [*row[:10], json.loads(row[10] or '{}'), row[11]]
+
+    def feed_trends(self, start: float, end: float) -> Dict[str, FeedTrend]:
+        # Метрики по фидам за [start, end): сырые строки и часовые агрегаты (владельцы одного фида — вместе)
+        trends: Dict[str, FeedTrend] = {}
+        raw = self._conn.execute(
+            'SELECT feed, 1, failed, failed OR has_error, offers, issues, fetch_ms, fetch_ms, bytes, bytes, issues_by_field, estimated'
+            ' FROM feed_runs WHERE ts >= ? AND ts < ?',
+            (start, end),
+        )
+        hourly = self._conn.execute(
+            'SELECT feed, checks, failures, broken, offers, issues, fetch_ms, fetch_ms_max, bytes, bytes_max, issues_by_field, estimated'
+            ' FROM feed_hourly WHERE hour >= ? AND hour < ?',
+            (start, end),
+        )
+        for rows in (raw, hourly):
+            for feed, checks, failures, broken, offers, issues, fetch_ms, fetch_ms_max, size, size_max, by_field, estimated in rows:
+                trend = trends.get(feed)
+                if trend is None:
+                    trend = trends[feed] = FeedTrend(feed)
+                trend.checks += checks
+                trend.failures += failures
+                trend.broken += broken
+                trend.offers += offers
+                trend.issues += issues
+                trend.fetch_ms += fetch_ms
+                trend.fetch_ms_max = max(trend.fetch_ms_max, fetch_ms_max)
+                trend.bytes += size
+                trend.bytes_max = max(trend.bytes_max, size_max)
+                for name, count in json.loads(by_field or '{}').items():
+                    trend.issues_by_field[name] = trend.issues_by_field.get(name, 0) + count
+                trend.estimated += estimated
+        return trends
+
+    def _import_view(self, view_path: Path, day: str) -> None:
+        # Счётчики, накопленные за день в fids_stat.json до появления базы, переносятся одной строкой
+        try:
+            with view_path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception:  # noqa: BLE001
+            return
+        if not isinstance(data, dict) or data.get('date') != day:
+            return
+        counters = {name: int(data.get(name, 0)) for name in COUNTERS}
+        stage_seconds = {k: float(v) for k, v in (data.get('stage_seconds') or {}).items()}
+        now = time.time()
+        self._insert_run(day, 'legacy', counters, stage_seconds, now, now)
+
+    def has_day(self, day: str) -> bool:
+        return self._conn.execute('SELECT 1 FROM runs WHERE day = ? LIMIT 1', (day,)).fetchone() is not None
+
+    def day_totals(self, day: str) -> dict:
+        # Тот же вид, что у прежнего fids_stat.json
+        sums = ', '.join(f'COALESCE(SUM({name}), 0)' for name in COUNTERS)
+        row = self._conn.execute(f'SELECT {sums} FROM runs WHERE day = ?', (day,)).fetchone()
+        stats: dict = {'date': day, **dict(zip(COUNTERS, row))}
+        stages = {
+            stage: round(seconds, 3)
+            for stage, seconds in self._conn.execute(
+                'SELECT stage, SUM(seconds) FROM run_stages WHERE day = ? GROUP BY stage ORDER BY stage', (day,)
+            )
+        }
+        if stages:
+            stats['stage_seconds'] = stages
+        return stats
+
+    def owner_totals(self, day: str) -> Dict[str, Dict[str, int]]:
+        rows = self._conn.execute(
+            'SELECT owner, COUNT(*), SUM(has_error), SUM(offers), SUM(offers_with_errors), SUM(issues)'
+            ' FROM feed_runs WHERE day = ? GROUP BY owner ORDER BY owner',
+            (day,),
+        )
+        return {
+            owner: {
+                'total_feeds': feeds,
+                'feeds_with_errors': bad_feeds,
+                'total_offers': offers,
+                'offers_with_errors': bad_offers,
+                'total_issues': issues,
+            }
+            for owner, feeds, bad_feeds, offers, bad_offers, issues in rows
+        }
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, TypeVar
+
+try:
+    import resource
+except ImportError:  # Windows: пик памяти не считается
+    resource = None  # type: ignore[assignment]
+
+T = TypeVar('T')
+
+# Порядок стадий в итоговой сводке
+STAGES = ('feed', 'fetch', 'probe', 'subfeeds', 'parse', 'validate', 'alert', 'telegram')
+
+
+def peak_rss_mb() -> float:
+    # Пиковый RSS процесса (ru_maxrss: КБ в Linux, байты в macOS)
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@dataclass
+class StageStats:
+    seconds: float = 0.0
+    calls: int = 0
+    bytes: int = 0
+    offers: int = 0
+
+
+class RunTimings:
+    """Время прогона по стадиям (fetch, parse, validate, ...) — всего и по каждому фиду.
+
+    Выключенный объект ничего не считает: add() и stage() сразу возвращаются,
+    а check_offers без timed не оборачивает поток офферов.
+
+    ru_maxrss — пик всего процесса, поэтому память по фиду (на сколько вырос пик за его проверку)
+    считается только при per_feed_rss: фиды идут по одному и без пулов процессов.
+    """
+
+    def __init__(self, enabled: bool = False, per_feed_rss: bool = False) -> None:
+        self.enabled = enabled
+        self.per_feed_rss = per_feed_rss
+        self.stages: Dict[str, StageStats] = {}
+        self.feeds: Dict[str, Dict[str, StageStats]] = {}
+        self.feed_rss_growth_mb: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        stage: str,
+        seconds: float,
+        feed: Optional[str] = None,
+        bytes: int = 0,
+        offers: int = 0,
+        run_total: bool = True,
+    ) -> None:
+        # run_total=False — только в разбивку по фиду (например, загрузка, переиспользованная из кэша прогона)
+        if not self.enabled:
+            return
+        with self._lock:
+            targets = [self.stages.setdefault(stage, StageStats())] if run_total else []
+            if feed is not None:
+                targets.append(self.feeds.setdefault(feed, {}).setdefault(stage, StageStats()))
+            for st in targets:
+                st.seconds += seconds
+                st.calls += 1
+                st.bytes += bytes
+                st.offers += offers
+
+    @contextmanager
+    def stage(self, name: str, feed: Optional[str] = None) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, feed)
+
+    @contextmanager
+    def feed_rss(self, feed: str) -> Iterator[None]:
+        # Рост пика RSS процесса за проверку фида; 0 — фид не поднял пик выше прежних
+        if not (self.enabled and self.per_feed_rss):
+            yield
+            return
+        before = peak_rss_mb()
+        try:
+            yield
+        finally:
+            growth = peak_rss_mb() - before
+            with self._lock:
+                self.feed_rss_growth_mb[feed] = max(growth, self.feed_rss_growth_mb.get(feed, 0.0))
+
+    def summary(self, top: int = 5) -> str:
+        lines = ['⏱ Время по стадиям:']
+        order = [s for s in STAGES if s in self.stages] + sorted(set(self.stages) - set(STAGES))
+        for name in order:
+            st = self.stages[name]
+            line = f'  {name}: {st.seconds:.2f} с, вызовов={st.calls}'
+            if st.bytes:
+                line += f', {st.bytes / 1024 / 1024:.1f} МБ'
+            if st.offers:
+                line += f', офферов={st.offers}'
+            lines.append(line)
+        slowest = sorted(self.feeds.items(), key=lambda kv: kv[1].get('feed', StageStats()).seconds, reverse=True)[:top]
+        if slowest:
+            lines.append('🐢 Самые долгие фиды:')
+            for feed, stages in slowest:
+                parts = ', '.join(f'{name}={st.seconds:.2f}' for name, st in stages.items() if name != 'feed')
+                total = stages.get('feed', StageStats()).seconds
+                line = f'  {feed}: {total:.2f} с ({parts})'
+                if feed in self.feed_rss_growth_mb:
+                    line += f', рост пика RSS +{self.feed_rss_growth_mb[feed]:.0f} МБ'
+                lines.append(line)
+        lines.append(f'📈 Пик памяти процесса: {peak_rss_mb():.0f} МБ')
+        return '\n'.join(lines)
+
+    def take(self) -> 'RunTimings':
+        # Забирает накопленное и начинает счёт заново (периодические сводки демона)
+        taken = RunTimings(self.enabled, self.per_feed_rss)
+        with self._lock:
+            taken.stages, self.stages = self.stages, {}
+            taken.feeds, self.feeds = self.feeds, {}
+            taken.feed_rss_growth_mb, self.feed_rss_growth_mb = self.feed_rss_growth_mb, {}
+        return taken
+
+    def stage_seconds(self) -> Dict[str, float]:
+        return {name: round(st.seconds, 3) for name, st in self.stages.items()}
+
+
+def timed_iter(items: Iterator[T], totals: List[float]) -> Iterator[T]:
+    # Время, потраченное на получение каждого элемента (например, разбор оффера), копится в totals[0]
+    it = iter(items)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            totals[0] += time.perf_counter() - started
+            return
+        totals[0] += time.perf_counter() - started
+        yield item
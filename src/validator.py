@@ -1,13 +1,22 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 try:
-    from .fetch import extract_domain, is_same_domain
+    from .fetch import extract_domain, host_matches, _normalize_host
 except Exception:  # noqa: BLE001
-    from fetch import extract_domain, is_same_domain  # type: ignore
+    from fetch import extract_domain, host_matches, _normalize_host  # type: ignore
 import re
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:  # numpy не обязателен: без него работает построчная проверка
+    np = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from .parser import Offer
 
 
 @dataclass
@@ -17,6 +26,10 @@ class ValidationIssue:
     details: Optional[str] = None
 
 
+_SPACES_RE = re.compile(r"[\s]")
+_NON_NUMERIC_RE = re.compile(r"[^0-9.\-]")
+
+
 def _is_number(value: str) -> bool:
     if value is None:
         return False
@@ -33,87 +46,270 @@ def _normalize_price(value: str) -> str:
     # Replace non-breaking spaces and regular spaces, remove thousands separators, replace comma with dot for decimals
     v = value.replace('\xa0', ' ').strip()
     # Remove spaces inside
-    v = re.sub(r"[\s]", '', v)
+    v = _SPACES_RE.sub('', v)
     # Replace comma decimal to dot only if there's exactly one comma and no dot
     if ',' in v and '.' not in v:
         v = v.replace(',', '.')
     # Remove any non-digit/non-dot/non-minus characters
-    v = re.sub(r"[^0-9.\-]", '', v)
+    v = _NON_NUMERIC_RE.sub('', v)
     return v
 
 
-def validate_offer(
-    offer_fields: Dict[str, List[str]],
-    feed_url: str,
-) -> List[ValidationIssue]:
-    try:
-        from .config import load_settings  # type: ignore
-    except Exception:  # noqa: BLE001
-        from config import load_settings  # type: ignore
-    settings = load_settings()
-    domain = extract_domain(feed_url) or ''
-    issues: List[ValidationIssue] = []
-
-    # url (required, same-domain, non-empty)
-    urls = offer_fields.get('url', [])
-    if not urls or all(not u.strip() for u in urls):
-        issues.append(ValidationIssue('url', 'Поле url пустое', 'Отсутствует значение url'))
-    else:
-        for u in urls:
-            if not u.strip():
-                issues.append(ValidationIssue('url', 'Поле url пустое'))
-            elif not is_same_domain(u, domain, allow_subdomains=settings.allow_subdomains):
-                issues.append(ValidationIssue('url', f'Url не содержит домен {domain}', f'Найден url: {u}'))
-
-    # name (required non-empty text)
-    names = offer_fields.get('name', [])
-    if not names or all(not n.strip() for n in names):
-        issues.append(ValidationIssue('name', 'Поле name пустое'))
-
-    # picture (required, url on same domain)
-    pictures = offer_fields.get('picture', [])
-    if not pictures or all(not p.strip() for p in pictures):
-        issues.append(ValidationIssue('picture', 'Поле picture пустое'))
-    else:
-        for p in pictures:
-            if not p.strip():
-                issues.append(ValidationIssue('picture', 'Поле picture пустое'))
-            elif not is_same_domain(p, domain, allow_subdomains=settings.allow_subdomains):
-                issues.append(ValidationIssue('picture', 'Поле picture на чужом домене', f'Найден picture: {p}'))
-
-    # price (required numeric)
-    prices = [
-        _normalize_price(pr)
-        for pr in offer_fields.get('price', [])
-    ]
-    if not prices or all(not pr.strip() for pr in prices):
-        issues.append(ValidationIssue('price', 'Поле price пустое'))
-        price_value: Optional[float] = None
-    else:
-        price_value = None
-        for pr in prices:
-            if not _is_number(pr):
-                issues.append(ValidationIssue('price', 'Поле price не число', f'Найдено: {pr!r}'))
-            else:
-                try:
-                    price_value = float(pr)
-                except Exception:
-                    pass
-
-    # oldprice (optional numeric, > price if both present)
-    oldprices_raw = offer_fields.get('oldprice', [])
-    oldprices = [_normalize_price(op) for op in oldprices_raw]
-    for op in oldprices:
-        if not op.strip():
-            issues.append(ValidationIssue('oldprice', 'Поле oldprice пустое'))
-        elif not _is_number(op):
-            issues.append(ValidationIssue('oldprice', 'Поле oldprice не число', f'Найдено: {op!r}'))
-        elif price_value is not None and float(op) <= price_value:
-            issues.append(ValidationIssue('oldprice', 'oldprice должен быть больше price', f'oldprice={op}, price={price_value}'))
-
-    return issues
+# Цены длиннее этого нормализуются построчно, чтобы одна «простыня» не раздувала матрицу символов
+_BATCH_MAX_PRICE_LEN = 64
+
+_CH_COMMA, _CH_MINUS, _CH_DOT, _CH_0, _CH_9 = (ord(c) for c in ',-.09')
+
+
+def _normalize_prices_np(values: Sequence[str]) -> Tuple['np.ndarray', 'np.ndarray']:
+    """Векторная версия _normalize_price для массива цен.
+
+    Строки раскладываются в матрицу кодов символов: запятая заменяется точкой (если точки нет),
+    всё, кроме [0-9.-], удаляется. Возвращает (нормализованные строки, матрицу их кодов).
+    """
+    arr = np.array(values, dtype=str) if values else np.zeros(0, dtype='<U1')
+    width = max(arr.dtype.itemsize // 4, 1)
+    codes = np.ascontiguousarray(arr).view(np.uint32).reshape(len(arr), width)
+    has_comma = (codes == _CH_COMMA).any(axis=1)
+    has_dot = (codes == _CH_DOT).any(axis=1)
+    codes = np.where((has_comma & ~has_dot)[:, None] & (codes == _CH_COMMA), _CH_DOT, codes)
+    keep = ((codes >= _CH_0) & (codes <= _CH_9)) | (codes == _CH_DOT) | (codes == _CH_MINUS)
+    # Стабильная сортировка по «удалить/оставить» сдвигает оставшиеся символы влево без смены порядка
+    order = np.argsort(~keep, axis=1, kind='stable')
+    packed = np.take_along_axis(np.where(keep, codes, 0), order, axis=1).astype(np.uint32)
+    normalized = np.ascontiguousarray(packed).view(f'<U{width}').reshape(len(arr))
+    return normalized, packed
+
+
+def _parse_prices_np(values: List[str]) -> Tuple['np.ndarray', Dict[int, str], 'np.ndarray', 'np.ndarray', 'np.ndarray']:
+    """Нормализует и разбирает цены пачкой.
+
+    Возвращает (нормализованные строки, замены для длинных значений, пустая?, число?, значение).
+    """
+    count = len(values)
+    lengths = np.fromiter(map(len, values), dtype=np.intp, count=count)
+    long_idx = np.flatnonzero(lengths > _BATCH_MAX_PRICE_LEN).tolist()
+    short = [values[i] if lengths[i] <= _BATCH_MAX_PRICE_LEN else '' for i in range(count)] if long_idx else values
+    strings, codes = _normalize_prices_np(short)
+    digits = ((codes >= _CH_0) & (codes <= _CH_9)).sum(axis=1)
+    dots = (codes == _CH_DOT).sum(axis=1)
+    minuses = (codes == _CH_MINUS).sum(axis=1)
+    # Грамматика float() на алфавите [0-9.-]: хотя бы одна цифра, не больше одной точки, минус только первым
+    numeric = (digits > 0) & (dots <= 1) & ((minuses == 0) | ((minuses == 1) & (codes[:, 0] == _CH_MINUS)))
+    empty = codes[:, 0] == 0
+    parsed = np.zeros(count, dtype=np.float64)
+    if numeric.any():
+        parsed[numeric] = strings[numeric].astype(np.float64)
+    overrides: Dict[int, str] = {}
+    for i in long_idx:
+        norm = _normalize_price(values[i])
+        overrides[i] = norm
+        empty[i] = not norm
+        numeric[i] = _is_number(norm)
+        if numeric[i]:
+            parsed[i] = float(norm)
+    return strings, overrides, empty, numeric, parsed
+
+
+def _column(offers_fields: Sequence[Dict[str, List[str]]], tag: str) -> Tuple[List[str], 'np.ndarray']:
+    # Значения поля всех офферов подряд и номер оффера для каждого значения
+    lists = [fields.get(tag, ()) for fields in offers_fields]
+    counts = np.fromiter(map(len, lists), dtype=np.intp, count=len(lists))
+    return list(chain.from_iterable(lists)), np.repeat(np.arange(len(lists), dtype=np.intp), counts)
 
 
+class FeedValidator:
+    """Проверка офферов одного фида.
 
+    Настройки, домен фида и регулярки вычисляются один раз при создании,
+    поэтому объект стоит строить один раз на URL и переиспользовать для всех офферов.
+    """
 
+    def __init__(self, feed_url: str, allow_subdomains: bool = False, batch_size: int = 0) -> None:
+        self.feed_url = feed_url
+        self.allow_subdomains = allow_subdomains
+        self.domain = extract_domain(feed_url) or ''
+        self.base_host = _normalize_host(self.domain)
+        # Пакетная проверка включается размером пачки и только при установленном numpy
+        self.batch_size = batch_size if np is not None else 0
 
+    def is_same_domain(self, url: str) -> bool:
+        # Сравнение хоста с доменом фида кэшируется в общем LRU (fetch.host_matches)
+        return host_matches(extract_domain(url or '') or '', self.base_host, self.allow_subdomains)
+
+    def validate(self, offer_fields: Dict[str, List[str]]) -> List[ValidationIssue]:
+        domain = self.domain
+        issues: List[ValidationIssue] = []
+
+        # url (required, same-domain, non-empty)
+        urls = offer_fields.get('url', [])
+        if not urls or all(not u.strip() for u in urls):
+            issues.append(ValidationIssue('url', 'Поле url пустое', 'Отсутствует значение url'))
+        else:
+            for u in urls:
+                if not u.strip():
+                    issues.append(ValidationIssue('url', 'Поле url пустое'))
+                elif not self.is_same_domain(u):
+                    issues.append(ValidationIssue('url', f'Url не содержит домен {domain}', f'Найден url: {u}'))
+
+        # name (required non-empty text)
+        names = offer_fields.get('name', [])
+        if not names or all(not n.strip() for n in names):
+            issues.append(ValidationIssue('name', 'Поле name пустое'))
+
+        # picture (required, url on same domain)
+        pictures = offer_fields.get('picture', [])
+        if not pictures or all(not p.strip() for p in pictures):
+            issues.append(ValidationIssue('picture', 'Поле picture пустое'))
+        else:
+            for p in pictures:
+                if not p.strip():
+                    issues.append(ValidationIssue('picture', 'Поле picture пустое'))
+                elif not self.is_same_domain(p):
+                    issues.append(ValidationIssue('picture', 'Поле picture на чужом домене', f'Найден picture: {p}'))
+
+        # price (required numeric)
+        prices = [
+            _normalize_price(pr)
+            for pr in offer_fields.get('price', [])
+        ]
+        if not prices or all(not pr.strip() for pr in prices):
+            issues.append(ValidationIssue('price', 'Поле price пустое'))
+            price_value: Optional[float] = None
+        else:
+            price_value = None
+            for pr in prices:
+                if not _is_number(pr):
+                    issues.append(ValidationIssue('price', 'Поле price не число', f'Найдено: {pr!r}'))
+                else:
+                    try:
+                        price_value = float(pr)
+                    except Exception:
+                        pass
+
+        # oldprice (optional numeric, > price if both present)
+        oldprices_raw = offer_fields.get('oldprice', [])
+        oldprices = [_normalize_price(op) for op in oldprices_raw]
+        for op in oldprices:
+            if not op.strip():
+                issues.append(ValidationIssue('oldprice', 'Поле oldprice пустое'))
+            elif not _is_number(op):
+                issues.append(ValidationIssue('oldprice', 'Поле oldprice не число', f'Найдено: {op!r}'))
+            elif price_value is not None and float(op) <= price_value:
+                issues.append(ValidationIssue('oldprice', 'oldprice должен быть больше price', f'oldprice={op}, price={price_value}'))
+
+        return issues
+
+    def validate_batch(self, offers_fields: Sequence[Dict[str, List[str]]]) -> List[List[ValidationIssue]]:
+        """Пакетная проверка: тот же список ValidationIssue, что и validate() для каждого оффера.
+
+        Поля пачки раскладываются в колонки; цены нормализуются и разбираются векторно (numpy),
+        домены url/picture сверяются один раз на хост. Python-код трогает только значения с ошибками.
+        Без numpy откатывается на validate().
+        """
+        if np is None:
+            return [self.validate(fields) for fields in offers_fields]
+        count = len(offers_fields)
+        result: List[List[ValidationIssue]] = [[] for _ in range(count)]
+        if not count:
+            return result
+        domain = self.domain
+        same_domain = self.is_same_domain
+
+        # url и picture: значение пустое или на чужом домене
+        for tag in ('url', 'picture'):
+            values, owner = _column(offers_fields, tag)
+            filled = np.fromiter((bool(v.strip()) for v in values), dtype=bool, count=len(values))
+            has_any = np.bincount(owner[filled], minlength=count) > 0
+            for i in np.flatnonzero(~has_any).tolist():
+                if tag == 'url':
+                    result[i].append(ValidationIssue('url', 'Поле url пустое', 'Отсутствует значение url'))
+                else:
+                    result[i].append(ValidationIssue('picture', 'Поле picture пустое'))
+            foreign = np.zeros(len(values), dtype=bool)
+            filled_idx = np.flatnonzero(filled)
+            foreign[filled_idx] = [not same_domain(values[j]) for j in filled_idx.tolist()]
+            for j in np.flatnonzero((~filled | foreign) & has_any[owner]).tolist():
+                value = values[j]
+                issues = result[owner[j]]
+                if tag == 'url':
+                    if not filled[j]:
+                        issues.append(ValidationIssue('url', 'Поле url пустое'))
+                    else:
+                        issues.append(ValidationIssue('url', f'Url не содержит домен {domain}', f'Найден url: {value}'))
+                elif not filled[j]:
+                    issues.append(ValidationIssue('picture', 'Поле picture пустое'))
+                else:
+                    issues.append(ValidationIssue('picture', 'Поле picture на чужом домене', f'Найден picture: {value}'))
+            if tag == 'url':
+                # name проверяется между url и picture — так же упорядочены ошибки в validate()
+                for i, fields in enumerate(offers_fields):
+                    if not any(map(str.strip, fields.get('name', ()))):
+                        result[i].append(ValidationIssue('name', 'Поле name пустое'))
+
+        # price: значение оффера — последнее числовое (как в построчной проверке)
+        price_raw, p_owner = _column(offers_fields, 'price')
+        p_str, p_long, p_empty, p_num, p_val = _parse_prices_np(price_raw)
+        has_price = np.bincount(p_owner[~p_empty], minlength=count) > 0
+        last = np.full(count, -1, dtype=np.intp)
+        num_pos = np.flatnonzero(p_num)
+        np.maximum.at(last, p_owner[num_pos], num_pos)
+        for i in np.flatnonzero(~has_price).tolist():
+            result[i].append(ValidationIssue('price', 'Поле price пустое'))
+        for j in np.flatnonzero(~p_num & has_price[p_owner]).tolist():
+            pr = p_long[j] if j in p_long else str(p_str[j])
+            result[p_owner[j]].append(ValidationIssue('price', 'Поле price не число', f'Найдено: {pr!r}'))
+
+        # oldprice: необязательное, число и больше price
+        old_raw, o_owner = _column(offers_fields, 'oldprice')
+        if old_raw:
+            o_str, o_long, o_empty, o_num, o_val = _parse_prices_np(old_raw)
+            price_idx = last[o_owner]
+            with_price = has_price[o_owner] & (price_idx >= 0)
+            # Индексы берутся только у офферов с числовой ценой: в пачке может не быть ни одной цены
+            price_of = np.zeros(len(old_raw), dtype=np.float64)
+            price_of[with_price] = p_val[price_idx[with_price]]
+            not_greater = o_num & with_price & (o_val <= price_of)
+            for j in np.flatnonzero(o_empty | ~o_num | not_greater).tolist():
+                issues = result[o_owner[j]]
+                op = o_long[j] if j in o_long else str(o_str[j])
+                if o_empty[j]:
+                    issues.append(ValidationIssue('oldprice', 'Поле oldprice пустое'))
+                elif not o_num[j]:
+                    issues.append(ValidationIssue('oldprice', 'Поле oldprice не число', f'Найдено: {op!r}'))
+                else:
+                    price_value = float(price_of[j])
+                    issues.append(ValidationIssue('oldprice', 'oldprice должен быть больше price', f'oldprice={op}, price={price_value}'))
+        return result
+
+    def validate_many(self, offers: Iterable['Offer']) -> Iterator[Tuple['Offer', List[ValidationIssue]]]:
+        # Ленивый обход: офферы могут приходить из потокового парсера
+        if not self.batch_size:
+            validate = self.validate
+            for offer in offers:
+                yield offer, validate(offer.fields)
+            return
+        chunk: List['Offer'] = []
+        for offer in offers:
+            chunk.append(offer)
+            if len(chunk) >= self.batch_size:
+                yield from zip(chunk, self.validate_batch([o.fields for o in chunk]))
+                chunk = []
+        if chunk:
+            yield from zip(chunk, self.validate_batch([o.fields for o in chunk]))
+
+
+def validate_offer(
+    offer_fields: Dict[str, List[str]],
+    feed_url: str,
+    allow_subdomains: Optional[bool] = None,
+) -> List[ValidationIssue]:
+    # Обёртка для совместимости. Без явного allow_subdomains читает настройки на каждый вызов,
+    # поэтому в циклах по офферам нужно использовать FeedValidator.
+    if allow_subdomains is None:
+        try:
+            from .config import load_settings  # type: ignore
+        except Exception:  # noqa: BLE001
+            from config import load_settings  # type: ignore
+        allow_subdomains = load_settings().allow_subdomains
+    return FeedValidator(feed_url, allow_subdomains=allow_subdomains).validate(offer_fields)
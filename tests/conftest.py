@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Тесты импортируют модули как src.*, так же как benchmarks
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
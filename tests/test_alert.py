@@ -0,0 +1,134 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.alert import TELEGRAM_MAX_LENGTH, TelegramDispatcher
+
+TOKEN = 'test-token'
+
+
+class _FakeTelegram(BaseHTTPRequestHandler):
+    # Bot API sendMessage: первые server.rate_limit запросов получают 429 с parameters.retry_after
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            limited = server.rate_limit > 0
+            if limited:
+                server.rate_limit -= 1
+            else:
+                server.messages.append((self.path, body['chat_id'], body['text']))
+        if limited:
+            self._reply(429, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': 0}})
+        else:
+            self._reply(200, {'ok': True})
+
+    def _reply(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def telegram():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeTelegram)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.messages = []
+    server.rate_limit = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    server.api_base = f'http://{host}:{port}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _dispatcher(api_base: str, **kwargs) -> TelegramDispatcher:
+    kwargs.setdefault('coalesce_seconds', 0.3)
+    return TelegramDispatcher(TOKEN, 'chat-1', api_base=api_base, timeout=2, **kwargs)
+
+
+def test_coalesces_per_chat_and_owner(telegram):
+    d = _dispatcher(telegram.api_base)
+    d.submit('a1', 'anton')
+    d.submit('b1', 'ilya')
+    d.submit('a2', 'anton')
+    d.submit('c1', 'anton', chat_id='chat-2')
+    d.submit('a3', 'anton')
+    d.close()
+    assert telegram.messages == [
+        (f'/bot{TOKEN}/sendMessage', 'chat-1', 'a1\n\na2\n\na3'),
+        (f'/bot{TOKEN}/sendMessage', 'chat-1', 'b1'),
+        (f'/bot{TOKEN}/sendMessage', 'chat-2', 'c1'),
+    ]
+    assert (d.sent, d.failed, d.dropped) == (3, 0, 0)
+
+
+def test_packed_messages_fit_limit_and_nothing_is_lost(telegram):
+    d = _dispatcher(telegram.api_base)
+    tokens = []
+    for i in range(40):
+        lines = [f'alert-{i}-line-{j}' for j in range(60)]
+        tokens += lines
+        d.submit('\n'.join(lines), 'anton')
+    # Одна строка длиннее лимита режется на части
+    d.submit('x' * (TELEGRAM_MAX_LENGTH * 2 + 10), 'anton')
+    d.close()
+    texts = [text for _, _, text in telegram.messages]
+    assert len(texts) > 1
+    assert all(len(text) <= TELEGRAM_MAX_LENGTH for text in texts)
+    posted = set('\n'.join(texts).split('\n'))
+    assert all(token in posted for token in tokens)
+    assert sum(text.count('x') for text in texts) == TELEGRAM_MAX_LENGTH * 2 + 10
+
+
+def test_retries_on_429(telegram):
+    telegram.rate_limit = 2
+    d = _dispatcher(telegram.api_base)
+    d.submit('hello', 'anton')
+    d.close()
+    assert [text for _, _, text in telegram.messages] == ['hello']
+    assert (d.sent, d.failed, d.rate_limited) == (1, 0, 2)
+
+
+def test_close_flushes_queue_without_waiting_for_window(telegram):
+    d = _dispatcher(telegram.api_base, coalesce_seconds=30)
+    d.submit('queued', 'anton')
+    started = time.monotonic()
+    d.close()
+    assert time.monotonic() - started < 5
+    assert [text for _, _, text in telegram.messages] == ['queued']
+
+
+def test_submit_after_close_is_delivered(telegram):
+    d = _dispatcher(telegram.api_base)
+    d.submit('before', 'anton')
+    d.close()
+    d.submit('after', 'anton')
+    assert [text for _, _, text in telegram.messages] == ['before', 'after']
+
+
+def test_close_gives_up_after_flush_deadline():
+    # Telegram недоступен: без дедлайна каждое сообщение ждало бы 5 попыток с backoff
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    d = _dispatcher(f'http://127.0.0.1:{port}', flush_seconds=1)
+    for i in range(10):
+        d.submit(f'alert {i}', f'owner-{i}')
+    started = time.monotonic()
+    d.close()
+    assert time.monotonic() - started < 3
+    assert d.sent == 0 and d.failed + d.dropped == 10 and d.dropped > 0
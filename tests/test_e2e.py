@@ -0,0 +1,69 @@
+from pathlib import Path
+from typing import List, Optional
+
+import pytest
+
+from benchmarks.feedgen import write_feed_set, write_rss
+from benchmarks.server import FeedServer
+from benchmarks.suite import _bench_settings
+from src.main import RunContext, process_feed
+
+MODES = {
+    'serial': {},
+    'stream': {'stream_fetch': True},
+    'concurrent': {'concurrent_run': True},
+    'concurrent_stream': {'concurrent_run': True, 'stream_fetch': True},
+    'concurrent_pool': {'concurrent_run': True, 'parse_processes': 1},
+}
+
+
+@pytest.fixture(scope='module')
+def site(tmp_path_factory):
+    root = tmp_path_factory.mktemp('site')
+    with FeedServer(root) as server:
+        base = server.base_url
+        write_feed_set(root / 'yml', 900, 3, f'{base}/yml', error_rate=0.1)
+        write_feed_set(root / 'rssns', 600, 2, f'{base}/rssns', fmt='rss', error_rate=0.1, namespaced=True)
+        # Индекс с корнем <rss>: ссылки на подфиды — в <link> элементов
+        for n in range(2):
+            write_rss(root / 'rssidx' / f's{n}.xml', 200, seed=n, base_url=base, error_rate=0.1)
+        links = ''.join(f'<item><link>{base}/rssidx/s{n}.xml</link></item>' for n in range(2))
+        (root / 'rssidx' / 'feed.xml').write_text(f'<?xml version="1.0"?><rss version="2.0"><channel>{links}</channel></rss>')
+        yield base
+
+
+def _process(base: str, path: str, mode: str, log_dir: Path, messages: Optional[List[str]] = None, **overrides: object):
+    settings = _bench_settings(str(log_dir), **MODES[mode], **overrides)
+    ctx = RunContext.from_settings(settings)
+    log = messages.append if messages is not None else (lambda message: None)
+    try:
+        return process_feed(settings, 'test', f'{base}/{path}', log_dir / 'test.log', ctx, log=log)
+    finally:
+        ctx.close()
+
+
+@pytest.mark.parametrize('path, min_offers', [('yml/feed.xml', 900), ('rssns/feed.xml', 600), ('rssidx/feed.xml', 400)])
+def test_modes_give_same_result(site, tmp_path, path, min_offers):
+    results = {mode: _process(site, path, mode, tmp_path / mode) for mode in MODES}
+    expected = results['serial']
+    has_error, offers, offers_with_errors, issues = expected
+    assert has_error and offers >= min_offers and 0 < offers_with_errors <= issues
+    assert results == {mode: expected for mode in MODES}
+
+
+@pytest.mark.parametrize('origin_status, unavailable', [(503, True), (None, False)])
+def test_origin_probe_same_in_all_modes(tmp_path, origin_status, unavailable):
+    # Корень сайта отвечает 503, сам фид отдаётся: поля не проверяются ни в одном режиме
+    root = tmp_path / 'site'
+    with FeedServer(root, statuses={'/': origin_status} if origin_status else None) as server:
+        write_rss(root / 'a.yml', 100, base_url=server.base_url, error_rate=0.1)
+        results = {}
+        for mode in MODES:
+            messages: List[str] = []
+            results[mode] = _process(
+                server.base_url, 'a.yml', mode, tmp_path / mode, messages, probe_origin_enabled=True, origin_probe_ttl_seconds=0,
+            )
+            assert any('Сайт недоступен' in m for m in messages) == unavailable, mode
+    expected = (True, 0, 0, 0) if unavailable else results['serial']
+    assert unavailable or results['serial'][1] == 100
+    assert results == {mode: expected for mode in MODES}
@@ -0,0 +1,48 @@
+import socket
+
+import pytest
+
+from benchmarks.server import FeedServer
+from src.fetch import Fetcher
+
+_real_getaddrinfo = socket.getaddrinfo
+
+
+def test_resolver_is_not_patched():
+    assert socket.getaddrinfo is _real_getaddrinfo
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / 'feed.xml').write_text('<yml_catalog/>')
+    with FeedServer(tmp_path) as srv:
+        yield srv
+
+
+def test_falls_back_to_next_address_and_times_dns(server, monkeypatch):
+    port = int(server.base_url.rsplit(':', 1)[1])
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        closed = sock.getsockname()[1]
+    calls = []
+
+    def fake_getaddrinfo(host, port_, *args, **kwargs):
+        if host != 'dual.test':
+            return _real_getaddrinfo(host, port_, *args, **kwargs)
+        calls.append(host)
+        # Первый адрес не отвечает (закрытый порт), второй — сервер
+        return [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', closed)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', port)),
+        ]
+
+    monkeypatch.setattr(socket, 'getaddrinfo', fake_getaddrinfo)
+    res = Fetcher('test', 5).fetch(f'http://dual.test:{port}/feed.xml')
+    assert res.error is None and res.status_code == 200 and res.content == b'<yml_catalog/>'
+    assert calls == ['dual.test']
+    assert res.timings.dns_ms > 0
+
+
+def test_unresolvable_host_is_an_error_result():
+    res = Fetcher('test', 5, retries=0).fetch('http://nonexistent.invalid/feed.xml')
+    assert res.status_code == 0 and res.error
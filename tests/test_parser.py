@@ -0,0 +1,87 @@
+import time
+
+from src.parser import iter_offers, sniff_format, split_offers
+
+
+def test_sniff_known_roots():
+    assert sniff_format(b'<?xml version="1.0"?><yml_catalog><shop><offers><offer id="1"/>').offer_tags == ('offer',)
+    assert sniff_format(b'<rss version="2.0"><channel><item><link>https://s.ru/a.xml</link></item>').offer_tags == ('item',)
+    fmt = sniff_format(b'<?xml version="1.0"?><feeds><feed><url>https://s.ru/a.xml</url></feed></feeds>')
+    assert fmt.kind == 'index'
+    assert fmt.offer_tags == ()
+
+
+def test_sniff_catalog_with_shop_url_before_offers():
+    # <shop><url> на .xml в первых 4 КБ, первый оффер — дальше: это не индекс, офферы не теряются
+    head = b'<?xml version="1.0"?><catalog><shop><url>https://s.ru/price.xml</url><name>' + b'x' * 5000 + b'</name></shop>'
+    body = head + b'<offers><offer id="1"><url>https://s.ru/p/1</url></offer><offer id="2"/></offers></catalog>'
+    fmt = sniff_format(body)
+    assert fmt.kind == 'unknown'
+    assert fmt.offer_tags == ('offer', 'item')
+    assert [o.id for o in iter_offers(body, tags=fmt.offer_tags)] == ['1', '2']
+    assert [o.id for o in iter_offers(body)] == ['1', '2']
+
+
+def _split_roundtrip(body, chunk_size):
+    chunks = split_offers(body, chunk_size)
+    assert chunks is not None
+    offers = [o for chunk in chunks for o in iter_offers(chunk, tags=(chunks.tag,))]
+    return chunks, offers
+
+
+def _yml(offers):
+    return (
+        b'<?xml version="1.0" encoding="UTF-8"?>\n<yml_catalog date="2024-01-01"><shop><offers>'
+        + b''.join(offers)
+        + b'</offers></shop></yml_catalog>'
+    )
+
+
+def test_split_reassembles_to_whole_body():
+    offers = []
+    for i in range(300):
+        name = f'<name><![CDATA[Товар <offer id="fake"> {i}]]></name>' if i % 7 == 0 else f'<name>Товар {i}</name>'
+        comment = f'<!-- <offer id="c{i}"> -->' if i % 11 == 0 else ''
+        offers.append(
+            f'<offer id="{i}" available="true">{comment}<url>https://s.ru/p/{i}</url>{name}'
+            f'<picture>https://s.ru/i/{i}.jpg</picture><price>{i}</price></offer>\n'.encode()
+        )
+    body = _yml(offers)
+    expected = list(iter_offers(body))
+    for chunk_size in (1, 100, 1000, 10_000, len(body)):
+        chunks, got = _split_roundtrip(body, chunk_size)
+        assert got == expected
+    assert len(split_offers(body, 1000)) > 10
+
+
+def test_split_namespaced_rss():
+    items = b''.join(
+        f'<item><g:id>{i}</g:id><g:link>https://s.ru/p/{i}</g:link><title><![CDATA[</item> {i}]]></title>'
+        f'<g:price>{i} RUB</g:price></item>'.encode()
+        for i in range(200)
+    )
+    body = (
+        b'<?xml version="1.0"?><rss version="2.0" xmlns:g="http://base.google.com/ns/1.0"><channel>'
+        + items
+        + b'</channel></rss>'
+    )
+    expected = list(iter_offers(body))
+    assert len(expected) == 200
+    chunks, got = _split_roundtrip(body, 500)
+    assert chunks.tag == 'item' and len(chunks) > 5
+    assert got == expected
+
+
+def test_split_gives_up_on_nested_offers():
+    inner = b'<offer id="in"><name>x</name></offer>' * 50
+    body = _yml([b'<offer id="out"><name>y</name>' + inner + b'</offer>'] * 3)
+    assert split_offers(body, 64) is None
+
+
+def test_split_is_linear_when_no_boundary_is_found_early():
+    # Один вложенный оффер на всё тело: прежде каждая граница-кандидат пересканировала окно заново
+    inner = b'<offer id="n"><name>x</name></offer>' * 20000
+    body = _yml([b'<offer id="a"><name>y</name></offer>', b'<offer id="big">' + inner + b'</offer>'])
+    started = time.perf_counter()
+    assert split_offers(body, 1 << 16) is None
+    assert time.perf_counter() - started < 1
@@ -0,0 +1,42 @@
+from src.pipeline import check_offers
+
+FEED_URL = 'https://shop.example.ru/feed.yml'
+
+
+def _feed(count: int, broken_every: int) -> bytes:
+    offers = []
+    for i in range(count):
+        host = 'evil.example.com' if i % broken_every == 0 else 'shop.example.ru'
+        offers.append(
+            f'<offer id="{i}"><url>https://{host}/p/{i}</url><name>n{i}</name>'
+            f'<picture>https://shop.example.ru/i/{i}.jpg</picture><price>{100 + i}</price></offer>'
+        )
+    return ('<?xml version="1.0"?><yml_catalog><shop><offers>' + ''.join(offers) + '</offers></shop></yml_catalog>').encode()
+
+
+def test_sample_counts_are_scaled_to_population():
+    result = check_offers(_feed(5000, 10), FEED_URL, allow_subdomains=False, sample_size=500)
+    sample = result.sample
+    assert sample is not None and sample.sampled == 500 and sample.population == 5000
+    assert result.offers_checked == 5000
+    # Счётчики результата — оценка на всё тело, а не число ошибок в выборке
+    assert result.offers_with_errors == round(sample.with_errors / 500 * 5000)
+    assert result.total_issues == round(sample.issues / 500 * 5000)
+    assert 300 <= result.offers_with_errors <= 700
+
+
+def test_small_body_is_checked_in_full():
+    result = check_offers(_feed(100, 10), FEED_URL, allow_subdomains=False, sample_size=500)
+    assert result.sample is None
+    assert (result.offers_checked, result.offers_with_errors) == (100, 10)
+
+
+def test_stale_issue_detail_is_removed(tmp_path):
+    detail = tmp_path / 'issues.jsonl'
+    result = check_offers(_feed(100, 2), FEED_URL, allow_subdomains=False, detail_path=str(detail))
+    assert result.truncated and result.detail_path == str(detail)
+    assert len(detail.read_text(encoding='utf-8').splitlines()) == 50
+    # Следующая проверка того же URL — ошибок мало, подробный файл больше не нужен
+    result = check_offers(_feed(100, 50), FEED_URL, allow_subdomains=False, detail_path=str(detail))
+    assert not result.truncated and result.detail_path is None
+    assert not detail.exists()
@@ -0,0 +1,50 @@
+import gzip
+
+from src.runlog import _DailyFile
+
+DATE = '2024-05-01'
+
+
+def _read_all(directory):
+    lines = []
+    for p in sorted(directory.iterdir()):
+        if p.name.startswith('.'):
+            continue
+        data = gzip.decompress(p.read_bytes()) if p.name.endswith('.gz') else p.read_bytes()
+        lines += data.decode('utf-8').splitlines()
+    return lines
+
+
+def test_rotation_by_two_writers_loses_nothing(tmp_path):
+    # Два «процесса» пишут в один файл дня и по очереди упираются в max_bytes
+    a = _DailyFile(tmp_path, '-feed-test.log', max_bytes=2000, compress=True)
+    b = _DailyFile(tmp_path, '-feed-test.log', max_bytes=2000, compress=True)
+    expected = []
+    for i in range(400):
+        writer, name = (a, 'a') if i % 3 else (b, 'b')
+        line = f'{name} {i:04d} ' + 'x' * 40
+        expected.append(line)
+        writer.write(DATE, line + '\n')
+        if i % 10 == 0:
+            a.flush()
+            b.flush()
+    a.close()
+    b.close()
+    assert sorted(_read_all(tmp_path)) == sorted(expected)
+    parts = [p.name for p in tmp_path.iterdir() if not p.name.startswith('.')]
+    assert f'{DATE}-feed-test.log.1.gz' in parts
+    assert len([p for p in parts if not p.endswith('.gz')]) <= 2
+
+
+def test_writer_follows_rotation_by_other(tmp_path):
+    a = _DailyFile(tmp_path, '-feed-test.log', max_bytes=100)
+    b = _DailyFile(tmp_path, '-feed-test.log', max_bytes=100)
+    b.write(DATE, 'b1\n')
+    b.flush()
+    a.write(DATE, 'a' * 120 + '\n')  # a переименовывает файл дня в .1
+    b.flush()  # b замечает ротацию и открывает новый файл
+    b.write(DATE, 'b2\n')
+    b.close()
+    a.close()
+    assert (tmp_path / f'{DATE}-feed-test.log.1').read_text().splitlines() == ['b1', 'a' * 120]
+    assert (tmp_path / f'{DATE}-feed-test.log').read_text() == 'b2\n'
@@ -0,0 +1,58 @@
+import pytest
+
+from benchmarks.validator_bench import TRICKY_PRICES, make_tricky_offers
+from src.parser import Offer
+from src.validator import FeedValidator
+
+np = pytest.importorskip('numpy')
+
+FEED_URL = 'https://shop.example.com/allfeed.xml'
+
+# Цены, которые построчная проверка разбирает через float(), а пакетная — по матрице символов
+MALFORMED_PRICES = ['abc', '-', '.', '1.2.3', '5-', '--1', '1e5', '٣', '12,5,0', '1,5.0', 'x' * 100 + '5', '9' * 70, '']
+
+
+def _offer(i, **fields):
+    base = {
+        'url': ['https://shop.example.com/p'],
+        'name': ['Товар'],
+        'picture': ['https://cdn.shop.example.com/i.jpg'],
+        'price': ['100'],
+    }
+    base.update(fields)
+    return Offer(id=str(i), fields=base)
+
+
+def _cases():
+    offers = []
+    for price in TRICKY_PRICES + MALFORMED_PRICES:
+        offers.append(_offer(len(offers), price=[price]))
+        offers.append(_offer(len(offers), price=['100', price]))
+        offers.append(_offer(len(offers), oldprice=[price]))
+        offers.append(_offer(len(offers), price=[price], oldprice=['1 000,50']))
+    offers.append(_offer(len(offers), url=['https://www.shop.example.com/p'], picture=['http://evil.example.net/i.jpg']))
+    offers.append(_offer(len(offers), url=['', ' '], picture=[]))
+    offers.append(_offer(len(offers), price=[]))
+    return offers + make_tricky_offers(3000)
+
+
+@pytest.mark.parametrize('allow_subdomains', [False, True])
+@pytest.mark.parametrize('batch_size', [1, 7, 2000])
+def test_batch_matches_scalar(allow_subdomains, batch_size):
+    offers = _cases()
+    scalar = FeedValidator(FEED_URL, allow_subdomains=allow_subdomains)
+    batch = FeedValidator(FEED_URL, allow_subdomains=allow_subdomains, batch_size=batch_size)
+    assert batch.batch_size == batch_size
+    expected = [issues for _, issues in scalar.validate_many(offers)]
+    actual = [issues for _, issues in batch.validate_many(offers)]
+    for offer, exp, act in zip(offers, expected, actual):
+        assert act == exp, offer.fields
+    assert len(actual) == len(offers)
+
+
+def test_subdomains_change_result():
+    # Проверка выше имеет смысл, только если allow_subdomains действительно влияет на ошибки
+    offer = _offer(0)
+    strict = FeedValidator(FEED_URL, allow_subdomains=False, batch_size=10).validate_batch([offer.fields])[0]
+    loose = FeedValidator(FEED_URL, allow_subdomains=True, batch_size=10).validate_batch([offer.fields])[0]
+    assert [i.field for i in strict] == ['picture'] and loose == []